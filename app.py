@@ -7,14 +7,26 @@ Flask 应用主模块
 """
 
 # 标准库
+import functools
 import json
 import logging
 import os
 
 # 第三方库
+import click
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import (
+    Flask,
+    Response,
+    current_app,
+    jsonify,
+    make_response,
+    render_template,
+    request,
+    send_from_directory,
+    stream_with_context,
+)
 from flask_cors import CORS
 from flask_login import (
     LoginManager,
@@ -23,9 +35,11 @@ from flask_login import (
     login_user,
     logout_user,
 )
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # 本地模块
 from database import (
+    QUIZ_MAX_QUESTIONS,
     DataService,
     Song,
     User,
@@ -33,8 +47,18 @@ from database import (
     init_db,
     register_commands,
 )
-from services.agent_service import process_agent_request
+from services.agent_service import process_agent_request, process_agent_request_stream
+from services.cache_service import TTLCache
+from services.guide_classifier import GUIDE_TOOLS, classify_guide_query
+from services.http_client import http_client
+from services.intent_rules import intent_stats
+from services.llm_cache import llm_response_cache
+from services.llm_gateway import LLMGatewayBusy, llm_gateway
 from services.llm_service import call_openrouter_api
+from services.rate_limiter import RateLimited, RateLimitPolicy, rate_limiter
+from services.sensitive_filter import sensitive_filter
+from services.single_flight import llm_single_flight
+from services.suggest_index import normalize_key
 
 # ==============================================================================
 # 1. 日志和环境配置
@@ -46,7 +70,22 @@ load_dotenv()
 # 获取项目根目录
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-SENSITIVE_WORDS = ["暴力", "色情", "赌博", "反动", "脏话", "违规"]
+# LLM 响应缓存时间（秒）
+REGION_ANALYSIS_CACHE_TTL = 7 * 24 * 3600
+GUIDE_CACHE_TTL = 24 * 3600
+
+# 接口限流策略：RateLimitPolicy(每秒补充令牌数, 突发数, 并发数, 全局每秒补充令牌数, 全局突发数, 全局并发数)
+RATE_LIMIT_POLICIES = {
+    # Agent 对话、导航助手和地区分析：每人每分钟 20 次，全站每分钟 600 次
+    "chat": RateLimitPolicy(20 / 60, 10, 2, 600 / 60, 100, 30),
+    # 歌词创作：每人每分钟 6 次，全站每分钟 120 次
+    "lyrics": RateLimitPolicy(6 / 60, 3, 2, 120 / 60, 30, 12),
+    # Kie 歌曲生成：每人每小时 6 次，全站每小时 60 次
+    "song": RateLimitPolicy(6 / 3600, 3, 1, 60 / 3600, 10, 3),
+}
+
+# 导航助手的归一化问题 -> 响应，进程内缓存
+guide_cache = TTLCache(ttl=GUIDE_CACHE_TTL, max_size=512)
 # 创建缓存目录
 CACHE_DIR = os.path.join(basedir, "temp_tasks")
 if not os.path.exists(CACHE_DIR):
@@ -76,6 +115,27 @@ class Config:
     KIE_API_KEY = os.getenv("KIE_API_KEY", "")
     NGROK_DOMAIN = os.getenv("NGROK_DOMAIN", "")
 
+    # LLM 响应缓存（SQLite 文件，所有 worker 共享）
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.db"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 2000))
+
+    # LLM 网关（每个 worker）：同时进行的上游调用数、排队数和排队超时秒数
+    # gunicorn 的 --threads 应大于 LLM_MAX_CONCURRENCY + LLM_MAX_QUEUE，为页面请求留出线程
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 6))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 6))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))
+
+    # 接口限流状态（SQLite 文件，所有 worker 共享）
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(CACHE_DIR, "rate_limit.db"))
+    # 应用前的反向代理层数（如 ngrok 为 1），用于从 X-Forwarded-For 取得访客 IP
+    TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", 0))
+
+    # 敏感词词典文件（每行一个词，修改后自动重新加载）
+    SENSITIVE_WORDS_PATH = os.getenv(
+        "SENSITIVE_WORDS_PATH", os.path.join(basedir, "sensitive_words.txt")
+    )
+
     # 运行环境配置
     FLASK_ENV = os.getenv("FLASK_ENV", "development")
     HOST = os.getenv("HOST", "0.0.0.0")
@@ -134,8 +194,22 @@ def create_app(config_class=Config):
     CORS(app, supports_credentials=True)
     db.init_app(app)
     login_manager.init_app(app)
+    llm_response_cache.path = app.config["LLM_CACHE_PATH"]
+    llm_response_cache.max_entries = app.config["LLM_CACHE_MAX_ENTRIES"]
+    llm_single_flight.lock_dir = os.path.join(
+        os.path.dirname(app.config["LLM_CACHE_PATH"]), "llm_locks"
+    )
+    llm_gateway.max_concurrency = app.config["LLM_MAX_CONCURRENCY"]
+    llm_gateway.max_queue = app.config["LLM_MAX_QUEUE"]
+    llm_gateway.queue_timeout = app.config["LLM_QUEUE_TIMEOUT"]
+    rate_limiter.path = app.config["RATE_LIMIT_PATH"]
+    rate_limiter.policies = RATE_LIMIT_POLICIES
+    sensitive_filter.path = app.config["SENSITIVE_WORDS_PATH"]
+    if app.config["TRUSTED_PROXIES"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
     register_routes(app)
     register_commands(app)
+    register_rate_limit_commands(app)
 
     # 自动创建数据库表（在应用上下文中）
     with app.app_context():
@@ -149,6 +223,126 @@ def create_app(config_class=Config):
 # ==============================================================================
 # 4. 路由注册
 # ==============================================================================
+def sse_event(event, data):
+    """
+    将一个事件编码为 Server-Sent Events 格式
+
+    Args:
+        event (str): 事件名
+        data: 可 JSON 序列化的事件数据
+
+    Returns:
+        str: SSE 文本块
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    """
+    构建流式 SSE 响应
+
+    关闭代理缓冲，保证每个事件到达后立即转发给浏览器。
+
+    Args:
+        events: 产出 SSE 文本块的生成器
+
+    Returns:
+        Response: text/event-stream 响应
+    """
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def rate_limit_client():
+    """
+    当前请求的限流调用方标识：登录用户按用户 ID，访客按 IP
+
+    Returns:
+        str: 如 "user:1"、"ip:1.2.3.4"
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{request.remote_addr}"
+
+
+def acquire_rate_limit(policy_name):
+    """
+    为当前请求获取限流配额，用于只在部分分支（如调用 LLM 时）限流的接口
+
+    Args:
+        policy_name (str): RATE_LIMIT_POLICIES 中的策略名
+
+    Returns:
+        并发租约，使用完毕后调用 release()；RATE_LIMIT_ENABLED 为 False 时为空租约
+
+    Raises:
+        RateLimited: 超过限流策略，由错误处理器返回 429
+    """
+    if not current_app.config["RATE_LIMIT_ENABLED"]:
+        return rate_limiter.null_lease()
+    return rate_limiter.acquire(policy_name, rate_limit_client())
+
+
+def rate_limit(policy_name):
+    """
+    接口限流装饰器
+
+    每次请求都经过 acquire_rate_limit；超限时抛出 RateLimited，由错误处理器返回 429。
+    并发租约在视图返回后释放；流式响应在发送完毕后释放。
+
+    Args:
+        policy_name (str): RATE_LIMIT_POLICIES 中的策略名
+
+    Returns:
+        function: 装饰器
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            lease = acquire_rate_limit(policy_name)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                lease.release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(lease.release)
+            else:
+                lease.release()
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def register_rate_limit_commands(app):
+    """
+    注册限流相关的命令行命令
+
+    Args:
+        app: Flask 应用实例
+    """
+
+    @app.cli.command("rate-limit-stats")
+    @click.option("--prefix", default=None, help="只显示以此开头的键，如 lyrics:")
+    @click.option("--limit", default=100, help="最多显示的键数")
+    def rate_limit_stats_command(prefix, limit):
+        """查看各调用方的限流计数：`flask rate-limit-stats --prefix lyrics:`"""
+        stats = rate_limiter.stats(prefix=prefix, limit=limit, include_clients=True)
+        for key, item in stats["keys"].items():
+            print(
+                f"{key:<40} 放行 {item['allowed']:>6}  超速率 {item['rate_limited']:>5}  "
+                f"超并发 {item['concurrency_limited']:>5}  令牌 {item['tokens']}  "
+                f"进行中 {item['active']}"
+            )
+        print(f"共 {len(stats['keys'])} 个键。")
+
+
 def register_routes(app):
     """
     注册应用所有路由
@@ -157,6 +351,34 @@ def register_routes(app):
         app: Flask 应用实例
     """
 
+    @app.errorhandler(LLMGatewayBusy)
+    def handle_llm_gateway_busy(e):
+        """
+        LLM 网关已满时的统一响应
+
+        Returns:
+            tuple: JSON 错误响应、503 状态码和 Retry-After 响应头
+        """
+        return (
+            jsonify({"error": str(e), "retry_after": e.retry_after}),
+            503,
+            {"Retry-After": str(e.retry_after)},
+        )
+
+    @app.errorhandler(RateLimited)
+    def handle_rate_limited(e):
+        """
+        请求超过限流策略时的统一响应
+
+        Returns:
+            tuple: JSON 错误响应、429 状态码和 Retry-After 响应头
+        """
+        return (
+            jsonify({"error": str(e), "reason": e.reason, "retry_after": e.retry_after}),
+            429,
+            {"Retry-After": str(e.retry_after)},
+        )
+
     # ------------------------------------------------------------------------
     # 页面路由
     # ------------------------------------------------------------------------
@@ -294,7 +516,32 @@ def register_routes(app):
     # Agent 对话 API
     # ------------------------------------------------------------------------
 
+    def attach_chat_achievements(data, response):
+        """
+        对话里程碑成就检查，新解锁的成就写入 response["newly_unlocked"]
+
+        Args:
+            data (dict): 请求体
+            response (dict): Agent 响应字典
+        """
+        # 检查是否解锁了新成就（只对对话意图检查）
+        if (
+            current_user.is_authenticated
+            and data.get("user_input")
+            and response.get("response_type") == "text"
+        ):
+            # 对话记录已经在 agent_service 中保存，获取历史检查成就
+            chat_count = data_service.count_chat_history(current_user.id)
+            # 只在对话数为 1、10 等里程碑时检查
+            if chat_count == 1 or chat_count == 10:
+                newly_unlocked = data_service.check_and_unlock_achievements(
+                    current_user, event="chat_message"
+                )
+                if newly_unlocked:
+                    response["newly_unlocked"] = [a.to_dict() for a in newly_unlocked]
+
     @app.route("/api/agent/chat", methods=["POST"])
+    @rate_limit("chat")
     def api_agent_chat():
         """
         Agent 对话接口
@@ -330,26 +577,53 @@ def register_routes(app):
         else:
             response = result_dict_or_tuple
 
-        # 检查是否解锁了新成就（只对对话意图检查）
-        if (
-            current_user.is_authenticated
-            and data.get("user_input")
-            and response.get("response_type") == "text"
-        ):
-            # 对话记录已经在 agent_service 中保存，获取历史检查成就
-            chat_count = len(data_service.get_chat_history(current_user.id))
-            # 只在对话数为 1、10 等里程碑时检查
-            if chat_count == 1 or chat_count == 10:
-                newly_unlocked = data_service.check_and_unlock_achievements(
-                    current_user
-                )
-                if newly_unlocked:
-                    response["newly_unlocked"] = [a.to_dict() for a in newly_unlocked]
+        attach_chat_achievements(data, response)
 
         if isinstance(result_dict_or_tuple, tuple):
             return jsonify(response), status_code
         return jsonify(response)
 
+    @app.route("/api/agent/chat/stream", methods=["POST"])
+    @rate_limit("chat")
+    def api_agent_chat_stream():
+        """
+        Agent 对话接口（流式 SSE 版本）
+
+        请求体与 /api/agent/chat 相同。歌词创作确认动作会边生成边推送文本，
+        其他请求只推送一个最终结果事件。
+
+        Events:
+            delta: {"text": "文本增量"}
+            done: 与 /api/agent/chat 相同的响应字典
+            error: {"error": "错误信息", "status": 状态码}
+
+        Returns:
+            Response: text/event-stream 响应
+        """
+        data = request.json
+        events = process_agent_request_stream(
+            user_input=data.get("user_input", "").strip(),
+            history=data.get("conversation_history", []),
+            confirmed_action=data.get("confirmed_action"),
+            api_key=app.config.get("OPENROUTER_API_KEY"),
+            data_service=data_service,
+            user=current_user,
+        )
+
+        def generate():
+            try:
+                for event, payload in events:
+                    if event == "done":
+                        attach_chat_achievements(data, payload)
+                    yield sse_event(event, payload)
+            except LLMGatewayBusy as e:
+                # 响应头已发出，只能以 error 事件通知前端
+                yield sse_event(
+                    "error", {"error": str(e), "status": 503, "retry_after": e.retry_after}
+                )
+
+        return sse_response(generate())
+
     # ------------------------------------------------------------------------
     # 聊天历史 API
     # ------------------------------------------------------------------------
@@ -357,14 +631,24 @@ def register_routes(app):
     @app.route("/api/chat/history", methods=["GET"])
     def api_get_chat_history():
         """
-        获取用户聊天历史记录
+        获取用户聊天历史记录（从新到旧游标分页）
+
+        Query Parameters:
+            before: 上一页返回的 next_cursor（可选，省略时返回最近一页）
+            limit: 每页数量（默认为 50，最大 100）
 
         Returns:
-            JSON: 包含历史记录列表
+            JSON: 包含历史记录列表（按时间升序）和 next_cursor
         """
         if current_user.is_authenticated:
-            return jsonify({"history": data_service.get_chat_history(current_user.id)})
-        return jsonify({"history": []})
+            return jsonify(
+                data_service.get_chat_history_page(
+                    current_user.id,
+                    before=request.args.get("before"),
+                    limit=request.args.get("limit", 50, type=int),
+                )
+            )
+        return jsonify({"history": [], "next_cursor": None})
 
     @app.route("/api/chat/history", methods=["DELETE"])
     def api_clear_chat_history():
@@ -389,14 +673,65 @@ def register_routes(app):
 
         Query Parameters:
             q: 搜索关键词
+            limit: 返回数量上限（可选）
+            offset: 跳过的结果数（可选，默认为 0）
 
         Returns:
-            JSON: 包含歌曲列表
+            JSON: 包含按相关度排序的歌曲列表
         """
         return jsonify(
             {
                 "songs": data_service.search_songs(
-                    request.args.get("q", ""), current_user
+                    request.args.get("q", ""),
+                    current_user,
+                    limit=request.args.get("limit", type=int),
+                    offset=request.args.get("offset", 0, type=int),
+                )
+            }
+        )
+
+    @app.route("/api/search", methods=["GET"])
+    def api_search_all():
+        """
+        统一搜索（歌曲、文章、历史事件）
+
+        Query Parameters:
+            q: 搜索关键词
+            types: 逗号分隔的实体类型过滤（song,article,event，默认全部）
+            limit: 返回数量上限（默认为 20）
+
+        Returns:
+            JSON: 包含按相关度排序的混合结果列表
+        """
+        types = [t for t in request.args.get("types", "").split(",") if t]
+        return jsonify(
+            {
+                "results": data_service.search_all(
+                    request.args.get("q", ""),
+                    current_user,
+                    types=types or None,
+                    limit=request.args.get("limit", 20, type=int),
+                )
+            }
+        )
+
+    @app.route("/api/songs/suggest", methods=["GET"])
+    def api_suggest_songs():
+        """
+        搜索联想（歌曲、演唱者、地区）
+
+        Query Parameters:
+            q: 用户输入，支持汉字、全拼和拼音首字母（如 dfh）
+            limit: 返回数量上限（默认为 10）
+
+        Returns:
+            JSON: 包含联想结果列表
+        """
+        return jsonify(
+            {
+                "suggestions": data_service.suggest_songs(
+                    request.args.get("q", ""),
+                    limit=request.args.get("limit", 10, type=int),
                 )
             }
         )
@@ -416,6 +751,16 @@ def register_routes(app):
             {"songs": data_service.get_songs_by_region(region_name, current_user)}
         )
 
+    @app.route("/api/region/stats", methods=["GET"])
+    def api_get_region_stats():
+        """
+        获取各地区的歌曲数量和代表作（供地图着色）
+
+        Returns:
+            JSON: 包含地区统计列表
+        """
+        return jsonify({"regions": data_service.get_all_region_stats()})
+
     @app.route("/api/songs/favorites", methods=["GET"])
     @login_required
     def api_get_favorite_songs():
@@ -494,6 +839,7 @@ def register_routes(app):
     # ------------------------------------------------------------------------
 
     @app.route("/api/create/lyrics", methods=["POST"])
+    @rate_limit("lyrics")
     def api_create_lyrics():
         """
         生成歌词
@@ -505,6 +851,8 @@ def register_routes(app):
             JSON: 包含生成的歌词
         """
         p = request.json.get("prompt", "家乡")
+        if sensitive_filter.find(p):
+            return jsonify({"lyrics": "错误：主题含敏感词，请修改后重试"}), 400
         res = call_openrouter_api(
             app.config["OPENROUTER_API_KEY"],
             [{"role": "user", "content": f"主题：{p}"}],
@@ -512,9 +860,49 @@ def register_routes(app):
         )
         if "error" in res:
             return jsonify({"lyrics": "生成失败"}), 500
-        return jsonify({"lyrics": res["choices"][0]["message"]["content"]})
+        return jsonify(
+            {"lyrics": sensitive_filter.mask(res["choices"][0]["message"]["content"])}
+        )
+
+    @app.route("/api/create/lyrics/stream", methods=["POST"])
+    @rate_limit("lyrics")
+    def api_create_lyrics_stream():
+        """
+        生成歌词（流式 SSE 版本）
+
+        Request Body:
+            prompt: 主题提示（默认为"家乡"）
+
+        Events:
+            delta: {"text": "文本增量"}
+            done: {"lyrics": "完整歌词"}
+
+        Returns:
+            Response: text/event-stream 响应；LLM 调用失败时返回 JSON 错误和 500
+        """
+        p = request.json.get("prompt", "家乡")
+        if sensitive_filter.find(p):
+            return jsonify({"lyrics": "错误：主题含敏感词，请修改后重试"}), 400
+        res = call_openrouter_api(
+            app.config["OPENROUTER_API_KEY"],
+            [{"role": "user", "content": f"主题：{p}"}],
+            system_instruction="你是一位红歌作词家。",
+            stream=True,
+        )
+        if "error" in res:
+            return jsonify({"lyrics": "生成失败"}), 500
+
+        def generate():
+            chunks = []
+            for chunk in sensitive_filter.mask_stream(res["stream"]):
+                chunks.append(chunk)
+                yield sse_event("delta", {"text": chunk})
+            yield sse_event("done", {"lyrics": "".join(chunks) or "生成失败"})
+
+        return sse_response(generate())
 
     @app.route("/api/create/song/start", methods=["POST"])
+    @rate_limit("song")
     def api_create_song_start():
         """
         开始创建歌曲（异步调用 Kie API）
@@ -553,6 +941,8 @@ def register_routes(app):
             song_title = d.get("title", "AI Red Song")
             song_lyrics = d.get("lyrics", "")
             song_style = d.get("style", "Classical")
+            if sensitive_filter.find(f"{song_title}\n{song_lyrics}"):
+                return jsonify({"error": "标题或歌词含敏感词，请修改后重试"}), 400
 
             print(f"https://{app.config.get('NGROK_DOMAIN')}/api/kie/callback")
             p = {
@@ -570,14 +960,17 @@ def register_routes(app):
             is_relay = "api.kie.ai" not in api_host
 
             try:
-                r = requests.post(
+                # 生成任务不是幂等的，只在明确被拒绝（429）或连接失败时重试
+                r = http_client.post(
                     api_url,
+                    service="kie",
                     headers={
                         "Authorization": f"Bearer {kie_key}",
                         "Content-Type": "application/json",
                     },
                     json=p,
-                    timeout=20,
+                    timeout=(3.05, 20),
+                    retry_statuses={429},
                 )
             except requests.exceptions.ConnectionError:
                 err_msg = f"连接失败: 无法访问{'中转服务器' if is_relay else 'Kie接口'}({api_host})，请检查网络或中转服务是否开启。"
@@ -612,7 +1005,9 @@ def register_routes(app):
                 # Check for IP whitelist error
                 if code == 401 or "whitelist" in msg.lower():
                     try:
-                        my_ip = requests.get("https://api.ipify.org", timeout=2).text
+                        my_ip = http_client.get(
+                            "https://api.ipify.org", service="ipify", timeout=2, retries=0
+                        ).text
                     except:
                         my_ip = "无法自动获取"
 
@@ -717,6 +1112,8 @@ def register_routes(app):
         导航指令接口
 
         根据用户输入的问题，返回相应的导航指令或文本回复。
+        依次查询：进程内问题缓存 -> 本地 n-gram 分类器 -> LLM（带持久化响应缓存）。
+        只有调用 LLM 时才按 "chat" 策略限流。
 
         Request Body:
             query: 用户问题
@@ -724,55 +1121,76 @@ def register_routes(app):
         Returns:
             JSON: 包含 action 类型和相关参数
         """
-        q = request.json.get("query", "")
-        api_key = app.config.get("OPENROUTER_API_KEY")
-        if not q or not api_key:
+        # 归一化空白，让相同问题命中同一条缓存
+        q = " ".join(request.json.get("query", "").split())
+        if not q:
             return jsonify({"action": "text_response", "message": "请输入问题"}), 400
+        cache_key = normalize_key(q)
+        cached = guide_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+        aid = classify_guide_query(q)
+        if aid is not None:
+            tool = GUIDE_TOOLS[aid]
+            response = {
+                "action": "navigate",
+                "path": tool["path"],
+                "label": tool["label"],
+                "intro_message": tool["intro"],
+            }
+            guide_cache.set(cache_key, response)
+            return jsonify(response)
 
-        tool_map = {
-            "search_songs": {"path": "/circle", "label": "听·山河"},
-            "learn_stories": {"path": "/making", "label": "问·古今"},
-            "study_history": {"path": "/plaza", "label": "阅·峥嵘"},
-            "create_song": {"path": "/creation", "label": "谱·华章"},
-            "view_favorites": {"path": "/favorites", "label": "我的收藏"},
-            "site_info": {"path": "/", "label": "功能介绍"},
-        }
+        api_key = app.config.get("OPENROUTER_API_KEY")
+        if not api_key:
+            return jsonify({"action": "text_response", "message": "请输入问题"}), 400
         prompt = (
             "你是一个导航 AI。根据用户问题返回 JSON: "
             '{"action_id": "...", "intro_message": "..."}。可选 action_id: '
-            + ", ".join(tool_map.keys())
-        )
-        res = call_openrouter_api(
-            api_key,
-            [{"role": "user", "content": q}],
-            response_format={"type": "json_object"},
-            system_instruction=prompt,
+            + ", ".join(GUIDE_TOOLS)
         )
+        lease = acquire_rate_limit("chat")
+        try:
+            res = call_openrouter_api(
+                api_key,
+                [{"role": "user", "content": q}],
+                response_format={"type": "json_object"},
+                system_instruction=prompt,
+                cache_ttl=GUIDE_CACHE_TTL,
+            )
+        finally:
+            lease.release()
         try:
             aj = json.loads(res["choices"][0]["message"]["content"])
             aid = aj.get("action_id", "unrecognized")
-            if aid in tool_map:
-                return jsonify(
-                    {
-                        "action": "navigate",
-                        "path": tool_map[aid]["path"],
-                        "label": tool_map[aid]["label"],
-                        "intro_message": aj.get("intro_message", ""),
-                    }
-                )
-            return jsonify({"action": "text_response", "message": "抱歉，没听懂"})
+            if aid in GUIDE_TOOLS:
+                response = {
+                    "action": "navigate",
+                    "path": GUIDE_TOOLS[aid]["path"],
+                    "label": GUIDE_TOOLS[aid]["label"],
+                    "intro_message": sensitive_filter.mask(str(aj.get("intro_message", ""))),
+                }
+            else:
+                response = {"action": "text_response", "message": "抱歉，没听懂"}
+            guide_cache.set(cache_key, response)
+            return jsonify(response)
         except Exception:
             return jsonify({"action": "text_response", "message": "服务异常"}), 500
 
     @app.route("/api/region/analyze", methods=["POST"])
+    @rate_limit("chat")
     def api_analyze_region():
         """
         地区红歌分析接口
 
         根据地区名称分析该地区红歌的历史成因和艺术风格。
 
+        分析结果按地区统计（数量、代表作）缓存，歌曲变化后提示词不同，自然失效。
+
         Request Body:
             region: 地区名称
+            refresh: 为 true 时忽略缓存重新生成（可选）
 
         Returns:
             JSON: 包含地区名称、红歌数量和分析文本
@@ -782,29 +1200,27 @@ def register_routes(app):
         if not rname or not api_key:
             return jsonify({"analysis": "参数错误"}), 400
 
-        songs = (
-            Song.query.all()
-            if rname == "全国"
-            else Song.query.filter(
-                Song.region.ilike(f"%{rname.replace('省', '').replace('市', '')}%")
-            ).all()
-        )
-        if not songs:
+        stats = data_service.get_region_stats(rname)
+        if not stats or not stats["count"]:
             return jsonify({"analysis": "暂无数据"})
 
         prompt = (
             "你是一位红歌文化专家。分析该地区红歌的历史成因和艺术风格，150 字以内。"
         )
-        q = f"地区：{rname}，数量：{len(songs)}，代表作：{'、'.join([s.title for s in songs[:5]])}"
+        q = f"地区：{stats['region']}，数量：{stats['count']}，代表作：{'、'.join(stats['titles'])}"
         res = call_openrouter_api(
-            api_key, [{"role": "user", "content": q}], system_instruction=prompt
+            api_key,
+            [{"role": "user", "content": q}],
+            system_instruction=prompt,
+            cache_ttl=REGION_ANALYSIS_CACHE_TTL,
+            bypass_cache=bool(request.json.get("refresh")),
         )
         try:
             return jsonify(
                 {
                     "region": rname,
-                    "count": len(songs),
-                    "analysis": res["choices"][0]["message"]["content"],
+                    "count": stats["count"],
+                    "analysis": sensitive_filter.mask(res["choices"][0]["message"]["content"]),
                 }
             )
         except Exception:
@@ -817,12 +1233,22 @@ def register_routes(app):
     @app.route("/api/forum/posts", methods=["GET"])
     def api_get_forum_posts():
         """
-        获取论坛帖子列表
+        获取论坛帖子列表（按点赞数和时间排序，游标分页）
+
+        Query Parameters:
+            cursor: 上一页返回的 next_cursor（可选）
+            limit: 每页数量（默认为 20）
 
         Returns:
-            JSON: 包含帖子列表，每条帖子包含是否已点赞标识
+            JSON: 包含帖子列表（每条帖子包含是否已点赞标识）和 next_cursor
         """
-        return jsonify({"posts": data_service.get_forum_posts(current_user)})
+        return jsonify(
+            data_service.get_forum_posts(
+                current_user,
+                cursor=request.args.get("cursor"),
+                limit=request.args.get("limit", 20, type=int),
+            )
+        )
 
     @app.route("/api/forum/posts", methods=["POST"])
     @login_required
@@ -839,9 +1265,9 @@ def register_routes(app):
         c = request.json.get("content", "").strip()
         if not c or len(c) > 200:
             return jsonify({"error": "内容不合法"}), 400
-        for w in SENSITIVE_WORDS:
-            if w in c:
-                return jsonify({"error": f"含敏感词{w}"}), 400
+        w = sensitive_filter.find(c)
+        if w:
+            return jsonify({"error": f"含敏感词{w}"}), 400
         return jsonify(
             {"success": True, "post": data_service.add_forum_post(current_user.id, c)}
         )
@@ -897,30 +1323,19 @@ def register_routes(app):
         获取随机题目
 
         Query Parameters:
-            count: 题目数量（默认为 5）
+            count: 题目数量（默认为 5，最大 50）
+            difficulty: 难度（easy/medium/hard，可选）
 
         Returns:
-            JSON: 包含题目列表
+            JSON: 包含题目列表（排除当前用户已答对的题目）
         """
         count = int(request.args.get("count", 5))
-        questions = data_service.get_random_quiz_questions(count)
+        difficulty = request.args.get("difficulty") or None
         return jsonify(
             {
-                "questions": [
-                    {
-                        "id": q.id,
-                        "question": q.question,
-                        "option_a": q.option_a,
-                        "option_b": q.option_b,
-                        "option_c": q.option_c,
-                        "option_d": q.option_d,
-                        "correct_answer": q.correct_answer,
-                        "explanation": q.explanation,
-                        "difficulty": q.difficulty,
-                        "points": q.points,
-                    }
-                    for q in questions
-                ]
+                "questions": data_service.get_random_quiz_questions(
+                    count, current_user, difficulty
+                )
             }
         )
 
@@ -949,6 +1364,33 @@ def register_routes(app):
             return jsonify({"success": True, **result})
         return jsonify({"error": "题目不存在"}), 404
 
+    @app.route("/api/quiz/submit_round", methods=["POST"])
+    @login_required
+    def api_submit_quiz_round():
+        """
+        批量提交一轮答题
+
+        Request Body:
+            answers: 答案列表，每项包含 question_id 和 answer（A/B/C/D）
+
+        Returns:
+            JSON: 包含每题结果、本轮得分、当前总积分和新解锁的成就
+        """
+        answers = (request.json or {}).get("answers")
+        if not isinstance(answers, list) or not answers:
+            return jsonify({"error": "参数不完整"}), 400
+        if len(answers) > QUIZ_MAX_QUESTIONS:
+            return jsonify({"error": f"每轮最多提交 {QUIZ_MAX_QUESTIONS} 题"}), 400
+        try:
+            pairs = [(int(a["question_id"]), str(a["answer"])) for a in answers]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "参数格式错误"}), 400
+
+        result = data_service.submit_quiz_round(current_user, pairs)
+        if result:
+            return jsonify(result)
+        return jsonify({"error": "题目不存在"}), 404
+
     @app.route("/api/quiz/stats", methods=["GET"])
     @login_required
     def api_get_quiz_stats():
@@ -956,7 +1398,7 @@ def register_routes(app):
         获取用户答题统计
 
         Returns:
-            JSON: 包含总题数、正确数、正确率、总积分等
+            JSON: 包含总题数、正确数、正确率、答题积分、当前连对和最佳连对
         """
         stats = data_service.get_user_quiz_stats(current_user.id)
         return jsonify(stats)
@@ -1017,6 +1459,77 @@ def register_routes(app):
         leaderboard = data_service.get_leaderboard(limit)
         return jsonify(leaderboard)
 
+    @app.route("/api/cache/stats", methods=["GET"])
+    def api_get_cache_stats():
+        """
+        获取本 worker 参考数据目录缓存和 LLM 响应缓存的命中统计
+
+        Returns:
+            JSON: catalogs（目录名称 -> hits、misses、version_checks、version）、
+                  llm_responses（hits、misses、hit_rate、writes、errors、entries）
+        """
+        return jsonify(
+            {
+                "pid": os.getpid(),
+                "catalogs": data_service.get_catalog_stats(),
+                "llm_responses": llm_response_cache.stats(),
+            }
+        )
+
+    @app.route("/api/http/stats", methods=["GET"])
+    def api_get_http_stats():
+        """
+        获取本 worker 外部 HTTP 调用、LLM 请求合并和 LLM 网关的统计
+
+        Returns:
+            JSON: services（服务名 -> calls、attempts、retries、failures、avg_ms、max_ms）、
+                  single_flight（leaders、followers、lock_waits、recheck_hits）、
+                  llm_gateway（active、waiting、admitted、queued、rejected、timeouts、
+                  peak_active、peak_waiting、avg_wait_ms、max_wait_ms、avg_hold_ms）
+        """
+        return jsonify(
+            {
+                "pid": os.getpid(),
+                "services": http_client.stats(),
+                "single_flight": llm_single_flight.stats(),
+                "llm_gateway": llm_gateway.stats(),
+            }
+        )
+
+    @app.route("/api/agent/stats", methods=["GET"])
+    def api_get_agent_stats():
+        """
+        获取本 worker Agent 意图识别的统计
+
+        Returns:
+            JSON: 意图 -> local（本地规则识别次数）、llm（LLM 识别次数）、bypass_rate（LLM 跳过率）
+        """
+        return jsonify({"pid": os.getpid(), "intents": intent_stats.stats()})
+
+    @app.route("/api/ratelimit/stats", methods=["GET"])
+    def api_get_rate_limit_stats():
+        """
+        获取接口限流的策略和计数（所有 worker 合计）
+
+        不返回其他调用方的键（其中包含用户 ID 和访客 IP）；各调用方的明细
+        可在服务器上运行 `flask rate-limit-stats` 查看。
+
+        Query Parameters:
+            prefix: 只返回以此开头的键，如 "lyrics:"（可选）
+            limit: 最多返回的键数，默认 100，最大 500
+
+        Returns:
+            JSON: policies（策略名 -> 限额）、keys（"策略:*" -> allowed、rate_limited、
+                  concurrency_limited、tokens、active、last_seen）、clients（策略名 -> 调用方
+                  键数及放行、拒绝次数合计）、mine（当前调用方自己的键）、errors
+        """
+        stats = rate_limiter.stats(
+            prefix=request.args.get("prefix"), limit=request.args.get("limit", 100, type=int)
+        )
+        stats["mine"] = rate_limiter.stats(client=rate_limit_client())["keys"]
+        stats["policies"] = {name: p._asdict() for name, p in RATE_LIMIT_POLICIES.items()}
+        return jsonify(stats)
+
 
 # ==============================================================================
 # 5. 应用启动
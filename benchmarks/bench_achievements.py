@@ -0,0 +1,180 @@
+"""
+成就检查查询数基准测试
+
+在临时 SQLite 数据库中让两个新用户各提交同一组答案，统计每次提交执行的 SQL 语句数：
+- 旧实现：写入答题记录后全量扫描所有成就，逐条检查 ach in user.achievements，
+  每条规则各自执行 COUNT 查询，总积分实时聚合（按原 check_and_unlock_achievements
+  和 User.total_score 复现）
+- 新实现：DataService.submit_quiz_answer，发出 quiz_answered 事件，
+  规则引擎只评估订阅该事件的规则，每个计数器最多读取一次
+分别输出整次提交和其中成就检查部分的语句数。
+
+用法：
+    python benchmarks/bench_achievements.py [--submits 12]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _StatementCounter:
+    """统计引擎上执行的 SQL 语句数"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, *args):
+        self.count += 1
+
+
+def _legacy_total_score(user):
+    """复现旧版 User.total_score：实时聚合答题积分和成就积分"""
+    from sqlalchemy.sql import func
+
+    from database import Achievement, QuizRecord, db, user_achievements
+
+    quiz_score = db.session.query(func.sum(QuizRecord.score_earned))\
+        .filter(QuizRecord.user_id == user.id).scalar() or 0
+    achievement_score = db.session.query(func.sum(Achievement.points))\
+        .join(user_achievements, user_achievements.c.achievement_id == Achievement.id)\
+        .filter(user_achievements.c.user_id == user.id).scalar() or 0
+    return quiz_score + achievement_score
+
+
+def _legacy_check(user):
+    """复现旧版 check_and_unlock_achievements 的全量扫描"""
+    from database import (
+        Achievement, ArticleView, ChatHistory, CreatedSong, QuizRecord, db,
+    )
+
+    newly_unlocked = []
+    for ach in Achievement.query.all():
+        if ach in user.achievements:
+            continue
+        kind, value = ach.condition_type, ach.condition_value
+        if kind == "quiz_correct":
+            ok = QuizRecord.query.filter_by(user_id=user.id, is_correct=True).count() >= value
+        elif kind == "quiz_streak":
+            records = QuizRecord.query.filter_by(user_id=user.id)\
+                .order_by(QuizRecord.timestamp).limit(value).all()
+            ok = len(records) >= value and all(r.is_correct for r in records)
+        elif kind == "total_score":
+            ok = _legacy_total_score(user) >= value
+        elif kind == "favorite_songs":
+            ok = user.favorites.count() >= value
+        elif kind == "created_songs":
+            ok = QuizRecord.query.filter_by(user_id=user.id).count() >= value
+        elif kind == "chat_messages":
+            ok = ChatHistory.query.filter_by(user_id=user.id).count() >= value
+        elif kind == "learn_articles":
+            ok = ArticleView.query.filter_by(user_id=user.id).count() >= value
+        elif kind == "create_songs":
+            ok = CreatedSong.query.filter_by(user_id=user.id).count() >= value
+        elif kind == "forum_posts":
+            ok = user.posts.count() >= value
+        elif kind == "achievement_count":
+            ok = user.achievements.count() >= value
+        else:
+            ok = False
+        if ok and ach not in user.achievements:
+            user.achievements.append(ach)
+            newly_unlocked.append(ach)
+    if newly_unlocked:
+        db.session.commit()
+    return newly_unlocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成就检查查询数基准测试")
+    parser.add_argument("--submits", type=int, default=12, help="每个用户的提交次数")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.disable(logging.INFO)
+
+    from app import app
+    from database import DataService, QuizRecord, User, db
+
+    try:
+        with app.app_context():
+            data_service = DataService()
+            answer_key = data_service.get_catalog("quiz_question").answer_key
+            rng = random.Random(42)
+            answers = []
+            for question_id in rng.sample(list(answer_key), min(args.submits, len(answer_key))):
+                correct = answer_key[question_id].correct_answer
+                answers.append((question_id, correct if rng.random() < 0.8 else "Z"))
+
+            legacy_user = User(username="bench_legacy")
+            new_user = User(username="bench_new")
+            for user in (legacy_user, new_user):
+                user.set_password("bench")
+            db.session.add_all([legacy_user, new_user])
+            db.session.commit()
+
+            counter = _StatementCounter(db.engine)
+            check_counts = []
+            check_and_unlock = data_service.check_and_unlock_achievements
+
+            def counted_check(user, event=None):
+                before = counter.count
+                try:
+                    return check_and_unlock(user, event=event)
+                finally:
+                    check_counts.append(counter.count - before)
+
+            data_service.check_and_unlock_achievements = counted_check
+
+            rows = []
+            for question_id, answer in answers:
+                before = counter.count
+                db.session.add(QuizRecord(
+                    user_id=legacy_user.id,
+                    question_id=question_id,
+                    user_answer=answer,
+                    is_correct=answer == answer_key[question_id].correct_answer,
+                    score_earned=answer_key[question_id].points
+                    if answer == answer_key[question_id].correct_answer else 0,
+                ))
+                db.session.commit()
+                check_start = counter.count
+                legacy_unlocked = _legacy_check(legacy_user)
+                legacy_total = counter.count - before
+                legacy_check = counter.count - check_start
+
+                before = counter.count
+                result = data_service.submit_quiz_answer(new_user, question_id, answer)
+                new_total = counter.count - before
+                rows.append((
+                    legacy_total, legacy_check, new_total, check_counts[-1],
+                    len(legacy_unlocked), len(result["newly_unlocked"]),
+                ))
+
+            print(f"{args.submits} 次答题提交，每次执行的 SQL 语句数")
+            print(f"{'#':>3}{'旧·整次':>10}{'旧·成就检查':>12}{'新·整次':>10}{'新·成就检查':>12}"
+                  f"{'旧解锁':>8}{'新解锁':>8}")
+            for i, row in enumerate(rows, 1):
+                print(f"{i:>3}{row[0]:>10}{row[1]:>12}{row[2]:>10}{row[3]:>12}{row[4]:>8}{row[5]:>8}")
+            for label, index in (("旧·整次", 0), ("旧·成就检查", 1), ("新·整次", 2), ("新·成就检查", 3)):
+                values = [row[index] for row in rows]
+                print(f"{label}：{min(values)} ~ {max(values)}，平均 {sum(values) / len(values):.1f}")
+            unlocked = ({a.name for a in legacy_user.achievements}, {a.name for a in new_user.achievements})
+            print(f"最终解锁成就：旧 {'、'.join(sorted(unlocked[0]))}；新 {'、'.join(sorted(unlocked[1]))}")
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+导航助手分类器评测
+
+用训练集之外的标注问题评估 services/guide_classifier.classify_guide_query：
+- 标注为导航目标的问题应被本地路由到该目标，或交给 LLM（不算错误）
+- 标注为 None 的问题（成就、积分、账号操作、闲聊等导航目标无法回答的问题）
+  必须交给 LLM，本地路由即为误判
+输出误判、各目标的本地覆盖率、每条问题的后验概率和特征覆盖率，以及单次分类耗时。
+
+用法：
+    python benchmarks/bench_guide_classifier.py [-v]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.guide_classifier import (  # noqa: E402
+    GUIDE_CONFIDENCE,
+    GUIDE_MIN_FEATURE_COVERAGE,
+    GUIDE_TRAINING_DATA,
+    _model,
+    classify_guide_query,
+)
+
+# (用户问题, 期望 action_id)；None 表示应交给 LLM
+HELD_OUT = [
+    ("哪里可以听红歌", "search_songs"),
+    ("我想找几首红歌听听", "search_songs"),
+    ("帮我搜一下红歌", "search_songs"),
+    ("想听听各地的红歌", "search_songs"),
+    ("给我讲讲黄河大合唱的故事", "learn_stories"),
+    ("我想听红歌背后的历史故事", "learn_stories"),
+    ("想和红小韵聊聊天", "learn_stories"),
+    ("带我去看党史微课", "study_history"),
+    ("有没有党史视频可以看", "study_history"),
+    ("我想学习一下党史", "study_history"),
+    ("我要自己写一首歌", "create_song"),
+    ("帮我写歌词", "create_song"),
+    ("用AI创作一首歌", "create_song"),
+    ("收藏的歌曲在哪里看", "view_favorites"),
+    ("打开我的收藏夹", "view_favorites"),
+    ("这个网站都有什么功能", "site_info"),
+    ("回首页", "site_info"),
+    ("介绍一下网站", "site_info"),
+    ("在哪里看我的成就", None),
+    ("怎么删除收藏", None),
+    ("怎么取消收藏一首歌", None),
+    ("收藏的歌能下载吗", None),
+    ("我的积分在哪里看", None),
+    ("我的成就在哪", None),
+    ("积分是怎么计算的", None),
+    ("怎么修改密码", None),
+    ("怎么注册账号", None),
+    ("怎么退出登录", None),
+    ("答题入口在哪里", None),
+    ("排行榜怎么看", None),
+    ("视频打不开怎么办", None),
+    ("生成的歌曲可以下载吗", None),
+    ("你叫什么名字", None),
+    ("早上好", None),
+    ("今天是几号", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导航助手分类器评测")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每条问题的概率和覆盖率")
+    args = parser.parse_args()
+
+    training = {text for text, _ in GUIDE_TRAINING_DATA}
+    overlap = [text for text, _ in HELD_OUT if text in training]
+    assert not overlap, f"评测问题出现在训练集中：{overlap}"
+
+    per_tool = {}
+    wrong = leaked = fallback_total = 0
+    for text, expected in HELD_OUT:
+        result = classify_guide_query(text)
+        label, probability, coverage = _model.predict(text)
+        if args.verbose:
+            print(f"{text:<20}{str(expected):<16}{str(result):<16}p={probability:.2f} cov={coverage:.2f}"
+                  f"（模型判为 {label}）")
+        if expected is None:
+            fallback_total += 1
+            if result is not None:
+                leaked += 1
+                print(f"误判：{text!r} -> {result}（p={probability:.2f}，覆盖率 {coverage:.2f}）")
+            continue
+        stats = per_tool.setdefault(expected, {"total": 0, "local": 0})
+        stats["total"] += 1
+        if result is None:
+            continue
+        if result == expected:
+            stats["local"] += 1
+        else:
+            wrong += 1
+            print(f"错误：{text!r} -> {result}（期望 {expected}）")
+
+    print(f"阈值：后验概率 >= {GUIDE_CONFIDENCE}，特征覆盖率 >= {GUIDE_MIN_FEATURE_COVERAGE}")
+    print(f"{'目标':<16}{'样本':>6}{'本地路由':>10}{'覆盖率':>10}")
+    for tool, stats in per_tool.items():
+        print(f"{tool:<16}{stats['total']:>6}{stats['local']:>10}{stats['local'] / stats['total']:>10.1%}")
+    print(f"路由错误 {wrong} 条；应交给 LLM 的问题 {fallback_total} 条，误判 {leaked} 条")
+
+    repeat = 200
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, _ in HELD_OUT:
+            classify_guide_query(text)
+    elapsed_us = (time.perf_counter() - start) / (repeat * len(HELD_OUT)) * 1e6
+    print(f"平均分类耗时：{elapsed_us:.1f} µs/条")
+    assert not wrong and not leaked
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+HTTP 客户端验证
+
+启动一个可注入延迟和错误的本地桩服务，验证 services/http_client.HttpClient：
+- keep-alive：连续请求复用同一条 TCP 连接（对比每次 requests.get 新建连接）
+- 429 / 5xx：按 Retry-After 或退避时间重试，成功后返回
+- 连接阶段失败（拒绝连接）：POST 也会重试，因为请求尚未发出
+- 请求发出后连接被断开：POST 不重试（避免重复生成和计费），GET 重试
+- 读取超时：不重试
+每个场景输出桩服务收到的请求数、客户端统计和耗时，并断言预期行为。
+
+用法：
+    python benchmarks/bench_http_client.py
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_client import HttpClient  # noqa: E402
+
+
+class _Stub:
+    """桩服务：按路径注入错误，统计连接数和各场景收到的请求数"""
+
+    def __init__(self):
+        self.connections = 0
+        self.hits = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体一起发送，避免 Nagle 与延迟 ACK 叠加出 40 ms 的假延迟
+            wbufsize = -1
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def _handle(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length", 0))
+                if length:
+                    self.rfile.read(length)
+                scenario = query.get("id", url.path)
+                with stub.lock:
+                    stub.hits[scenario] = hit = stub.hits.get(scenario, 0) + 1
+
+                if url.path == "/drop":
+                    # 收到完整请求后不响应直接断开，模拟上游处理中崩溃
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if url.path == "/slow":
+                    time.sleep(float(query.get("delay", 1)))
+                status = 200
+                headers = {}
+                if url.path == "/flaky" and hit <= int(query.get("fail", 0)):
+                    status = int(query.get("status", 503))
+                    if "retry_after" in query:
+                        headers["Retry-After"] = query["retry_after"]
+                body = b'{"ok": true}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def _closed_port():
+    """获取一个没有服务监听的端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _report(name, hits, stats, elapsed, outcome):
+    """输出一个场景的结果"""
+    print(
+        f"{name:<34}上游请求 {hits:>2}  尝试 {stats['attempts']:>2}  重试 {stats['retries']:>2}  "
+        f"失败 {stats['failures']}  {elapsed * 1000:>7.1f} ms  {outcome}"
+    )
+
+
+def main():
+    logging.disable(logging.WARNING)
+    stub = _Stub()
+    client = HttpClient(backoff_base=0.05, backoff_max=0.5)
+
+    # 1. keep-alive 连接复用
+    before = stub.connections
+    start = time.perf_counter()
+    for _ in range(20):
+        client.get(f"{stub.base}/ok", service="keepalive")
+    pooled_ms = (time.perf_counter() - start) / 20 * 1000
+    pooled_connections = stub.connections - before
+    before = stub.connections
+    start = time.perf_counter()
+    for _ in range(20):
+        requests.get(f"{stub.base}/ok")
+    bare_ms = (time.perf_counter() - start) / 20 * 1000
+    bare_connections = stub.connections - before
+    print(f"keep-alive：20 次请求新建连接 {pooled_connections} 条，平均 {pooled_ms:.2f} ms；"
+          f"requests.get 新建 {bare_connections} 条，平均 {bare_ms:.2f} ms")
+    assert pooled_connections == 1 and bare_connections == 20
+
+    def run(name, method, url, expect_hits, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = client.request(method, url, service=name, **kwargs)
+            outcome = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - start
+        hits = stub.hits.get(name, 0)
+        _report(name, hits, client.stats()[name], elapsed, outcome)
+        assert hits == expect_hits, f"{name}: 期望上游请求 {expect_hits} 次，实际 {hits} 次"
+        return outcome
+
+    # 2. 429 / 5xx 重试
+    outcome = run("503x2-retry-after", "POST",
+                  f"{stub.base}/flaky?id=503x2-retry-after&fail=2&retry_after=0.1", 3)
+    assert outcome == "HTTP 200"
+    outcome = run("429x1", "POST", f"{stub.base}/flaky?id=429x1&fail=1&status=429", 2)
+    assert outcome == "HTTP 200"
+    outcome = run("500-always", "POST", f"{stub.base}/flaky?id=500-always&fail=99&status=500", 3)
+    assert outcome == "HTTP 500"
+
+    # 3. 连接阶段失败：请求没有发出，POST 也重试
+    start = time.perf_counter()
+    try:
+        client.post(f"http://127.0.0.1:{_closed_port()}/", service="refused-post")
+        outcome = "HTTP"
+    except requests.exceptions.ConnectionError as e:
+        outcome = type(e).__name__
+    _report("refused-post", 0, client.stats()["refused-post"], time.perf_counter() - start, outcome)
+    assert client.stats()["refused-post"]["attempts"] == 3
+
+    # 4. 请求发出后断开：POST 不重发，GET 重试
+    outcome = run("drop-post", "POST", f"{stub.base}/drop?id=drop-post", 1, json={"a": 1})
+    assert outcome == "ConnectionError"
+    outcome = run("drop-get", "GET", f"{stub.base}/drop?id=drop-get", 3)
+    assert outcome == "ConnectionError"
+
+    # 5. 读取超时不重试
+    outcome = run("read-timeout", "POST", f"{stub.base}/slow?id=read-timeout&delay=1", 1,
+                  timeout=(1, 0.3))
+    assert outcome == "ReadTimeout"
+
+    stub.server.shutdown()
+    print("全部场景符合预期")
+
+
+if __name__ == "__main__":
+    main()
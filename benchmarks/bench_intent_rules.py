@@ -0,0 +1,134 @@
+"""
+本地意图识别评测
+
+用带标注的样本评估 services/intent_rules.classify_intent：
+- 标注为意图的样本应被本地识别为该意图和参数
+- 标注为 None 的样本（闲聊、创作、含糊的请求）必须交给 LLM
+输出各意图的精确率、覆盖率（本地识别比例）和单次识别耗时。
+歌名索引取自初始曲库（临时 SQLite 数据库）。
+
+用法：
+    python benchmarks/bench_intent_rules.py
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (用户输入, 期望意图, 期望参数)；期望意图为 None 表示应交给 LLM
+LABELLED = [
+    ("打开收藏", "navigate", {"target": "/favorites"}),
+    ("打开我的收藏", "navigate", {"target": "/favorites"}),
+    ("我的收藏", "navigate", {"target": "/favorites"}),
+    ("去收藏夹看看", None, None),
+    ("带我去听山河", "navigate", {"target": "/circle"}),
+    ("打开听·山河", "navigate", {"target": "/circle"}),
+    ("进入听歌页面", "navigate", {"target": "/circle"}),
+    ("去问古今", "navigate", {"target": "/making"}),
+    ("打开对话页面", "navigate", {"target": "/making"}),
+    ("跳转到阅·峥嵘", "navigate", {"target": "/plaza"}),
+    ("去微课页面", "navigate", {"target": "/plaza"}),
+    ("请打开谱华章", "navigate", {"target": "/creation"}),
+    ("去创作页面吧", "navigate", {"target": "/creation"}),
+    ("回到首页", "navigate", {"target": "/"}),
+    ("首页", "navigate", {"target": "/"}),
+    ("返回主页。", "navigate", {"target": "/"}),
+    ("我想听东方红", "search_songs", {"keyword": "东方红"}),
+    ("播放《歌唱祖国》", "search_songs", {"keyword": "歌唱祖国"}),
+    ("来一首团结就是力量", "search_songs", {"keyword": "团结就是力量"}),
+    ("我想听听我和我的祖国这首歌", "search_songs", {"keyword": "我和我的祖国"}),
+    ("帮我搜索党啊亲爱的妈妈", "search_songs", {"keyword": "党啊，亲爱的妈妈"}),
+    ("放一首我的祖国吧", "search_songs", {"keyword": "我的祖国"}),
+    ("东方红", "search_songs", {"keyword": "东方红"}),
+    ("我想听陕西的歌", None, None),
+    ("我想听歌", None, None),
+    ("来点激昂的歌曲", None, None),
+    ("我想看长征的视频", "search_video", {"keyword": "长征"}),
+    ("播放关于抗日战争的纪录片", "search_video", {"keyword": "抗日战争"}),
+    ("找一下遵义会议相关的微课", "search_video", {"keyword": "遵义会议"}),
+    ("我想看视频", "search_video", {"keyword": ""}),
+    ("找找视频", "search_video", {"keyword": ""}),
+    ("看一下有哪些关于长征的视频", "search_video", {"keyword": "长征"}),
+    ("看看有什么抗美援朝的纪录片", "search_video", {"keyword": "抗美援朝"}),
+    ("搜一下有关井冈山的微课", "search_video", {"keyword": "井冈山"}),
+    ("找个视频", None, None),
+    ("看看谁唱的视频", None, None),
+    ("看看哪个视频最好看", None, None),
+    ("看一下长征是什么时候开始的视频", None, None),
+    ("给我放东方红", "search_songs", {"keyword": "东方红"}),
+    ("听一下社会主义好", "search_songs", {"keyword": "社会主义好"}),
+    ("搜索东方红的视频", "search_video", {"keyword": "东方红"}),
+    ("打开收藏页面", "navigate", {"target": "/favorites"}),
+    ("我想去写歌", None, None),
+    ("我想听东方红和歌唱祖国", None, None),
+    ("去视频页面看长征", None, None),
+    ("东方红好听吗", None, None),
+    ("东方红这首歌是怎么创作出来的", None, None),
+    ("帮我写一首关于长江的歌", None, None),
+    ("你好", None, None),
+    ("讲讲《东方红》的故事", None, None),
+    ("这个网站的功能是什么？", None, None),
+    ("长征的视频和歌曲都给我看看", None, None),
+    ("我想看一个关于毛主席在延安时期如何领导大生产运动的视频", None, None),
+]
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.disable(logging.INFO)
+
+    from app import app
+    from database import DataService
+    from services.intent_rules import classify_intent
+
+    try:
+        with app.app_context():
+            title_index = DataService().get_catalog("song").engine
+
+        per_intent = {}
+        fallback_total = fallback_leaked = 0
+        for text, intent, params in LABELLED:
+            match = classify_intent(text, title_index)
+            if intent is None:
+                fallback_total += 1
+                if match is not None:
+                    fallback_leaked += 1
+                    print(f"误识别：{text!r} -> {match.intent} {match.params}")
+                continue
+            stats = per_intent.setdefault(intent, {"total": 0, "local": 0, "correct": 0})
+            stats["total"] += 1
+            if match is None:
+                print(f"未识别：{text!r}（期望 {intent}）")
+                continue
+            stats["local"] += 1
+            if match.intent == intent and match.params == params:
+                stats["correct"] += 1
+            else:
+                print(f"错误：{text!r} -> {match.intent} {match.params}（期望 {intent} {params}）")
+
+        print(f"{'意图':<14}{'样本':>6}{'本地识别':>10}{'精确率':>10}{'覆盖率':>10}")
+        for intent, stats in per_intent.items():
+            precision = stats["correct"] / stats["local"] if stats["local"] else 0
+            coverage = stats["local"] / stats["total"]
+            print(f"{intent:<14}{stats['total']:>6}{stats['local']:>10}{precision:>10.1%}{coverage:>10.1%}")
+        print(f"应交给 LLM 的样本 {fallback_total} 条，误识别 {fallback_leaked} 条")
+
+        repeat = 200
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text, _, _ in LABELLED:
+                classify_intent(text, title_index)
+        elapsed_us = (time.perf_counter() - start) / (repeat * len(LABELLED)) * 1e6
+        print(f"平均识别耗时：{elapsed_us:.1f} µs/条")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
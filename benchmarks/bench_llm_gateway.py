@@ -0,0 +1,195 @@
+"""
+LLM 网关压测
+
+启动一个延迟固定秒数才返回的本地 OpenRouter 桩服务，再分别以 sync worker 和
+gthread worker 启动 gunicorn（3 个 worker，临时 SQLite 数据库），同时发出
+N 个 /api/create/lyrics 请求，期间每 100 ms 请求一次首页，对比：
+- 首页延迟（p50 / p95 / 最大值）：sync 模式下被 LLM 请求阻塞，gthread 模式下不受影响
+- 歌词请求的结果：200（完成）和 503（网关拒绝，带 Retry-After）的数量
+压测关闭接口限流（RATE_LIMIT_ENABLED=False），只观察 LLM 网关的效果。
+需要安装 gunicorn（Linux / macOS）。
+
+用法：
+    python benchmarks/bench_llm_gateway.py [--concurrency 50] [--delay 3]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    """获取一个空闲端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_stub(delay):
+    """启动 OpenRouter 桩服务，返回 (server, url)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            body = json.dumps(
+                {"choices": [{"message": {"role": "assistant", "content": "桩歌词"}}]}
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+
+
+def _percentile(values, p):
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _run_mode(mode, env, concurrency, threads):
+    """以指定 worker 类型启动 gunicorn 并压测，返回结果字典"""
+    port = _free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", "3", "--bind", f"127.0.0.1:{port}"]
+    if mode == "gthread":
+        cmd += ["--worker-class", "gthread", "--threads", str(threads)]
+    cmd.append("app:app")
+    proc = subprocess.Popen(
+        cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                if requests.get(base + "/", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        else:
+            raise RuntimeError("gunicorn 启动失败")
+
+        idle = []
+        for _ in range(10):
+            start = time.perf_counter()
+            requests.get(base + "/", timeout=60)
+            idle.append((time.perf_counter() - start) * 1000)
+
+        done = threading.Event()
+        loaded = []
+
+        def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    requests.get(base + "/", timeout=60)
+                except requests.RequestException:
+                    pass
+                loaded.append((time.perf_counter() - start) * 1000)
+                time.sleep(0.1)
+
+        def chat(i):
+            start = time.perf_counter()
+            try:
+                r = requests.post(
+                    base + "/api/create/lyrics", json={"prompt": f"家乡{i}"}, timeout=120
+                )
+                status = r.status_code
+            except requests.RequestException:
+                status = "error"
+            return status, time.perf_counter() - start
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        time.sleep(0.2)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(chat, range(concurrency)))
+        done.set()
+        prober.join()
+        gateway = requests.get(base + "/api/http/stats", timeout=10).json().get("llm_gateway")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return {
+        "idle_p50": _percentile(idle, 0.5),
+        "p50": _percentile(loaded, 0.5),
+        "p95": _percentile(loaded, 0.95),
+        "max": max(loaded) if loaded else 0.0,
+        "probes": len(loaded),
+        "statuses": statuses,
+        "chat_max": max(elapsed for _, elapsed in results),
+        "gateway": gateway,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 网关压测")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发歌词请求数")
+    parser.add_argument("--delay", type=float, default=3.0, help="桩服务响应延迟（秒）")
+    parser.add_argument("--threads", type=int, default=16, help="gthread 模式下每个 worker 的线程数")
+    parser.add_argument("--modes", default="sync,gthread", help="要测试的 worker 类型，逗号分隔")
+    args = parser.parse_args()
+
+    stub, stub_url = _start_stub(args.delay)
+    tmp = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        LLM_CACHE_PATH=os.path.join(tmp, "llm_cache.db"),
+        OPENROUTER_API_URL=stub_url,
+        OPENROUTER_API_KEY="bench-key",
+        FLASK_DEBUG="False",
+        RATE_LIMIT_ENABLED="False",
+    )
+    # 先在单进程中建表和导入初始数据，避免多个 worker 同时初始化
+    subprocess.run(
+        [sys.executable, "-c", "import app"], cwd=ROOT, env=env, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    try:
+        print(f"并发歌词请求 {args.concurrency} 个，桩服务延迟 {args.delay:.1f} s")
+        for mode in args.modes.split(","):
+            r = _run_mode(mode, env, args.concurrency, args.threads)
+            print(f"\n[{mode}]")
+            print(f"  空闲时首页 p50：{r['idle_p50']:.1f} ms")
+            print(
+                f"  压测中首页（{r['probes']} 次）：p50 {r['p50']:.1f} ms，"
+                f"p95 {r['p95']:.1f} ms，最大 {r['max']:.1f} ms"
+            )
+            print(f"  歌词请求状态：{r['statuses']}，最慢 {r['chat_max']:.1f} s")
+            if r["gateway"]:
+                print(f"  某个 worker 的网关统计：{r['gateway']}")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
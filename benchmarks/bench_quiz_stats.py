@@ -0,0 +1,96 @@
+"""
+答题统计基准测试
+
+在临时 SQLite 数据库中构造若干各持有上万条答题记录的用户，对比：
+- 旧实现：加载用户全部 QuizRecord 后在 Python 中统计
+- SQL 聚合重建：rebuild_quiz_stats() 一次性重建所有用户的统计行
+- 新实现：get_user_quiz_stats() 按主键读取统计物化行
+
+用法：
+    python benchmarks/bench_quiz_stats.py --users 5 --records 12000
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _timed(fn, repeat):
+    """执行 repeat 次并返回 (平均毫秒, 最后一次结果)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="答题统计基准测试")
+    parser.add_argument("--users", type=int, default=5, help="用户数")
+    parser.add_argument("--records", type=int, default=12000, help="每个用户的答题记录数")
+    parser.add_argument("--repeat", type=int, default=20, help="每项计时的重复次数")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.disable(logging.INFO)
+
+    from app import app
+    from database import DataService, QuizQuestion, QuizRecord, User, db
+
+    try:
+        with app.app_context():
+            question_ids = [q.id for q in QuizQuestion.query.all()]
+            users = [User(username=f"bench{i}") for i in range(args.users)]
+            for user in users:
+                user.set_password("bench")
+            db.session.add_all(users)
+            db.session.commit()
+
+            rng = random.Random(42)
+            for user in users:
+                rows = []
+                for _ in range(args.records):
+                    is_correct = rng.random() < 0.7
+                    rows.append({
+                        "user_id": user.id,
+                        "question_id": rng.choice(question_ids),
+                        "user_answer": "A",
+                        "is_correct": is_correct,
+                        "score_earned": 10 if is_correct else 0,
+                    })
+                db.session.execute(QuizRecord.__table__.insert(), rows)
+            db.session.commit()
+
+            data_service = DataService()
+            rebuild_ms, count = _timed(data_service.rebuild_quiz_stats, 1)
+            print(f"{args.users} 个用户 x {args.records} 条记录")
+            print(f"SQL 聚合重建统计表：{rebuild_ms:.1f} ms（{count} 行）")
+
+            user_id = users[0].id
+
+            def legacy():
+                records = QuizRecord.query.filter_by(user_id=user_id).all()
+                correct = sum(1 for r in records if r.is_correct)
+                return len(records), correct, sum(r.score_earned for r in records)
+
+            legacy_ms, legacy_result = _timed(legacy, args.repeat)
+            stats_ms, stats = _timed(lambda: data_service.get_user_quiz_stats(user_id), args.repeat)
+            db.session.remove()
+            assert legacy_result == (
+                stats["total_answered"], stats["total_correct"], stats["total_score_from_quiz"]
+            )
+            print(f"旧实现（加载全部记录）：{legacy_ms:.2f} ms/次")
+            print(f"新实现（读取统计行）：{stats_ms:.3f} ms/次")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+LLM 请求合并压测
+
+启动一个本地的 OpenRouter 模拟服务（每次请求固定延迟），然后：
+- 进程内：N 个线程同时发起相同的地区分析请求
+- 跨进程：P 个 fork 出的进程（模拟 gunicorn worker）各用 N 个线程同时发起另一条相同请求
+统计模拟服务实际收到的请求数，两种场景都应为 1。
+- 不同请求：N 个线程同时发起互不相同的请求，每条请求各自的文件锁互不阻塞，
+  总耗时应接近一次上游延迟
+
+用法：
+    python benchmarks/bench_single_flight.py --threads 30 --processes 3 --latency 0.5
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.llm_service as llm_service  # noqa: E402
+from services.llm_cache import llm_response_cache  # noqa: E402
+from services.llm_gateway import llm_gateway  # noqa: E402
+from services.single_flight import llm_single_flight  # noqa: E402
+
+
+def start_stub(latency, counter):
+    """启动模拟服务，返回接口地址"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with counter.get_lock():
+                counter.value += 1
+            time.sleep(latency)
+            body = json.dumps({"choices": [{"message": {"content": "分析结果"}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class Server(ThreadingHTTPServer):
+        request_queue_size = 128  # 不同请求场景会同时建立多条连接
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def burst(question, threads, start_barrier=None, distinct=False):
+    """用 threads 个线程同时发起请求（distinct 为 True 时各不相同），返回 (成功数, 耗时毫秒)"""
+    results = []
+    ready = threading.Barrier(threads)
+
+    def worker(i):
+        ready.wait()
+        res = llm_service.call_openrouter_api(
+            "bench-key",
+            [{"role": "user", "content": f"{question}{i}" if distinct else question}],
+            system_instruction="你是一位红歌文化专家。",
+            cache_ttl=600,
+        )
+        results.append("choices" in res)
+
+    if start_barrier is not None:
+        start_barrier.wait()
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(results), (time.perf_counter() - start) * 1000
+
+
+def child(question, threads, start_barrier, queue):
+    """跨进程场景中的单个 worker 进程"""
+    before = llm_single_flight.stats()  # fork 时继承了父进程的统计
+    ok, elapsed = burst(question, threads, start_barrier)
+    stats = {k: v - before[k] for k, v in llm_single_flight.stats().items()}
+    queue.put((os.getpid(), ok, elapsed, stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 请求合并压测")
+    parser.add_argument("--threads", type=int, default=30, help="每个进程的并发线程数")
+    parser.add_argument("--processes", type=int, default=3, help="跨进程场景的进程数")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟服务的响应延迟（秒）")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp()
+    ctx = multiprocessing.get_context("fork")
+    counter = ctx.Value("i", 0)
+    try:
+        llm_service.OPENROUTER_API_URL = start_stub(args.latency, counter)
+        llm_response_cache.path = os.path.join(workdir, "llm_cache.db")
+        llm_single_flight.lock_dir = os.path.join(workdir, "llm_locks")
+
+        ok, elapsed = burst("地区：陕西", args.threads)
+        print(f"进程内：{args.threads} 个并发请求，成功 {ok}，上游请求 {counter.value} 次，"
+              f"耗时 {elapsed:.0f} ms")
+        print(f"  合并统计：{llm_single_flight.stats()}")
+
+        counter.value = 0
+        start_barrier = ctx.Barrier(args.processes)
+        queue = ctx.Queue()
+        procs = [
+            ctx.Process(target=child, args=("地区：江西", args.threads, start_barrier, queue))
+            for _ in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+        reports = [queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+        total = sum(r[1] for r in reports)
+        print(f"跨进程：{args.processes} 个进程 x {args.threads} 个并发请求，成功 {total}，"
+              f"上游请求 {counter.value} 次")
+        for pid, ok, elapsed, stats in reports:
+            print(f"  pid {pid}：耗时 {elapsed:.0f} ms，合并统计 {stats}")
+
+        counter.value = 0
+        llm_gateway.max_concurrency = args.threads
+        before = llm_single_flight.stats()
+        ok, elapsed = burst("地区：湖南", args.threads, distinct=True)
+        stats = {k: v - before[k] for k, v in llm_single_flight.stats().items()}
+        print(f"不同请求：{args.threads} 个并发请求，成功 {ok}，上游请求 {counter.value} 次，"
+              f"耗时 {elapsed:.0f} ms")
+        print(f"  合并统计：{stats}")
+        assert ok == counter.value == args.threads and not stats["lock_waits"]
+        assert elapsed < args.latency * 1000 * 2
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+歌曲搜索基准测试
+
+在临时 SQLite 数据库中构造合成曲库（默认 10 万首，歌名、演唱者、地区和描述由常见词随机组合），
+对比 DataService.search_songs 的两条路径（每页 limit 条）：
+- LIKE：旧实现，ilike('%q%') 匹配标题和演唱者，全表扫描，不排序
+- FTS5：统一全文索引（字符二元组）按 bm25 排序
+同时输出全量重建全文索引的耗时。
+
+用法：
+    python benchmarks/bench_song_search.py [--songs 100000] [--limit 20]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 合成歌名的词素，搜索词既有罕见组合也有高频词
+TITLE_WORDS = [
+    "祖国", "东方", "红旗", "长江", "黄河", "太阳", "春天", "英雄", "战士", "故乡", "山歌", "延安",
+    "井冈山", "北京", "青春", "人民", "军民", "团结", "光明", "明天", "大地", "草原", "雪山", "海洋",
+]
+TITLE_SUFFIXES = ["之歌", "颂", "赞", "进行曲", "谣", "情", "恋", "梦", "的早晨", "在前进"]
+ARTISTS = ["合唱团", "歌舞团", "文工团", "民族乐团", "青年歌手", "少儿合唱团"]
+REGIONS = ["北京", "陕西", "江西", "湖南", "四川", "贵州", "内蒙古", "新疆", "西藏", "上海"]
+# 前两个不在合成曲库中（LIKE 需要扫描全表，FTS5 还会命中描述），其余在合成曲库中依次更常见
+QUERIES = ["义勇军进行曲", "南泥湾", "东方红", "英雄战士", "井冈山", "延安", "祖国"]
+
+
+def _timed(fn, repeat):
+    """执行 repeat 次并返回 (平均毫秒, 最后一次结果)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="歌曲搜索基准测试")
+    parser.add_argument("--songs", type=int, default=100000, help="合成歌曲数")
+    parser.add_argument("--limit", type=int, default=20, help="每页结果数")
+    parser.add_argument("--repeat", type=int, default=10, help="每项计时的重复次数")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.disable(logging.INFO)
+
+    from app import app
+    import database
+    from database import DataService, Song, db, rebuild_search_fts
+
+    try:
+        with app.app_context():
+            rng = random.Random(42)
+            rows = []
+            for i in range(args.songs):
+                words = rng.sample(TITLE_WORDS, rng.choice((1, 2)))
+                region = rng.choice(REGIONS)
+                rows.append({
+                    "title": "".join(words) + rng.choice(TITLE_SUFFIXES),
+                    "artist": f"{region}{rng.choice(ARTISTS)}",
+                    "region": region,
+                    "description": f"一首歌唱{rng.choice(TITLE_WORDS)}的作品，编号 {i}",
+                })
+            db.session.execute(Song.__table__.insert(), rows)
+            db.session.commit()
+            total = Song.query.count()
+
+            rebuild_ms, indexed = _timed(rebuild_search_fts, 1)
+            print(f"曲库 {total} 首（合成 {args.songs} 首），每页 {args.limit} 条")
+            print(f"全量重建全文索引：{rebuild_ms / 1000:.1f} s（{indexed} 行）")
+
+            data_service = DataService()
+            data_service.get_catalog("song")
+            print(f"{'搜索词':<10}{'LIKE':>12}{'FTS5':>12}{'LIKE 命中':>10}{'FTS5 命中':>10}")
+            for query in QUERIES:
+                def search():
+                    return data_service.search_songs(query, None, limit=args.limit)
+
+                database._search_fts_state["enabled"] = False
+                like_ms, like_result = _timed(search, args.repeat)
+                database._search_fts_state["enabled"] = True
+                fts_ms, fts_result = _timed(search, args.repeat)
+                print(
+                    f"{query:<10}{like_ms:>10.2f}ms{fts_ms:>10.2f}ms"
+                    f"{len(like_result):>10}{len(fts_result):>10}"
+                )
+            print("注：LIKE 在凑满一页后即停止扫描且不排序，高频词上可能比按相关度排序的 FTS5 更快")
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
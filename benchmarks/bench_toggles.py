@@ -0,0 +1,183 @@
+"""
+收藏 / 点赞切换压测
+
+在临时 SQLite 数据库中验证 DataService.toggle_favorite_status 和 toggle_post_like：
+- 语句数：用户已收藏 10 ~ 10000 首歌、帖子已有 10 ~ 10000 个赞时，
+  每次切换执行的 SQL 语句数保持不变
+- 并发：多个进程（模拟 gunicorn worker）同时对同一首歌、同一个帖子反复切换，
+  不出现主键冲突等错误，结束后收藏状态与切换次数的奇偶一致，
+  like_count 与点赞表行数一致
+
+用法：
+    python benchmarks/bench_toggles.py [--sizes 10,1000,10000] [--procs 4] [--toggles 50]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 切换本身写入的表
+_TOGGLE_TABLES = ("user_favorites", "post_likes", "forum_post ")
+
+
+def _count_statements(engine, fn):
+    """执行 fn 并返回 (切换本身的写语句数, 全部 SQL 语句数)
+
+    全部语句还包括提交后重新加载歌曲属性、收藏时的成就检查和解锁。
+    """
+    from sqlalchemy import event
+
+    writes, total = [0], [0]
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        total[0] += 1
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb in ("INSERT", "UPDATE", "DELETE") and any(
+            table in statement for table in _TOGGLE_TABLES
+        ):
+            writes[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return writes[0], total[0]
+
+
+def _worker(args):
+    """子进程：对同一首歌和同一个帖子反复切换，返回 (成功次数, 错误列表)"""
+    user_id, liker_id, song_id, post_id, toggles = args
+    from app import app
+    from database import DataService, Song, User, db
+
+    done, errors = 0, []
+    with app.app_context():
+        # fork 继承的连接不能跨进程使用
+        db.engine.dispose(close=False)
+        data_service = DataService()
+        for _ in range(toggles):
+            try:
+                user = db.session.get(User, user_id)
+                data_service.toggle_favorite_status(user, db.session.get(Song, song_id))
+                data_service.toggle_post_like(post_id, db.session.get(User, liker_id))
+                done += 1
+            except Exception as e:  # noqa: BLE001 - 压测需要统计所有错误
+                db.session.rollback()
+                errors.append(f"{type(e).__name__}: {e}"[:120])
+    return done, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="收藏 / 点赞切换压测")
+    parser.add_argument("--sizes", default="10,1000,10000", help="已有收藏数 / 点赞数，逗号分隔")
+    parser.add_argument("--procs", type=int, default=4, help="并发进程数")
+    parser.add_argument("--toggles", type=int, default=50, help="每个进程的切换次数")
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.disable(logging.WARNING)
+
+    from app import app
+    from database import DataService, ForumPost, Song, User, db, post_likes, user_favorites
+
+    try:
+        with app.app_context():
+            sizes = [int(s) for s in args.sizes.split(",")]
+            max_size = max(sizes)
+            db.session.execute(
+                Song.__table__.insert(),
+                [{"title": f"压测歌曲{i}", "artist": "压测"} for i in range(max_size + 1)],
+            )
+            db.session.execute(
+                User.__table__.insert(),
+                [
+                    {"username": f"bench{i}", "password_hash": "x"}
+                    for i in range(max_size + args.procs + 1)
+                ],
+            )
+            db.session.commit()
+            song_ids = [row[0] for row in db.session.query(Song.id).order_by(Song.id.desc())]
+            user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+            data_service = DataService()
+
+            print("每次切换的语句数（写语句 / 全部语句）")
+            print(f"{'已有数量':>8}{'收藏':>12}{'取消收藏':>10}{'点赞':>12}{'取消点赞':>10}")
+            for i, size in enumerate(sizes):
+                user = db.session.get(User, user_ids[i])
+                db.session.execute(
+                    user_favorites.insert(),
+                    [{"user_id": user.id, "song_id": sid} for sid in song_ids[1:size + 1]],
+                )
+                post = ForumPost(user_id=user.id, content=f"压测帖子{size}")
+                db.session.add(post)
+                db.session.flush()
+                db.session.execute(
+                    post_likes.insert(),
+                    [{"user_id": uid, "post_id": post.id} for uid in user_ids[-size:]],
+                )
+                post.like_count = size
+                db.session.commit()
+
+                song = db.session.get(Song, song_ids[0])
+                liker = db.session.get(User, user_ids[i])
+                engine = db.engine
+                counts = []
+                for fn in (
+                    lambda: data_service.toggle_favorite_status(user, song),
+                    lambda: data_service.toggle_favorite_status(user, song),
+                    lambda: data_service.toggle_post_like(post.id, liker),
+                    lambda: data_service.toggle_post_like(post.id, liker),
+                ):
+                    writes, total = _count_statements(engine, fn)
+                    counts.append(f"{writes} / {total}")
+                print(f"{size:>8}{counts[0]:>12}{counts[1]:>10}{counts[2]:>12}{counts[3]:>10}")
+
+            # 并发切换：所有进程操作同一用户的同一首歌，以及同一个点赞者对同一帖子
+            user_id, liker_id = user_ids[0], user_ids[1]
+            song_id = song_ids[0]
+            post_id = ForumPost.query.order_by(ForumPost.id).first().id
+            was_favorite = db.session.query(user_favorites).filter_by(
+                user_id=user_id, song_id=song_id
+            ).count()
+            db.session.remove()
+            db.engine.dispose()
+
+        jobs = [(user_id, liker_id, song_id, post_id, args.toggles)] * args.procs
+        start = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(args.procs) as pool:
+            results = pool.map(_worker, jobs)
+        elapsed = time.perf_counter() - start
+        done = sum(r[0] for r in results)
+        errors = [e for r in results for e in r[1]]
+
+        with app.app_context():
+            is_favorite = db.session.query(user_favorites).filter_by(
+                user_id=user_id, song_id=song_id
+            ).count()
+            like_rows = db.session.query(post_likes).filter_by(post_id=post_id).count()
+            like_count = db.session.get(ForumPost, post_id).like_count
+        print(
+            f"\n并发：{args.procs} 个进程 x {args.toggles} 次切换，完成 {done} 次，"
+            f"错误 {len(errors)} 次，耗时 {elapsed:.2f} s"
+        )
+        for error in sorted(set(errors)):
+            print(f"  {error}")
+        expected_favorite = (was_favorite + done) % 2
+        print(f"收藏状态：{is_favorite}（期望 {expected_favorite}）")
+        print(f"like_count：{like_count}，点赞表行数：{like_rows}")
+        assert not errors and is_favorite == expected_favorite and like_count == like_rows
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,28 @@
 用于封装所有数据库查询和操作逻辑。
 """
 
+import base64
+from collections import namedtuple
 from datetime import datetime
+import json
 import logging
 
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from pytz import timezone
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.orm import Session, object_session
 from sqlalchemy.sql import func
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from services.achievement_engine import AchievementEngine
+from services.cache_service import TTLCache, VersionedCache
+from services.intent_rules import SongTitleIndex
+from services.region_dict import REGION_NAMES, REGIONS, resolve_region, resolve_region_ids
+from services.search_index import build_match_query, tokenize_for_index
+from services.suggest_index import song_suggest_index
+
 # 创建数据库实例
 db = SQLAlchemy()
 CST = timezone("Asia/Shanghai")
@@ -21,6 +34,20 @@ CST = timezone("Asia/Shanghai")
 # 创建日志记录器
 logger = logging.getLogger(__name__)
 
+# 排行榜结果缓存（按类型和 limit 分键），积分变动提交后主动失效
+LEADERBOARD_CACHE_TTL = 5
+LEADERBOARD_MAX_LIMIT = 100
+_leaderboard_cache = TTLCache(ttl=LEADERBOARD_CACHE_TTL)
+
+# 参考数据目录缓存两次比对内容版本号之间的最短间隔（秒）
+REFERENCE_VERSION_CHECK_INTERVAL = 1.0
+
+# 单次抽题数量上限
+QUIZ_MAX_QUESTIONS = 50
+
+# 地区统计表中每个地区保留的代表作数量
+REGION_REPRESENTATIVE_TITLES = 5
+
 
 # ==============================================================================
 # 关联表 (Association Tables)
@@ -47,6 +74,14 @@ user_achievements = db.Table(
     db.Column('achievement_id', db.Integer, db.ForeignKey('achievement.id'), primary_key=True)
 )
 
+# 歌曲地区映射表（地区 ID 见 services/region_dict.py，一首歌可对应多个地区）
+song_region = db.Table(
+    'song_region',
+    db.Column('song_id', db.Integer, db.ForeignKey('song.id'), primary_key=True),
+    db.Column('region_id', db.Integer, primary_key=True),
+    db.Index('ix_song_region_region_id', 'region_id', 'song_id')
+)
+
 # ==============================================================================
 # 数据库模型 (Database Models)
 # ==============================================================================
@@ -62,7 +97,7 @@ class User(UserMixin, db.Model):
         id: 用户唯一标识符
         username: 用户名（最多 15 个字符，唯一）
         password_hash: 密码哈希值
-        total_score: 用户总积分（计算属性，答题积分 + 成就积分）
+        total_score: 用户总积分（读取 user_score 物化表，答题积分 + 成就积分）
         favorites: 用户收藏的歌曲关系
         liked_posts: 用户点赞的帖子关系
         achievements: 用户解锁的成就关系
@@ -74,23 +109,17 @@ class User(UserMixin, db.Model):
     @property
     def total_score(self):
         """
-        计算用户总积分（答题积分 + 成就积分）
+        获取用户总积分（答题积分 + 成就积分）
+        
+        读取物化的 user_score 行，避免每次实时聚合。
         
         Returns:
             int: 用户总积分
         """
-        # 答题积分
-        quiz_score = db.session.query(func.sum(QuizRecord.score_earned))\
-            .filter(QuizRecord.user_id == self.id)\
-            .scalar() or 0
-        
-        # 成就积分
-        achievement_score = db.session.query(func.sum(Achievement.points))\
-            .join(user_achievements, user_achievements.c.achievement_id == Achievement.id)\
-            .filter(user_achievements.c.user_id == self.id)\
-            .scalar() or 0
-        
-        return (quiz_score or 0) + (achievement_score or 0)
+        total = db.session.query(UserScore.total_score)\
+            .filter(UserScore.user_id == self.id)\
+            .scalar()
+        return total or 0
     
     # 关系定义
     favorites = db.relationship(
@@ -144,6 +173,7 @@ class ForumPost(db.Model):
         content: 帖子内容
         timestamp: 发布时间（中国时区）
         user_id: 发布者用户 ID
+        like_count: 点赞数（冗余计数，随点赞/取消点赞维护）
         user: 发布者关系
     """
     id = db.Column(db.Integer, primary_key=True, comment='帖子唯一标识')
@@ -159,40 +189,56 @@ class ForumPost(db.Model):
         nullable=False,
         comment='发布者用户 ID'
     )
+    like_count = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+        comment='点赞数'
+    )
     user = db.relationship(
         'User',
         backref=db.backref('posts', lazy='dynamic', overlaps="liked_posts,liked_by")
     )
 
-    def to_dict(self, current_user=None):
+    def to_dict(self, current_user=None, is_liked=None, username=None):
         """
         将帖子转换为字典格式
         
         Args:
             current_user: 当前登录用户对象（可选）
+            is_liked: 预先批量查询的点赞状态（可选，省略时单独查询）
+            username: 预先查询的发布者用户名（可选，省略时加载 user 关系）
             
         Returns:
             dict: 包含帖子信息的字典，包括当前用户是否已点赞
         """
-        # 计算点赞数
-        like_count = self.liked_by.count()
         # 判断当前用户是否已赞
-        is_liked = False
-        if current_user and current_user.is_authenticated:
-            # 检查当前用户是否在 liked_by 列表中
-            # 使用 query 避免加载所有用户
-            is_liked = self.liked_by.filter(post_likes.c.user_id == current_user.id).count() > 0
+        if is_liked is None:
+            is_liked = False
+            if current_user and current_user.is_authenticated:
+                is_liked = db.session.query(post_likes.c.post_id).filter(
+                    post_likes.c.post_id == self.id,
+                    post_likes.c.user_id == current_user.id
+                ).first() is not None
 
         return {
             'id': self.id,
             'content': self.content,
-            'username': self.user.username,
+            'username': username if username is not None else self.user.username,
             'user_id': self.user_id,
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'like_count': like_count,
+            'like_count': self.like_count or 0,
             'is_liked': is_liked
         }
 
+# 论坛热度排序索引：点赞数降序、时间降序
+forum_post_feed_index = db.Index(
+    'ix_forum_post_like_count_timestamp',
+    ForumPost.like_count.desc(),
+    ForumPost.timestamp.desc()
+)
+
 # ==============================================================================
 # 数据库模型 (Database Models)
 # ==============================================================================
@@ -296,6 +342,182 @@ class HistoricalEvent(db.Model):
             'detailed_description': self.detailed_description
         }
     
+# ==============================================================================
+# 统一全文检索 (Full-Text Search)
+# ==============================================================================
+
+# 歌曲、文章、历史事件共用一张 FTS5 虚拟表，各列存放分词后的文本。
+# rowid = 实体 ID * 4 + 类型编码，按类型过滤和回查实体都无需额外列。
+SEARCH_TYPE_CODES = {'song': 1, 'article': 2, 'event': 3}
+SEARCH_TYPES_BY_CODE = {code: name for name, code in SEARCH_TYPE_CODES.items()}
+# bm25 列权重：标题 > 副标题 > 正文
+SEARCH_FTS_RANK = 'bm25(search_fts, 10.0, 5.0, 1.0)'
+_search_fts_state = {'enabled': False}
+
+
+def _search_fts_row(entity_type, entity):
+    """
+    生成实体在 search_fts 中的一行（私有函数）
+    
+    Args:
+        entity_type: 实体类型（song/article/event）
+        entity: 歌曲、文章或历史事件对象
+        
+    Returns:
+        dict: rowid 和各列分词文本
+    """
+    if entity_type == 'song':
+        fields = (entity.title, f"{entity.artist or ''} {entity.region or ''}", entity.description)
+    elif entity_type == 'article':
+        fields = (entity.title, '', entity.summary)
+    else:
+        fields = (
+            entity.event_description,
+            str(entity.year) if entity.year is not None else '',
+            entity.detailed_description
+        )
+    title, subtitle, body = (tokenize_for_index(f) for f in fields)
+    return {
+        'rowid': entity.id * 4 + SEARCH_TYPE_CODES[entity_type],
+        'title': title,
+        'subtitle': subtitle,
+        'body': body
+    }
+
+
+_SEARCH_FTS_INSERT = text(
+    'INSERT INTO search_fts(rowid, title, subtitle, body) '
+    'VALUES (:rowid, :title, :subtitle, :body)'
+)
+_SEARCH_FTS_DELETE = text('DELETE FROM search_fts WHERE rowid = :rowid')
+
+
+def _register_search_fts_sync(model, entity_type):
+    """
+    为模型注册全文索引同步监听（bulk_save_objects 不触发，由 ensure_search_fts 兜底）
+    
+    Args:
+        model: 模型类
+        entity_type: 实体类型
+    """
+    def sync(mapper, connection, entity):
+        if _search_fts_state['enabled']:
+            row = _search_fts_row(entity_type, entity)
+            connection.execute(_SEARCH_FTS_DELETE, {'rowid': row['rowid']})
+            connection.execute(_SEARCH_FTS_INSERT, row)
+
+    def delete(mapper, connection, entity):
+        if _search_fts_state['enabled']:
+            rowid = entity.id * 4 + SEARCH_TYPE_CODES[entity_type]
+            connection.execute(_SEARCH_FTS_DELETE, {'rowid': rowid})
+
+    db.event.listen(model, 'after_insert', sync)
+    db.event.listen(model, 'after_update', sync)
+    db.event.listen(model, 'after_delete', delete)
+
+
+_register_search_fts_sync(Song, 'song')
+_register_search_fts_sync(Article, 'article')
+_register_search_fts_sync(HistoricalEvent, 'event')
+
+# ==============================================================================
+# 地区索引 (Region Index)
+# ==============================================================================
+
+class RegionStats(db.Model):
+    """
+    地区统计表
+    
+    按地区预先汇总歌曲数量和代表作，地图和地区分析接口直接按地区 ID 读取。
+    歌曲增删改时由监听器在同一事务中刷新受影响的地区，
+    可通过 `flask rebuild-region-index` 从歌曲表重建。
+    
+    Attributes:
+        region_id: 地区 ID（主键）
+        name: 地区规范名称
+        song_count: 歌曲数量
+        representative_titles: 代表作标题（JSON 数组，按歌曲 ID 升序）
+    """
+    region_id = db.Column(db.Integer, primary_key=True, comment='地区 ID')
+    name = db.Column(db.String(20), nullable=False, comment='地区规范名称')
+    song_count = db.Column(db.Integer, nullable=False, default=0, comment='歌曲数量')
+    representative_titles = db.Column(db.Text, nullable=False, default='[]', comment='代表作标题')
+
+    def to_dict(self):
+        """
+        将地区统计转换为字典格式
+        
+        Returns:
+            dict: 包含地区 ID、名称、歌曲数量和代表作的字典
+        """
+        return {
+            'region_id': self.region_id,
+            'region': self.name,
+            'count': self.song_count,
+            'titles': json.loads(self.representative_titles)
+        }
+
+
+def _refresh_region_stats(connection, region_ids):
+    """
+    按 song_region 重新汇总指定地区的统计行（私有函数）
+    
+    Args:
+        connection: 数据库连接（与写入歌曲处于同一事务）
+        region_ids: 需要刷新的地区 ID 集合
+    """
+    stats = RegionStats.__table__
+    for region_id in region_ids:
+        count = connection.execute(
+            db.select(func.count()).select_from(song_region)
+            .where(song_region.c.region_id == region_id)
+        ).scalar()
+        titles = connection.execute(
+            db.select(Song.title)
+            .join(song_region, song_region.c.song_id == Song.id)
+            .where(song_region.c.region_id == region_id)
+            .order_by(Song.id)
+            .limit(REGION_REPRESENTATIVE_TITLES)
+        ).scalars().all()
+        values = {'song_count': count, 'representative_titles': json.dumps(titles, ensure_ascii=False)}
+        connection.execute(
+            sqlite_insert(stats)
+            .values(region_id=region_id, name=REGION_NAMES[region_id], **values)
+            .on_conflict_do_update(index_elements=[stats.c.region_id], set_=values)
+        )
+
+
+@db.event.listens_for(Song, 'after_insert')
+@db.event.listens_for(Song, 'after_update')
+def _sync_song_region(mapper, connection, song):
+    """歌曲新增或修改地区、标题后更新地区映射和统计"""
+    state = inspect(song)
+    if not (state.attrs.region.history.has_changes() or state.attrs.title.history.has_changes()):
+        return
+    old_ids = set(connection.execute(
+        db.select(song_region.c.region_id).where(song_region.c.song_id == song.id)
+    ).scalars())
+    new_ids = set(resolve_region_ids(song.region))
+    if old_ids != new_ids:
+        connection.execute(song_region.delete().where(song_region.c.song_id == song.id))
+        if new_ids:
+            connection.execute(
+                song_region.insert(),
+                [{'song_id': song.id, 'region_id': region_id} for region_id in new_ids]
+            )
+    _refresh_region_stats(connection, old_ids | new_ids)
+
+
+@db.event.listens_for(Song, 'after_delete')
+def _delete_song_region(mapper, connection, song):
+    """歌曲删除后移除地区映射并刷新统计"""
+    old_ids = set(connection.execute(
+        db.select(song_region.c.region_id).where(song_region.c.song_id == song.id)
+    ).scalars())
+    connection.execute(song_region.delete().where(song_region.c.song_id == song.id))
+    _refresh_region_stats(connection, old_ids)
+
+
 class ChatHistory(db.Model):
     """
     聊天记录模型
@@ -338,6 +560,36 @@ class ChatHistory(db.Model):
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+class ChatSummary(db.Model):
+    """
+    聊天滚动摘要模型
+    
+    保存每个用户较早对话的压缩摘要，Agent 构建上下文时用它代替滑出窗口的对话；
+    只有滑出窗口且尚未摘要的对话积累到一定轮数时才重新生成。
+    
+    Attributes:
+        user_id: 用户 ID（主键）
+        summary: 摘要文本
+        last_chat_id: 摘要已覆盖的最后一条聊天记录 ID
+        updated_at: 更新时间
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户 ID')
+    summary = db.Column(db.Text, nullable=False, default='', comment='摘要文本')
+    last_chat_id = db.Column(db.Integer, nullable=False, default=0, comment='已覆盖的最后一条聊天记录 ID')
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.now(CST),
+        onupdate=lambda: datetime.now(CST),
+        comment='更新时间'
+    )
+
+# 聊天记录按用户和时间取窗口 / 分页的索引
+chat_history_user_timestamp_index = db.Index(
+    'ix_chat_history_user_id_timestamp',
+    ChatHistory.user_id,
+    ChatHistory.timestamp
+)
+
 # ==============================================================================
 # 答题和成就相关模型 (Quiz and Achievement Models)
 # ==============================================================================
@@ -371,6 +623,26 @@ class QuizQuestion(db.Model):
     difficulty = db.Column(db.String(20), default='medium', comment='难度')
     points = db.Column(db.Integer, default=10, comment='本题积分')
 
+    def to_dict(self):
+        """
+        将题目转换为字典格式
+        
+        Returns:
+            dict: 包含题目、选项、答案和解析的字典
+        """
+        return {
+            'id': self.id,
+            'question': self.question,
+            'option_a': self.option_a,
+            'option_b': self.option_b,
+            'option_c': self.option_c,
+            'option_d': self.option_d,
+            'correct_answer': self.correct_answer,
+            'explanation': self.explanation,
+            'difficulty': self.difficulty,
+            'points': self.points
+        }
+
 class QuizRecord(db.Model):
     """
     答题记录模型
@@ -497,6 +769,262 @@ class CreatedSong(db.Model):
     
     user = db.relationship('User', backref=db.backref('created_songs', lazy=True))
 
+class UserScore(db.Model):
+    """
+    用户积分物化表
+    
+    与 QuizRecord 插入、成就解锁在同一事务中增量更新，
+    供 User.total_score 和排行榜直接按索引读取。
+    可通过 `flask rebuild-scores` 从原始表重建，`flask check-scores` 校验一致性。
+    
+    Attributes:
+        user_id: 用户 ID（主键）
+        quiz_score: 答题积分
+        achievement_score: 成就积分
+        total_score: 总积分
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户 ID')
+    quiz_score = db.Column(db.Integer, nullable=False, default=0, comment='答题积分')
+    achievement_score = db.Column(db.Integer, nullable=False, default=0, comment='成就积分')
+    total_score = db.Column(db.Integer, nullable=False, default=0, comment='总积分')
+    
+    __table_args__ = (
+        db.Index('ix_user_score_total_score', 'total_score'),
+        db.Index('ix_user_score_quiz_score', 'quiz_score'),
+    )
+
+class UserQuizStats(db.Model):
+    """
+    用户答题统计物化表
+    
+    与 QuizRecord 插入在同一事务中原子累加（含当前连对和最佳连对），
+    /api/quiz/stats 和答题类成就直接按主键读取；可通过 `flask rebuild-quiz-stats`
+    从答题记录重建，`flask backfill-quiz-streaks` 单独重算连对。
+    
+    Attributes:
+        user_id: 用户 ID（主键）
+        answered: 答题总数
+        correct: 答对题数
+        score: 答题积分
+        current_streak: 当前连续答对题数
+        best_streak: 历史最佳连续答对题数
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户 ID')
+    answered = db.Column(db.Integer, nullable=False, default=0, comment='答题总数')
+    correct = db.Column(db.Integer, nullable=False, default=0, comment='答对题数')
+    score = db.Column(db.Integer, nullable=False, default=0, comment='答题积分')
+    current_streak = db.Column(db.Integer, nullable=False, default=0, comment='当前连续答对题数')
+    best_streak = db.Column(db.Integer, nullable=False, default=0, comment='最佳连续答对题数')
+
+    def to_dict(self):
+        """
+        将答题统计转换为字典格式
+        
+        Returns:
+            dict: 包含答题数、正确数、正确率、答题积分和连对信息的字典
+        """
+        return {
+            'total_answered': self.answered,
+            'total_correct': self.correct,
+            'accuracy': round(self.correct / self.answered * 100, 1) if self.answered > 0 else 0,
+            'total_score_from_quiz': self.score,
+            'current_streak': self.current_streak,
+            'best_streak': self.best_streak
+        }
+
+
+class UserQuizSeen(db.Model):
+    """
+    用户已答对题目集合
+    
+    以位图存放用户答对过的题目 ID（第 n 位表示题目 n），抽题时排除这些题目；
+    与 QuizRecord 插入在同一事务中更新，可通过 `flask rebuild-quiz-seen` 从答题记录重建。
+    
+    Attributes:
+        user_id: 用户 ID（主键）
+        correct_bitmap: 答对题目位图
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, comment='用户 ID')
+    correct_bitmap = db.Column(db.LargeBinary, nullable=False, default=b'', comment='答对题目位图')
+
+
+def _bitmap_add(bitmap, ids):
+    """
+    将 ID 加入位图（私有函数）
+    
+    Args:
+        bitmap (bytes): 原位图
+        ids: 要加入的 ID
+        
+    Returns:
+        bytes: 新位图
+    """
+    ids = list(ids)
+    if not ids:
+        return bitmap
+    data = bytearray(bitmap)
+    size = max(ids) // 8 + 1
+    if len(data) < size:
+        data.extend(bytes(size - len(data)))
+    for i in ids:
+        data[i >> 3] |= 1 << (i & 7)
+    return bytes(data)
+
+
+def _bitmap_contains(bitmap, i):
+    """判断 ID 是否在位图中（私有函数）"""
+    return (i >> 3) < len(bitmap) and bool(bitmap[i >> 3] & (1 << (i & 7)))
+
+# ==============================================================================
+# 参考数据目录缓存 (Reference Catalogs)
+# ==============================================================================
+
+class ContentVersion(db.Model):
+    """
+    内容版本号表
+    
+    成就、题目、文章、历史事件、歌曲在增删改时于同一事务中递增对应目录的版本号，
+    各 worker 的目录缓存通过比对版本号决定是否重新加载。
+    
+    Attributes:
+        name: 目录名称
+        version: 内容版本号
+    """
+    name = db.Column(db.String(50), primary_key=True, comment='目录名称')
+    version = db.Column(db.Integer, nullable=False, default=0, comment='内容版本号')
+
+
+# 目录名称 -> 模型
+REFERENCE_CATALOG_MODELS = {
+    'achievement': Achievement,
+    'quiz_question': QuizQuestion,
+    'article': Article,
+    'event': HistoricalEvent,
+    'song': Song,
+}
+
+# 目录缓存值：按展示顺序排列的只读条目、ID 索引，以及附属结构（成就目录为规则引擎，歌曲目录为歌名索引）
+Catalog = namedtuple('Catalog', ['items', 'by_id', 'engine'], defaults=(None,))
+
+# 题库目录只缓存题目 ID（按难度分组）和答案，题面按主键现取，题库规模对内存和抽题开销影响很小
+QuizBank = namedtuple('QuizBank', ['ids', 'ids_by_difficulty', 'answer_key'])
+QuizAnswer = namedtuple('QuizAnswer', ['correct_answer', 'points'])
+
+
+class AchievementSnapshot(namedtuple('AchievementSnapshot', [
+    'id', 'name', 'description', 'icon', 'category', 'condition_type', 'condition_value', 'points'
+])):
+    """成就定义的只读快照，供目录缓存和规则引擎使用"""
+    __slots__ = ()
+
+    def to_dict(self):
+        """
+        将成就转换为字典格式
+        
+        Returns:
+            dict: 包含成就信息的字典
+        """
+        return self._asdict()
+
+
+def bump_content_version(connection, name):
+    """
+    递增目录的内容版本号
+    
+    Args:
+        connection: 数据库连接（与内容写入处于同一事务）
+        name: 目录名称
+    """
+    table = ContentVersion.__table__
+    connection.execute(
+        sqlite_insert(table)
+        .values(name=name, version=1)
+        .on_conflict_do_update(index_elements=[table.c.name], set_={'version': table.c.version + 1})
+    )
+
+
+def _load_content_version(name):
+    """读取目录当前的内容版本号（私有函数）"""
+    version = db.session.query(ContentVersion.version).filter(ContentVersion.name == name).scalar()
+    return version or 0
+
+
+def _load_catalog(name):
+    """
+    从数据库加载目录并转换为只读结构（私有函数）
+    
+    Args:
+        name: 目录名称
+        
+    Returns:
+        Catalog: 目录缓存值（题库为 QuizBank）
+    """
+    if name == 'quiz_question':
+        ids_by_difficulty = {}
+        answer_key = {}
+        rows = db.session.query(
+            QuizQuestion.id, QuizQuestion.difficulty, QuizQuestion.correct_answer, QuizQuestion.points
+        ).order_by(QuizQuestion.id)
+        for question_id, difficulty, correct_answer, points in rows:
+            ids_by_difficulty.setdefault(difficulty or 'medium', []).append(question_id)
+            answer_key[question_id] = QuizAnswer(correct_answer.upper(), points or 0)
+        return QuizBank(
+            tuple(answer_key),
+            {difficulty: tuple(ids) for difficulty, ids in ids_by_difficulty.items()},
+            answer_key
+        )
+    if name == 'achievement':
+        items = tuple(
+            AchievementSnapshot(**a.to_dict()) for a in Achievement.query.order_by(Achievement.id)
+        )
+        return Catalog(items, {a.id: a for a in items}, AchievementEngine(items))
+    model = REFERENCE_CATALOG_MODELS[name]
+    order = (model.year, model.id) if model is HistoricalEvent else (model.id,)
+    items = tuple(row.to_dict() for row in model.query.order_by(*order))
+    engine = SongTitleIndex(item['title'] for item in items) if name == 'song' else None
+    return Catalog(items, {item['id']: item for item in items}, engine)
+
+
+reference_cache = VersionedCache(_load_content_version, check_interval=REFERENCE_VERSION_CHECK_INTERVAL)
+
+
+def _register_content_version_sync(model, name):
+    """
+    为模型注册内容版本号递增监听（bulk_save_objects 不触发，由 init_db 统一递增）
+    
+    每个事务只递增一次，提交后使本进程的目录缓存立即比对版本号。
+    
+    Args:
+        model: 模型类
+        name: 目录名称
+    """
+    def bump(mapper, connection, entity):
+        session = object_session(entity)
+        changed = session.info.setdefault('changed_catalogs', set()) if session else set()
+        if name not in changed:
+            bump_content_version(connection, name)
+            changed.add(name)
+
+    for identifier in ('after_insert', 'after_update', 'after_delete'):
+        db.event.listen(model, identifier, bump)
+
+
+for _name, _model in REFERENCE_CATALOG_MODELS.items():
+    _register_content_version_sync(_model, _name)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _expire_changed_catalogs(session):
+    """提交后使本事务修改过的目录立即失效"""
+    for name in session.info.pop('changed_catalogs', ()):
+        reference_cache.expire(name)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _discard_changed_catalogs(session):
+    """回滚后丢弃待失效的目录记录"""
+    session.info.pop('changed_catalogs', None)
+
 # ==============================================================================
 # 数据服务层 (Data Service)
 # ==============================================================================
@@ -514,13 +1042,16 @@ class DataService:
         获取已登录用户的收藏 ID 集合（私有方法）
         
         Args:
-            user: 用户对象
+            user: 用户对象（可为 None）
             
         Returns:
             set: 用户收藏的歌曲 ID 集合
         """
-        if user.is_authenticated:
-            return {song.id for song in user.favorites.all()}
+        if user and user.is_authenticated:
+            return {
+                row.song_id for row in db.session.query(user_favorites.c.song_id)
+                .filter(user_favorites.c.user_id == user.id)
+            }
         return set()
 
     def _add_favorite_status(self, songs_list, favorite_ids):
@@ -528,59 +1059,274 @@ class DataService:
         为歌曲列表收藏状态（私有方法）
         
         Args:
-            songs_list: 歌曲对象列表
+            songs_list: 歌曲字典列表（来自歌曲目录缓存，不会被修改）
             favorite_ids: 用户收藏的歌曲 ID 集合
             
         Returns:
             list: 包含收藏状态的歌曲字典列表
         """
-        output = []
-        for song in songs_list:
-            song_dict = song.to_dict()
-            song_dict['is_favorite'] = song.id in favorite_ids
-            output.append(song_dict)
-        return output
+        return [dict(song, is_favorite=song['id'] in favorite_ids) for song in songs_list]
 
-    def search_songs(self, query, user) -> list:
+    def get_catalog(self, name):
+        """
+        获取参考数据目录（成就、题目、文章、历史事件、歌曲）
+        
+        目录缓存在进程内，按数据库中的内容版本号失效，返回的结构由所有请求共享，不得修改。
+        
+        Args:
+            name: 目录名称（achievement/quiz_question/article/event/song）
+            
+        Returns:
+            Catalog: 包含 items（有序元组）、by_id（ID 索引）和 engine（成就规则引擎 / 歌名索引）；
+                     题库目录返回 QuizBank（ids、ids_by_difficulty、answer_key）
+        """
+        return reference_cache.get(name, lambda: _load_catalog(name))
+
+    def _catalog_items(self, name, ids):
+        """
+        按 ID 顺序从目录中取出条目，忽略已不存在的 ID（私有方法）
+        
+        Args:
+            name: 目录名称
+            ids: ID 列表
+            
+        Returns:
+            list: 目录条目列表
+        """
+        by_id = self.get_catalog(name).by_id
+        return [by_id[i] for i in ids if i in by_id]
+
+    def get_catalog_stats(self):
+        """
+        获取参考数据目录缓存的命中统计
+        
+        Returns:
+            dict: 目录名称 -> hits、misses、version_checks、version
+        """
+        return reference_cache.stats()
+
+    def search_songs(self, query, user, limit=None, offset=0) -> list:
         """
         搜索歌曲
         
+        优先使用统一全文索引（标题、演唱者、地区、描述）并按 bm25 相关度排序，
+        全文索引不可用时回退到 LIKE 匹配标题和演唱者。
+        
         Args:
             query: 搜索关键词（可为空）
             user: 当前用户对象
+            limit: 返回数量上限（可选，默认不限）
+            offset: 跳过的结果数（默认为 0）
             
         Returns:
             list: 匹配的歌曲列表，包含收藏状态
         """
         favorite_ids = self._get_user_favorite_ids(user)
         if not query:
-            songs = Song.query.all()
+            songs = self.get_catalog('song').items[offset:offset + limit if limit else None]
+            return self._add_favorite_status(songs, favorite_ids)
+        
+        rowids = self._search_fts_rowids(
+            query, [SEARCH_TYPE_CODES['song']], limit if limit else -1, offset
+        )
+        if rowids is not None:
+            ids = [rowid // 4 for rowid in rowids]
         else:
             search_term = f"%{query.lower()}%"
-            songs = Song.query.filter(
+            ids = [row.id for row in db.session.query(Song.id).filter(
                 db.or_(Song.title.ilike(search_term), Song.artist.ilike(search_term))
-            ).all()
-        return self._add_favorite_status(songs, favorite_ids)
+            ).order_by(Song.id).offset(offset).limit(limit)]
+        return self._add_favorite_status(self._catalog_items('song', ids), favorite_ids)
+
+    def _search_fts_rowids(self, query, codes, limit, offset=0):
+        """
+        在统一全文索引中按相关度查询 rowid（私有方法）
+        
+        Args:
+            query: 搜索关键词
+            codes: 实体类型编码列表
+            limit: 返回数量上限（-1 表示不限）
+            offset: 跳过的结果数
+            
+        Returns:
+            list: 按相关度排序的 rowid；全文索引不可用、输入无法转换为 MATCH 表达式
+                  或查询失败时返回 None，由调用方回退到 LIKE 匹配
+        """
+        match = build_match_query(query)
+        if not match or not _search_fts_state['enabled']:
+            return None
+        try:
+            return [r.rowid for r in db.session.execute(
+                text(
+                    'SELECT rowid FROM search_fts '
+                    'WHERE search_fts MATCH :match AND rowid % 4 IN :codes '
+                    f'ORDER BY {SEARCH_FTS_RANK} LIMIT :limit OFFSET :offset'
+                ).bindparams(bindparam('codes', expanding=True)),
+                {'match': match, 'codes': codes, 'limit': limit, 'offset': offset}
+            )]
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"全文检索失败，回退到 LIKE 匹配: {e}")
+            return None
+
+    def _search_like_rowids(self, query, codes, limit):
+        """
+        以 LIKE 匹配各实体的标题和正文，生成与全文索引相同编码的 rowid（私有方法）
+        
+        标题命中的结果排在正文命中之前，同类按类型和 ID 排序。
+        
+        Args:
+            query: 搜索关键词
+            codes: 实体类型编码列表
+            limit: 返回数量上限
+            
+        Returns:
+            list: rowid 列表
+        """
+        search_term = f"%{query.lower()}%"
+        columns = {
+            'song': (Song, Song.title, (Song.artist, Song.region, Song.description)),
+            'article': (Article, Article.title, (Article.summary,)),
+            'event': (
+                HistoricalEvent, HistoricalEvent.event_description,
+                (HistoricalEvent.detailed_description,)
+            ),
+        }
+        hits = []
+        for entity_type, code in SEARCH_TYPE_CODES.items():
+            if code not in codes:
+                continue
+            model, title, others = columns[entity_type]
+            title_hit = title.ilike(search_term)
+            rows = db.session.query(model.id, title_hit.label('title_hit')).filter(
+                db.or_(title_hit, *(column.ilike(search_term) for column in others))
+            ).order_by(title_hit.desc(), model.id).limit(limit)
+            hits.extend((not row.title_hit, row.id * 4 + code) for row in rows)
+        hits.sort(key=lambda hit: hit[0])
+        return [rowid for _, rowid in hits[:limit]]
+
+    def search_all(self, query, user=None, types=None, limit=20) -> list:
+        """
+        跨实体统一搜索（歌曲、文章、历史事件）
+        
+        一次全文索引查询得到按相关度排序的混合结果，再从参考数据目录缓存回填实体；
+        全文索引不可用或查询失败时回退到 LIKE 匹配。
+        
+        Args:
+            query: 搜索关键词
+            user: 当前用户对象（可选，用于歌曲收藏状态）
+            types: 限定的实体类型列表（song/article/event，默认全部）
+            limit: 返回数量上限（默认为 20，最大 50）
+            
+        Returns:
+            list: 搜索结果，每项包含 type、id、title 和 data（实体字典）
+        """
+        query = (query or '').strip()
+        codes = [SEARCH_TYPE_CODES[t] for t in (types or SEARCH_TYPE_CODES) if t in SEARCH_TYPE_CODES]
+        if not query or not codes:
+            return []
+        limit = max(1, min(limit, 50))
+        rowids = self._search_fts_rowids(query, codes, limit)
+        if rowids is None:
+            rowids = self._search_like_rowids(query, codes, limit)
+        
+        ids_by_type = {}
+        for rowid in rowids:
+            ids_by_type.setdefault(SEARCH_TYPES_BY_CODE[rowid % 4], []).append(rowid // 4)
+        
+        entities = {}
+        if 'song' in ids_by_type:
+            songs = self._catalog_items('song', ids_by_type['song'])
+            favorite_ids = self._get_user_favorite_ids(user)
+            for song_dict in self._add_favorite_status(songs, favorite_ids):
+                entities[('song', song_dict['id'])] = (song_dict['title'], song_dict)
+        if 'article' in ids_by_type:
+            for article in self._catalog_items('article', ids_by_type['article']):
+                entities[('article', article['id'])] = (article['title'], article)
+        if 'event' in ids_by_type:
+            for event in self._catalog_items('event', ids_by_type['event']):
+                entities[('event', event['id'])] = (event['event_description'], event)
+        
+        results = []
+        for rowid in rowids:
+            key = (SEARCH_TYPES_BY_CODE[rowid % 4], rowid // 4)
+            if key in entities:
+                title, data = entities[key]
+                results.append({'type': key[0], 'id': key[1], 'title': title, 'data': data})
+        return results
+
+    def suggest_songs(self, query, limit=10) -> list:
+        """
+        歌曲、演唱者、地区联想（支持汉字、全拼和拼音首字母）
+        
+        查询内存前缀索引；歌曲目录的内容版本号变化（本进程或其他 worker 提交了修改）后，
+        先按目录增量同步索引。
+        
+        Args:
+            query: 用户输入
+            limit: 返回数量上限（默认为 10，最大 20）
+            
+        Returns:
+            list: 联想结果，每项包含 type（song/artist/region）、text，歌曲另含 id
+        """
+        catalog = self.get_catalog('song')
+        song_suggest_index.sync(
+            ((s['id'], s['title'], s['artist'], s['region']) for s in catalog.items), catalog
+        )
+        return song_suggest_index.suggest(query, max(1, min(limit, 20)))
 
     def get_songs_by_region(self, region_name, user) -> list:
         """
         按地区获取歌曲
         
         Args:
-            region_name: 地区名称
+            region_name: 地区名称（简称、全称均可）
             user: 当前用户对象
             
         Returns:
             list: 该地区歌曲列表，包含收藏状态
         """
+        region_id = resolve_region(region_name)
+        if region_id is None:
+            return []
         favorite_ids = self._get_user_favorite_ids(user)
-        if region_name == "全国":
-            songs = Song.query.filter_by(region="全国").all()
-        else:
-            clean_region_name = region_name.replace('省', '').replace('市', '')\
-                .replace('自治区', '').replace('维吾尔', '').replace('壮族', '').replace('回族', '')
-            songs = Song.query.filter(Song.region.ilike(f"%{clean_region_name}%")).all()
-        return self._add_favorite_status(songs, favorite_ids)
+        ids = [row.song_id for row in db.session.query(song_region.c.song_id)
+               .filter(song_region.c.region_id == region_id)
+               .order_by(song_region.c.song_id)]
+        return self._add_favorite_status(self._catalog_items('song', ids), favorite_ids)
+
+    def get_region_stats(self, region_name):
+        """
+        获取单个地区的歌曲统计
+        
+        Args:
+            region_name: 地区名称（简称、全称均可，如 "陕西"、"陕西省"）
+            
+        Returns:
+            dict: 包含地区 ID、规范名称、歌曲数量和代表作，无法识别的地区返回 None
+        """
+        region_id = resolve_region(region_name)
+        if region_id is None:
+            return None
+        stats = db.session.get(RegionStats, region_id)
+        if stats is None:
+            return {'region_id': region_id, 'region': REGION_NAMES[region_id], 'count': 0, 'titles': []}
+        return stats.to_dict()
+
+    def get_all_region_stats(self) -> list:
+        """
+        获取所有收录了歌曲的地区统计（供地图着色）
+        
+        Returns:
+            list: 地区统计列表，按歌曲数量降序
+        """
+        rows = (
+            RegionStats.query
+            .filter(RegionStats.song_count > 0)
+            .order_by(RegionStats.song_count.desc(), RegionStats.region_id)
+            .all()
+        )
+        return [row.to_dict() for row in rows]
 
     def get_favorite_songs(self, user) -> list:
         """
@@ -604,6 +1350,11 @@ class DataService:
         """
         切换歌曲收藏状态
         
+        先尝试删除收藏行，未删除到再 INSERT OR IGNORE：取消收藏一条语句、收藏两条语句，
+        与收藏数量无关；不读取收藏列表，并发重复点击也不会触发主键冲突。
+        SQLite 没有能在同一条语句中按条件插入或删除的语法，收藏表也没有需要同步的计数，
+        因此不再合并。
+        
         Args:
             user: 当前用户对象
             song: 歌曲对象
@@ -611,25 +1362,28 @@ class DataService:
         Returns:
             dict: 更新后的歌曲信息，包含新解锁的成就（如果有）
         """
-        is_favorited = song in user.favorites.all()
-        if is_favorited:
-            user.favorites.remove(song)
-            db.session.commit()
-            song_dict = song.to_dict()
-            song_dict['is_favorite'] = False
-            return song_dict
-        else:
-            user.favorites.append(song)
-            db.session.commit()
-            song_dict = song.to_dict()
-            song_dict['is_favorite'] = True
-            
+        removed = db.session.execute(
+            user_favorites.delete().where(
+                user_favorites.c.user_id == user.id,
+                user_favorites.c.song_id == song.id
+            )
+        ).rowcount
+        if not removed:
+            db.session.execute(
+                user_favorites.insert().prefix_with('OR IGNORE').values(
+                    user_id=user.id, song_id=song.id
+                )
+            )
+        db.session.commit()
+        
+        song_dict = song.to_dict()
+        song_dict['is_favorite'] = not removed
+        if not removed:
             # 检查并解锁成就
-            newly_unlocked = self.check_and_unlock_achievements(user)
+            newly_unlocked = self.check_and_unlock_achievements(user, event='favorite_added')
             if newly_unlocked:
                 song_dict['newly_unlocked'] = [a.to_dict() for a in newly_unlocked]
-            
-            return song_dict
+        return song_dict
 
     def get_articles(self) -> list:
         """
@@ -638,7 +1392,7 @@ class DataService:
         Returns:
             list: 文章列表
         """
-        return [article.to_dict() for article in Article.query.all()]
+        return list(self.get_catalog('article').items)
 
     def get_historical_events(self) -> list:
         """
@@ -647,42 +1401,156 @@ class DataService:
         Returns:
             list: 历史事件列表
         """
-        return [event.to_dict() for event in HistoricalEvent.query.order_by(HistoricalEvent.year).all()]
+        return list(self.get_catalog('event').items)
 
     def add_chat_history(self, user_id, question, answer):
         """
-        添加聊天记录
+        添加聊天记录
+        
+        Args:
+            user_id: 用户 ID
+            question: 用户提问
+            answer: AI 回答
+        """
+        new_chat = ChatHistory(user_id=user_id, question=question, answer=answer)
+        db.session.add(new_chat)
+        db.session.commit()
+    
+    def get_recent_chat_history(self, user_id, limit=6) -> list:
+        """
+        获取用户最近的若干轮对话
+        
+        Args:
+            user_id: 用户 ID
+            limit: 轮数（默认为 6）
+            
+        Returns:
+            list: 聊天记录列表（按时间升序）
+        """
+        return self.get_chat_history_page(user_id, limit=limit)['history']
+
+    def count_chat_history(self, user_id) -> int:
+        """
+        统计用户的对话轮数
+        
+        Args:
+            user_id: 用户 ID
+            
+        Returns:
+            int: 对话轮数
+        """
+        return db.session.query(func.count(ChatHistory.id))\
+            .filter(ChatHistory.user_id == user_id)\
+            .scalar()
+
+    def get_chat_history_page(self, user_id, before=None, limit=20):
+        """
+        获取用户聊天历史（从新到旧游标分页）
+        
+        按 (user_id, timestamp) 索引倒序取一页，页内按时间升序返回，
+        开销与用户的历史总长度无关。
+        
+        Args:
+            user_id: 用户 ID
+            before: 上一页返回的 next_cursor（可选，省略时返回最近一页）
+            limit: 每页数量（默认为 20，最大 100）
+            
+        Returns:
+            dict: 包含 history（聊天记录列表，按时间升序）和 next_cursor（没有更早记录时为 None）
+        """
+        limit = max(1, min(limit, 100))
+        query = ChatHistory.query.filter(ChatHistory.user_id == user_id)
+        
+        # 键集分页：排在游标 (timestamp, id) 之前的记录
+        position = self._decode_chat_cursor(before)
+        if position:
+            timestamp, chat_id = position
+            query = query.filter(db.or_(
+                ChatHistory.timestamp < timestamp,
+                db.and_(ChatHistory.timestamp == timestamp, ChatHistory.id < chat_id)
+            ))
+        
+        rows = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())\
+            .limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return {
+            'history': [chat.to_dict() for chat in reversed(rows)],
+            'next_cursor': self._encode_chat_cursor(rows[-1]) if has_more else None
+        }
+
+    def _encode_chat_cursor(self, chat):
+        """
+        将聊天记录的排序位置编码为游标字符串（私有方法）
+        
+        Args:
+            chat: 聊天记录对象
+            
+        Returns:
+            str: URL 安全的游标
+        """
+        raw = json.dumps([chat.timestamp.isoformat(), chat.id])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_chat_cursor(self, cursor):
+        """
+        解析聊天记录游标字符串（私有方法）
+        
+        Args:
+            cursor: 游标字符串
+            
+        Returns:
+            tuple: (timestamp, id)，游标为空或无效时返回 None
+        """
+        if not cursor:
+            return None
+        try:
+            timestamp, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(timestamp), int(chat_id)
+        except (ValueError, TypeError):
+            logger.warning(f"无效的聊天记录游标: {cursor}")
+            return None
+    
+    def clear_chat_history(self, user_id):
+        """
+        清空用户聊天历史
         
         Args:
             user_id: 用户 ID
-            question: 用户提问
-            answer: AI 回答
         """
-        new_chat = ChatHistory(user_id=user_id, question=question, answer=answer)
-        db.session.add(new_chat)
+        ChatHistory.query.filter_by(user_id=user_id).delete()
+        ChatSummary.query.filter_by(user_id=user_id).delete()
         db.session.commit()
-    
-    def get_chat_history(self, user_id) -> list:
+
+    def get_chat_summary(self, user_id):
         """
-        获取用户聊天历史
+        获取用户的聊天滚动摘要
         
         Args:
             user_id: 用户 ID
             
         Returns:
-            list: 聊天历史列表
+            tuple: (摘要文本, 已覆盖的最后一条聊天记录 ID)，没有摘要时为 ('', 0)
         """
-        history = ChatHistory.query.filter_by(user_id=user_id).order_by(ChatHistory.timestamp.asc()).all()
-        return [chat.to_dict() for chat in history]
-    
-    def clear_chat_history(self, user_id):
+        row = db.session.get(ChatSummary, user_id)
+        return (row.summary, row.last_chat_id) if row else ('', 0)
+
+    def save_chat_summary(self, user_id, summary, last_chat_id):
         """
-        清空用户聊天历史
+        保存用户的聊天滚动摘要
         
         Args:
             user_id: 用户 ID
+            summary: 摘要文本
+            last_chat_id: 摘要已覆盖的最后一条聊天记录 ID
         """
-        ChatHistory.query.filter_by(user_id=user_id).delete()
+        row = db.session.get(ChatSummary, user_id)
+        if row is None:
+            db.session.add(ChatSummary(user_id=user_id, summary=summary, last_chat_id=last_chat_id))
+        else:
+            row.summary = summary
+            row.last_chat_id = last_chat_id
         db.session.commit()
 
     def record_article_view(self, user, article_id):
@@ -704,7 +1572,7 @@ class DataService:
             db.session.commit()
             
             # 检查并解锁成就
-            newly_unlocked = self.check_and_unlock_achievements(user)
+            newly_unlocked = self.check_and_unlock_achievements(user, event='article_viewed')
             return newly_unlocked
         return []
     
@@ -733,25 +1601,103 @@ class DataService:
         db.session.commit()
         
         # 检查并解锁成就
-        newly_unlocked = self.check_and_unlock_achievements(user)
+        newly_unlocked = self.check_and_unlock_achievements(user, event='song_created')
         return newly_unlocked
 
-    def get_forum_posts(self, current_user=None):
+    def get_forum_posts(self, current_user=None, cursor=None, limit=20):
         """
-        获取论坛帖子列表（按点赞数和排序）
+        获取论坛帖子列表（按点赞数和时间排序，游标分页）
+        
+        排序和分页在 SQL 中完成，用户名随帖子一并查询，
+        当前用户的点赞状态按页批量查询一次。
         
         Args:
             current_user: 当前用户对象（可选）
+            cursor: 上一页返回的 next_cursor（可选，省略时从第一页开始）
+            limit: 每页数量（默认为 20，最大 50）
+            
+        Returns:
+            dict: 包含 posts（帖子列表，含点赞状态）和 next_cursor（没有更多时为 None）
+        """
+        limit = max(1, min(limit, 50))
+        query = db.session.query(ForumPost, User.username)\
+            .join(User, ForumPost.user_id == User.id)
+        
+        # 键集分页：排在游标 (like_count, timestamp, id) 之后的帖子
+        position = self._decode_forum_cursor(cursor)
+        if position:
+            like_count, timestamp, post_id = position
+            query = query.filter(db.or_(
+                ForumPost.like_count < like_count,
+                db.and_(ForumPost.like_count == like_count, ForumPost.timestamp < timestamp),
+                db.and_(
+                    ForumPost.like_count == like_count,
+                    ForumPost.timestamp == timestamp,
+                    ForumPost.id < post_id
+                )
+            ))
+        
+        rows = query.order_by(
+            ForumPost.like_count.desc(),
+            ForumPost.timestamp.desc(),
+            ForumPost.id.desc()
+        ).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        liked_ids = set()
+        if rows and current_user and current_user.is_authenticated:
+            liked_ids = {
+                r.post_id for r in db.session.query(post_likes.c.post_id).filter(
+                    post_likes.c.user_id == current_user.id,
+                    post_likes.c.post_id.in_([post.id for post, _ in rows])
+                )
+            }
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1][0]
+            next_cursor = self._encode_forum_cursor(last)
+        
+        return {
+            'posts': [
+                post.to_dict(current_user, is_liked=post.id in liked_ids, username=username)
+                for post, username in rows
+            ],
+            'next_cursor': next_cursor
+        }
+
+    def _encode_forum_cursor(self, post):
+        """
+        将帖子的排序位置编码为游标字符串（私有方法）
+        
+        Args:
+            post: 帖子对象
             
         Returns:
-            list: 帖子列表，包含当前用户的点赞状态
+            str: URL 安全的游标
+        """
+        raw = json.dumps([post.like_count or 0, post.timestamp.isoformat(), post.id])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_forum_cursor(self, cursor):
         """
-        # 获取所有帖子，在 Python 中进行排序
-        # 排序规则：1. 点赞数降序；2. 时间降序
-        posts = ForumPost.query.all()
-        posts.sort(key=lambda p: (p.liked_by.count(), p.timestamp), reverse=True)
+        解析游标字符串（私有方法）
         
-        return [post.to_dict(current_user) for post in posts]
+        Args:
+            cursor: 游标字符串
+            
+        Returns:
+            tuple: (like_count, timestamp, id)，游标为空或无效时返回 None
+        """
+        if not cursor:
+            return None
+        try:
+            like_count, timestamp, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return int(like_count), datetime.fromisoformat(timestamp), int(post_id)
+        except (ValueError, TypeError):
+            logger.warning(f"无效的论坛游标: {cursor}")
+            return None
 
     def add_forum_post(self, user_id, content):
         """
@@ -762,12 +1708,18 @@ class DataService:
             content: 帖子内容
             
         Returns:
-            dict: 新创建的帖子信息
+            dict: 新创建的帖子信息，包含新解锁的成就（如果有）
         """
         new_post = ForumPost(user_id=user_id, content=content)
         db.session.add(new_post)
         db.session.commit()
-        return new_post.to_dict()
+        post_dict = new_post.to_dict()
+        
+        # 检查并解锁成就
+        newly_unlocked = self.check_and_unlock_achievements(new_post.user, event='forum_posted')
+        if newly_unlocked:
+            post_dict['newly_unlocked'] = [a.to_dict() for a in newly_unlocked]
+        return post_dict
     
     def delete_forum_post(self, post_id, user_id):
         """
@@ -791,42 +1743,152 @@ class DataService:
         """
         切换帖子点赞状态
         
+        固定两条语句，与点赞总数无关：
+        1. UPDATE ... RETURNING：按点赞行是否存在增减 like_count，同时返回新的总数和
+           原来的点赞状态；帖子不存在时不返回行。该语句取得写锁，其他 worker 的切换在此排队
+        2. 按原状态 DELETE 或 INSERT OR IGNORE 点赞行
+        SQLite 没有能在同一条语句中按条件插入或删除的语法（UPSERT 只能插入或更新），
+        因此无法进一步合并为一条语句。
+        
         Args:
             post_id: 帖子 ID
             user: 用户对象
             
         Returns:
-            dict: 包含点赞状态和总数的字典，失败返回 None
+            dict: 包含点赞状态和总数的字典，帖子不存在时返回 None
         """
-        post = ForumPost.query.get(post_id)
-        if not post:
+        was_liked = db.exists().where(
+            post_likes.c.user_id == user.id,
+            post_likes.c.post_id == post_id
+        )
+        row = db.session.execute(
+            db.update(ForumPost)
+            .where(ForumPost.id == post_id)
+            .values(like_count=ForumPost.like_count + db.case((was_liked, -1), else_=1))
+            .returning(ForumPost.like_count, was_liked.label('was_liked'))
+        ).first()
+        if row is None:
+            db.session.rollback()
             return None
         
-        is_liked = post.liked_by.filter(post_likes.c.user_id == user.id).count() > 0
-        if is_liked:
-            post.liked_by.remove(user)
-            liked = False
+        if row.was_liked:
+            db.session.execute(
+                post_likes.delete().where(
+                    post_likes.c.user_id == user.id,
+                    post_likes.c.post_id == post_id
+                )
+            )
         else:
-            post.liked_by.append(user)
-            liked = True
+            db.session.execute(
+                post_likes.insert().prefix_with('OR IGNORE').values(
+                    user_id=user.id, post_id=post_id
+                )
+            )
         db.session.commit()
-        return {'liked': liked, 'count': post.liked_by.count()}
+        return {'liked': not row.was_liked, 'count': row.like_count}
 
     # ==================== 答题相关方法 (Quiz Methods) ====================
 
-    def get_random_quiz_questions(self, count=5):
+    def get_random_quiz_questions(self, count=5, user=None, difficulty=None):
         """
         随机获取指定数量的题目
         
+        从缓存的题目 ID 数组中随机抽取，排除用户已答对的题目，再按主键取回题面。
+        抽样次数与题库规模无关；未答对的题目不足时用已答对的题目补齐。
+        
         Args:
-            count: 题目数量（默认为 5）
+            count: 题目数量（默认为 5，最大 QUIZ_MAX_QUESTIONS）
+            user: 当前用户对象（可选，用于排除已答对的题目）
+            difficulty: 难度（easy/medium/hard，可选，默认不限）
             
         Returns:
-            list: 随机题目列表
+            list: 随机题目字典列表
         """
         import random
-        all_questions = QuizQuestion.query.all()
-        return random.sample(all_questions, min(count, len(all_questions))) if all_questions else []
+        bank = self.get_catalog('quiz_question')
+        pool = bank.ids_by_difficulty.get(difficulty, ()) if difficulty else bank.ids
+        count = min(count, len(pool), QUIZ_MAX_QUESTIONS)
+        if count <= 0:
+            return []
+        
+        seen = self._get_quiz_seen_bitmap(user)
+        chosen = []
+        chosen_set = set()
+        # 拒绝采样：命中已答对或已选中的题目就重抽，尝试次数有上限
+        for _ in range(count * 8):
+            if len(chosen) == count:
+                break
+            question_id = pool[random.randrange(len(pool))]
+            if question_id in chosen_set or _bitmap_contains(seen, question_id):
+                continue
+            chosen.append(question_id)
+            chosen_set.add(question_id)
+        if len(chosen) < count:
+            # 用户已答对题库中的大部分题目，退化为扫描候选
+            unseen = [i for i in pool if i not in chosen_set and not _bitmap_contains(seen, i)]
+            extra = random.sample(unseen, min(count - len(chosen), len(unseen)))
+            chosen.extend(extra)
+            chosen_set.update(extra)
+        if len(chosen) < count:
+            rest = [i for i in pool if i not in chosen_set]
+            chosen.extend(random.sample(rest, count - len(chosen)))
+        
+        questions = {q.id: q for q in QuizQuestion.query.filter(QuizQuestion.id.in_(chosen))}
+        return [questions[i].to_dict() for i in chosen if i in questions]
+
+    def _get_quiz_seen_bitmap(self, user):
+        """
+        获取用户已答对题目位图（私有方法）
+        
+        Args:
+            user: 用户对象（可为 None）
+            
+        Returns:
+            bytes: 位图，未登录或没有答对记录时为空
+        """
+        if not (user and user.is_authenticated):
+            return b''
+        bitmap = db.session.query(UserQuizSeen.correct_bitmap)\
+            .filter(UserQuizSeen.user_id == user.id)\
+            .scalar()
+        return bitmap or b''
+
+    def _mark_quiz_seen(self, user_id, question_ids):
+        """
+        将答对的题目加入用户位图，需在答题记录所在事务中调用（私有方法）
+        
+        Args:
+            user_id: 用户 ID
+            question_ids: 答对的题目 ID 列表
+        """
+        if not question_ids:
+            return
+        seen = db.session.get(UserQuizSeen, user_id)
+        if seen is None:
+            db.session.add(UserQuizSeen(user_id=user_id, correct_bitmap=_bitmap_add(b'', question_ids)))
+        else:
+            seen.correct_bitmap = _bitmap_add(seen.correct_bitmap, question_ids)
+
+    def rebuild_quiz_seen(self):
+        """
+        从答题记录重建所有用户的已答对题目位图
+        
+        Returns:
+            int: 写入的用户数
+        """
+        correct_ids = {}
+        rows = db.session.query(QuizRecord.user_id, QuizRecord.question_id)\
+            .filter(QuizRecord.is_correct.is_(True))\
+            .distinct()
+        for user_id, question_id in rows:
+            correct_ids.setdefault(user_id, []).append(question_id)
+        UserQuizSeen.query.delete()
+        db.session.add_all(
+            UserQuizSeen(user_id=user_id, correct_bitmap=_bitmap_add(b'', ids))
+            for user_id, ids in correct_ids.items()
+        )
+        db.session.commit()
+        return len(correct_ids)
 
     def submit_quiz_answer(self, user, question_id, user_answer):
         """
@@ -840,37 +1902,113 @@ class DataService:
         Returns:
             dict: 包含答题结果的字典，包括正确性、积分和解析等
         """
-        question = QuizQuestion.query.get(question_id)
-        if not question:
+        try:
+            question_id = int(question_id)
+        except (TypeError, ValueError):
             return None
+        graded = self._record_quiz_answers(user, [(question_id, user_answer)])
+        if graded is None:
+            return None
+        results, newly_unlocked = graded
+        result = results[0]
         
-        is_correct = user_answer.upper() == question.correct_answer.upper()
-        score_earned = question.points if is_correct else 0
+        return {
+            'success': True,
+            'is_correct': result['is_correct'],
+            'score_earned': result['score_earned'],
+            'correct_answer': result['correct_answer'],
+            'explanation': result['explanation'],
+            'current_total_score': user.total_score,
+            'newly_unlocked': [a.to_dict() for a in newly_unlocked]
+        }
+
+    def submit_quiz_round(self, user, answers):
+        """
+        批量提交一轮答题
         
-        # 创建答题记录
-        record = QuizRecord(
-            user=user,
-            question=question,
-            user_answer=user_answer.upper(),
-            is_correct=is_correct,
-            score_earned=score_earned
-        )
-        db.session.add(record)
-        db.session.commit()
+        按缓存的答案批改全部题目，一条语句批量写入答题记录，积分和已答对集合各更新一次，
+        整轮在一个事务中提交，之后只做一次成就评估。
         
-        # 检查并解锁成就
-        newly_unlocked = self.check_and_unlock_achievements(user)
+        Args:
+            user: 用户对象
+            answers: 答案列表，每项为 (题目 ID, 用户答案)
+            
+        Returns:
+            dict: 包含每题结果、本轮得分和新解锁的成就；没有任何有效题目时返回 None
+        """
+        graded = self._record_quiz_answers(user, answers)
+        if graded is None:
+            return None
+        results, newly_unlocked = graded
         
         return {
             'success': True,
-            'is_correct': is_correct,
-            'score_earned': score_earned,
-            'correct_answer': question.correct_answer,
-            'explanation': question.explanation,
+            'results': results,
+            'correct_count': sum(1 for r in results if r['is_correct']),
+            'score_earned': sum(r['score_earned'] for r in results),
             'current_total_score': user.total_score,
             'newly_unlocked': [a.to_dict() for a in newly_unlocked]
         }
 
+    def _record_quiz_answers(self, user, answers):
+        """
+        批改并写入答题记录，提交后评估一次成就（私有方法）
+        
+        Args:
+            user: 用户对象
+            answers: 答案列表，每项为 (题目 ID, 用户答案)，题库中不存在的题目被忽略
+            
+        Returns:
+            tuple: (每题结果列表, 新解锁的成就列表)；没有有效题目时返回 None
+        """
+        answer_key = self.get_catalog('quiz_question').answer_key
+        answers = [
+            (question_id, user_answer.upper())
+            for question_id, user_answer in answers
+            if question_id in answer_key
+        ]
+        if not answers:
+            return None
+        explanations = dict(
+            db.session.query(QuizQuestion.id, QuizQuestion.explanation)
+            .filter(QuizQuestion.id.in_({question_id for question_id, _ in answers}))
+        )
+        
+        results = []
+        rows = []
+        for question_id, user_answer in answers:
+            key = answer_key[question_id]
+            is_correct = user_answer == key.correct_answer
+            score_earned = key.points if is_correct else 0
+            rows.append({
+                'user_id': user.id,
+                'question_id': question_id,
+                'user_answer': user_answer,
+                'is_correct': is_correct,
+                'score_earned': score_earned
+            })
+            results.append({
+                'question_id': question_id,
+                'is_correct': is_correct,
+                'score_earned': score_earned,
+                'correct_answer': key.correct_answer,
+                'explanation': explanations.get(question_id)
+            })
+        
+        # 创建答题记录
+        db.session.execute(QuizRecord.__table__.insert(), rows)
+        score_earned = sum(row['score_earned'] for row in rows)
+        self._add_user_score(user.id, quiz_delta=score_earned)
+        self._add_quiz_stats(user.id, rows)
+        self._mark_quiz_seen(user.id, [row['question_id'] for row in rows if row['is_correct']])
+        db.session.commit()
+        if score_earned:
+            _leaderboard_cache.clear()
+        
+        # 检查并解锁成就
+        newly_unlocked = self.check_and_unlock_achievements(user, event='quiz_answered')
+        return results, newly_unlocked
+
     def get_user_quiz_stats(self, user_id):
         """
         获取用户答题统计
@@ -881,117 +2019,214 @@ class DataService:
         Returns:
             dict: 包含答题统计信息的字典
         """
-        records = QuizRecord.query.filter_by(user_id=user_id).all()
-        total_questions = len(records)
-        correct_count = sum(1 for r in records if r.is_correct)
+        stats = db.session.get(UserQuizStats, user_id)
+        return (stats or UserQuizStats(
+            answered=0, correct=0, score=0, current_streak=0, best_streak=0
+        )).to_dict()
+
+    def _add_quiz_stats(self, user_id, rows):
+        """
+        按一批答题记录原子更新用户答题统计行（私有方法）
         
-        return {
-            'total_answered': total_questions,
-            'total_correct': correct_count,
-            'accuracy': round(correct_count / total_questions * 100, 1) if total_questions > 0 else 0,
-            'total_score_from_quiz': sum(r.score_earned for r in records)
-        }
+        连对由本批的首段连对、末段连对和批内最长连对推出，
+        ON CONFLICT DO UPDATE 中的列引用均为更新前的值。不提交事务。
+        
+        Args:
+            user_id: 用户 ID
+            rows: 按作答顺序排列的答题记录字典（含 is_correct、score_earned）
+        """
+        outcomes = [row['is_correct'] for row in rows]
+        answered = len(outcomes)
+        correct = sum(outcomes)
+        score = sum(row['score_earned'] for row in rows)
+        leading = next((i for i, ok in enumerate(outcomes) if not ok), answered)
+        trailing = next((i for i, ok in enumerate(reversed(outcomes)) if not ok), answered)
+        best = run = 0
+        for ok in outcomes:
+            run = run + 1 if ok else 0
+            best = max(best, run)
+        
+        table = UserQuizStats.__table__
+        stmt = sqlite_insert(table).values(
+            user_id=user_id,
+            answered=answered,
+            correct=correct,
+            score=score,
+            current_streak=trailing,
+            best_streak=best
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                'answered': table.c.answered + answered,
+                'correct': table.c.correct + correct,
+                'score': table.c.score + score,
+                'current_streak': (
+                    table.c.current_streak + answered if leading == answered else trailing
+                ),
+                'best_streak': func.max(table.c.best_streak, table.c.current_streak + leading, best),
+            }
+        )
+        db.session.execute(stmt)
+
+    def rebuild_quiz_stats(self):
+        """
+        从答题记录重建所有用户的答题统计行
+        
+        答题数、正确数、积分用 SQL GROUP BY 聚合，连对由 backfill_quiz_streaks 流式计算。
+        
+        Returns:
+            int: 重建的用户行数
+        """
+        rows = db.session.query(
+            QuizRecord.user_id,
+            func.count(QuizRecord.id),
+            func.coalesce(func.sum(db.cast(QuizRecord.is_correct, db.Integer)), 0),
+            func.coalesce(func.sum(QuizRecord.score_earned), 0)
+        ).group_by(QuizRecord.user_id).all()
+        UserQuizStats.query.delete()
+        db.session.bulk_insert_mappings(UserQuizStats, [
+            {
+                'user_id': user_id,
+                'answered': answered,
+                'correct': correct,
+                'score': score,
+                'current_streak': 0,
+                'best_streak': 0
+            }
+            for user_id, answered, correct, score in rows
+        ])
+        db.session.commit()
+        self.backfill_quiz_streaks()
+        return len(rows)
+
+    def backfill_quiz_streaks(self, batch_size=5000):
+        """
+        从答题记录重算所有用户的当前连对和最佳连对
+        
+        按 (user_id, timestamp, id) 顺序流式读取答题结果，每个用户只扫描一遍，
+        内存占用与记录数无关；只更新已有统计行的连对列。
+        
+        Args:
+            batch_size: 每批从数据库读取的记录数
+            
+        Returns:
+            int: 更新的用户数
+        """
+        results = db.session.query(QuizRecord.user_id, QuizRecord.is_correct)\
+            .order_by(QuizRecord.user_id, QuizRecord.timestamp, QuizRecord.id)\
+            .yield_per(batch_size)
+        streaks = []
+        user_id = None
+        current = best = 0
+        for row_user_id, is_correct in results:
+            if row_user_id != user_id:
+                if user_id is not None:
+                    streaks.append({'uid': user_id, 'current': current, 'best': best})
+                user_id, current, best = row_user_id, 0, 0
+            current = current + 1 if is_correct else 0
+            best = max(best, current)
+        if user_id is not None:
+            streaks.append({'uid': user_id, 'current': current, 'best': best})
+        
+        if streaks:
+            table = UserQuizStats.__table__
+            db.session.execute(
+                table.update()
+                .where(table.c.user_id == bindparam('uid'))
+                .values(current_streak=bindparam('current'), best_streak=bindparam('best')),
+                streaks
+            )
+        db.session.commit()
+        return len(streaks)
 
     # ==================== 成就相关方法 (Achievement Methods) ====================
 
-    def check_and_unlock_achievements(self, user):
+    def check_and_unlock_achievements(self, user, event=None):
         """
         检查并解锁用户成就
         
+        由写路径发出事件（quiz_answered、favorite_added、article_viewed、
+        song_created、chat_message、forum_posted），只评估订阅该事件的规则；
+        event 为 None 时全量检查所有规则。
+        
         Args:
             user: 用户对象
+            event: 事件类型（可选）
             
         Returns:
             list: 新解锁的成就列表
         """
-        achievements = Achievement.query.all()
-        newly_unlocked = []
-        for ach in achievements:
-            # 检查是否已解锁
-            if ach in user.achievements:
-                continue
-            
-            # 根据成就类型检查条件
-            should_unlock = False
-            
-            if ach.condition_type == 'quiz_correct':
-                # 答对指定数量的题目
-                correct_count = QuizRecord.query.filter_by(
-                    user_id=user.id,
-                    is_correct=True
-                ).count()
-                if correct_count >= ach.condition_value:
-                    should_unlock = True
-                    
-            elif ach.condition_type == 'quiz_streak':
-                # 连续答对（简化处理）
-                records = QuizRecord.query.filter_by(user_id=user.id)\
-                    .order_by(QuizRecord.timestamp).limit(ach.condition_value).all()
-                if all(r.is_correct for r in records) and len(records) >= ach.condition_value:
-                    should_unlock = True
-                    
-            elif ach.condition_type == 'total_score':
-                # 总积分达到指定值
-                if user.total_score >= ach.condition_value:
-                    should_unlock = True
-                    
-            elif ach.condition_type == 'favorite_songs':
-                # 收藏歌曲达到指定数量
-                if user.favorites.count() >= ach.condition_value:
-                    should_unlock = True
-                    
-            elif ach.condition_type == 'created_songs':
-                # 创作歌曲（这里简化，使用答题作为代理）
-                # 实际应该统计创作记录
-                quiz_count = QuizRecord.query.filter_by(user_id=user.id).count()
-                if quiz_count >= ach.condition_value:
-                    should_unlock = True
-                    
-            elif ach.condition_type == 'chat_messages':
-                # 对话消息数达到指定数量
-                chat_count = ChatHistory.query.filter_by(user_id=user.id).count()
-                if chat_count >= ach.condition_value:
-                    should_unlock = True
-            
-            elif ach.condition_type == 'learn_articles':
-                # 浏览AI红歌微课达到指定数量
-                view_count = ArticleView.query.filter_by(user_id=user.id).count()
-                if view_count >= ach.condition_value:
-                    should_unlock = True
-            
-            elif ach.condition_type == 'create_songs':
-                # 创作歌曲达到指定数量
-                create_count = CreatedSong.query.filter_by(user_id=user.id).count()
-                if create_count >= ach.condition_value:
-                    should_unlock = True
-            
-            elif ach.condition_type == 'forum_posts':
-                # 发表帖子达到指定数量
-                if user.posts.count() >= ach.condition_value:
-                    should_unlock = True
-            
-            elif ach.condition_type == 'achievement_count':
-                # 解锁指定数量的成就
-                unlocked_count = user.achievements.count()
-                if unlocked_count >= ach.condition_value:
-                    should_unlock = True
-            
-            if should_unlock:
-                logger.info(f"解锁成就: {ach.name} (条件 {ach.condition_type})")
-                if ach not in user.achievements:
-                    user.achievements.append(ach)
-                    newly_unlocked.append(ach)
-                    logger.info(f"成就 {ach.name} 已添加到用户和 newly_unlocked 列表")
-                else:
-                    logger.warning(f"成就 {ach.name} 已存在，跳过")
+        engine = self.get_catalog('achievement').engine
+        unlocked_ids = {
+            row.achievement_id for row in db.session.query(user_achievements.c.achievement_id)
+            .filter(user_achievements.c.user_id == user.id)
+        }
+        newly_unlocked = engine.evaluate(
+            event,
+            unlocked_ids,
+            lambda condition_type, rules: self._get_achievement_counter(user, condition_type, rules)
+        )
+        
+        for ach in newly_unlocked:
+            logger.info(f"解锁成就: {ach.name} (条件 {ach.condition_type})")
         if newly_unlocked:
+            db.session.execute(
+                user_achievements.insert().prefix_with('OR IGNORE'),
+                [{'user_id': user.id, 'achievement_id': ach.id} for ach in newly_unlocked]
+            )
+            self._add_user_score(
+                user.id, achievement_delta=sum(a.points or 0 for a in newly_unlocked)
+            )
             db.session.commit()
+            _leaderboard_cache.clear()
             logger.info(f"成功解锁 {len(newly_unlocked)} 个成就，已提交到数据库")
         else:
             logger.debug("本次没有新成就解锁")
         
         return newly_unlocked
 
+    def _get_achievement_counter(self, user, condition_type, rules):
+        """
+        获取成就条件对应的用户计数（私有方法）
+        
+        Args:
+            user: 用户对象
+            condition_type: 条件类型
+            rules: 该条件下尚未解锁的成就列表
+            
+        Returns:
+            int: 当前计数值
+        """
+        if condition_type in ('quiz_correct', 'quiz_streak', 'created_songs'):
+            stats = db.session.get(UserQuizStats, user.id)
+            if stats is None:
+                return 0
+            if condition_type == 'quiz_correct':
+                # 答对指定数量的题目
+                return stats.correct
+            if condition_type == 'quiz_streak':
+                # 曾经连续答对的最多题数
+                return stats.best_streak
+            # 历史遗留条件：使用答题数作为代理
+            return stats.answered
+        if condition_type == 'total_score':
+            return user.total_score
+        if condition_type == 'favorite_songs':
+            return user.favorites.count()
+        if condition_type == 'chat_messages':
+            return ChatHistory.query.filter_by(user_id=user.id).count()
+        if condition_type == 'learn_articles':
+            return ArticleView.query.filter_by(user_id=user.id).count()
+        if condition_type == 'create_songs':
+            return CreatedSong.query.filter_by(user_id=user.id).count()
+        if condition_type == 'forum_posts':
+            return user.posts.count()
+        if condition_type == 'achievement_count':
+            return user.achievements.count()
+        logger.warning(f"未知成就条件类型: {condition_type}")
+        return 0
+
     def get_user_achievements(self, user):
         """
         获取用户已解锁和未解锁的成就
@@ -1002,8 +2237,11 @@ class DataService:
         Returns:
             dict: 包含已解锁、未解锁成就和统计信息的字典
         """
-        all_achievements = Achievement.query.all()
-        user_achievement_ids = {a.id for a in user.achievements}
+        all_achievements = self.get_catalog('achievement').items
+        user_achievement_ids = {
+            row.achievement_id for row in db.session.query(user_achievements.c.achievement_id)
+            .filter(user_achievements.c.user_id == user.id)
+        }
         
         unlocked = [a for a in all_achievements if a.id in user_achievement_ids]
         locked = [a for a in all_achievements if a.id not in user_achievement_ids]
@@ -1015,88 +2253,312 @@ class DataService:
             'total_count': len(all_achievements)
         }
 
+    def _achievement_count_column(self):
+        """
+        构造按用户统计成就数的关联子查询列（私有方法）
+        
+        Returns:
+            ScalarSelect: 可直接放入 SELECT 的成就数列
+        """
+        return db.session.query(func.count(user_achievements.c.achievement_id))\
+            .filter(user_achievements.c.user_id == User.id)\
+            .correlate(User)\
+            .scalar_subquery()\
+            .label('achievement_count')
+
     def get_quiz_leaderboard(self, limit=10):
         """
         获取答题积分排行榜（仅按答题积分排序）
         
+        单条 SQL 同时返回积分和成就数，结果按 limit 短时缓存。
+        
         Args:
-            limit: 返回排行榜数量（默认为 10）
+            limit: 返回排行榜数量（默认为 10，最大 100）
             
         Returns:
             list: 排行榜列表，包含排名、用户名、积分和成就数
         """
-        # 计算每个用户的答题积分
-        quiz_score_subq = db.session.query(
-            QuizRecord.user_id,
-            func.sum(QuizRecord.score_earned).label('quiz_score')
-        ).group_by(QuizRecord.user_id).subquery()
+        limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+        cache_key = ('quiz', limit)
+        cached = _leaderboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # 查询有答题记录的用户，按答题积分排序
+        # 直接按 user_score.quiz_score 索引排序
         result = db.session.query(
-            User.id,
             User.username,
-            func.coalesce(quiz_score_subq.c.quiz_score, 0).label('quiz_score')
-        ).join(quiz_score_subq, User.id == quiz_score_subq.c.user_id)\
-        .order_by(func.coalesce(quiz_score_subq.c.quiz_score, 0).desc())\
+            UserScore.quiz_score,
+            self._achievement_count_column()
+        ).join(UserScore, User.id == UserScore.user_id)\
+        .filter(UserScore.quiz_score > 0)\
+        .order_by(UserScore.quiz_score.desc())\
         .limit(limit)\
         .all()
         
-        return [{
+        leaderboard = [{
             'rank': idx + 1,
             'username': r.username,
-            'quiz_score': int(r.quiz_score) if r.quiz_score else 0,
-            'achievement_count': User.query.get(r.id).achievements.count()
+            'quiz_score': r.quiz_score,
+            'achievement_count': r.achievement_count
         } for idx, r in enumerate(result)]
+        _leaderboard_cache.set(cache_key, leaderboard)
+        return leaderboard
 
     def get_leaderboard(self, limit=10):
         """
         获取总积分排行榜（答题积分 + 成就积分）
         
+        单条 SQL 同时返回积分和成就数，结果按 limit 短时缓存。
+        
         Args:
-            limit: 返回排行榜数量（默认为 10）
+            limit: 返回排行榜数量（默认为 10，最大 100）
             
         Returns:
             list: 排行榜列表，包含排名、用户名、总积分和成就数
         """
-        # 计算每个用户的答题积分
+        limit = max(1, min(limit, LEADERBOARD_MAX_LIMIT))
+        cache_key = ('total', limit)
+        cached = _leaderboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # 外连接积分物化表，没有积分行的用户按 0 分参与排名
+        total_score = func.coalesce(UserScore.total_score, 0).label('total_score')
+        result = db.session.query(
+            User.username,
+            total_score,
+            self._achievement_count_column()
+        ).outerjoin(UserScore, User.id == UserScore.user_id)\
+        .order_by(total_score.desc())\
+        .limit(limit)\
+        .all()
+        
+        leaderboard = [{
+            'rank': idx + 1,
+            'username': r.username,
+            'total_score': r.total_score,
+            'achievement_count': r.achievement_count
+        } for idx, r in enumerate(result)]
+        _leaderboard_cache.set(cache_key, leaderboard)
+        return leaderboard
+
+    # ==================== 积分物化表维护 (User Score Maintenance) ====================
+
+    def _add_user_score(self, user_id, quiz_delta=0, achievement_delta=0):
+        """
+        增量更新用户积分物化行（私有方法）
+        
+        使用 INSERT ... ON CONFLICT DO UPDATE 原子累加，不提交事务，
+        由调用方与答题记录或成就解锁一并提交。
+        
+        Args:
+            user_id: 用户 ID
+            quiz_delta: 答题积分增量
+            achievement_delta: 成就积分增量
+        """
+        if not quiz_delta and not achievement_delta:
+            return
+        stmt = sqlite_insert(UserScore).values(
+            user_id=user_id,
+            quiz_score=quiz_delta,
+            achievement_score=achievement_delta,
+            total_score=quiz_delta + achievement_delta
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserScore.user_id],
+            set_={
+                'quiz_score': UserScore.quiz_score + quiz_delta,
+                'achievement_score': UserScore.achievement_score + achievement_delta,
+                'total_score': UserScore.total_score + quiz_delta + achievement_delta,
+            }
+        )
+        db.session.execute(stmt)
+
+    def _compute_user_scores(self):
+        """
+        从原始表聚合所有用户的积分（私有方法）
+        
+        Returns:
+            dict: user_id -> (quiz_score, achievement_score)
+        """
         quiz_score_subq = db.session.query(
             QuizRecord.user_id,
             func.sum(QuizRecord.score_earned).label('quiz_score')
         ).group_by(QuizRecord.user_id).subquery()
         
-        # 计算每个用户的成就积分
         achievement_score_subq = db.session.query(
             user_achievements.c.user_id,
             func.sum(Achievement.points).label('achievement_score')
         ).join(Achievement, user_achievements.c.achievement_id == Achievement.id)\
             .group_by(user_achievements.c.user_id).subquery()
         
-        # 使用外连接获取所有用户，并计算总积分
-        result = db.session.query(
+        rows = db.session.query(
             User.id,
-            User.username,
-            func.coalesce(quiz_score_subq.c.quiz_score, 0).label('quiz_score'),
-            func.coalesce(achievement_score_subq.c.achievement_score, 0).label('achievement_score')
+            func.coalesce(quiz_score_subq.c.quiz_score, 0),
+            func.coalesce(achievement_score_subq.c.achievement_score, 0)
         ).outerjoin(quiz_score_subq, User.id == quiz_score_subq.c.user_id)\
         .outerjoin(achievement_score_subq, User.id == achievement_score_subq.c.user_id)\
-        .order_by((func.coalesce(quiz_score_subq.c.quiz_score, 0) +
-                    func.coalesce(achievement_score_subq.c.achievement_score, 0)).desc())\
-        .limit(limit)\
         .all()
+        return {user_id: (int(quiz), int(ach)) for user_id, quiz, ach in rows}
+
+    def rebuild_user_scores(self):
+        """
+        从 QuizRecord 和 user_achievements 重建积分物化表
         
-        return [{
-            'rank': idx + 1,
-            'username': user.username,
-            'total_score': user.total_score,
-            'achievement_count': user.achievements.count()
-        } for idx, user in enumerate([User.query.get(r.id) for r in result])]
+        Returns:
+            int: 重建的用户行数
+        """
+        scores = self._compute_user_scores()
+        UserScore.query.delete()
+        db.session.bulk_insert_mappings(UserScore, [
+            {
+                'user_id': user_id,
+                'quiz_score': quiz,
+                'achievement_score': ach,
+                'total_score': quiz + ach
+            }
+            for user_id, (quiz, ach) in scores.items()
+        ])
+        db.session.commit()
+        _leaderboard_cache.clear()
+        return len(scores)
 
+    def check_user_scores(self):
+        """
+        校验积分物化表与原始表是否一致
+        
+        Returns:
+            list: 不一致的记录列表，每项包含 user_id、expected 和 actual
+        """
+        expected = self._compute_user_scores()
+        actual = {
+            row.user_id: (row.quiz_score, row.achievement_score, row.total_score)
+            for row in UserScore.query.all()
+        }
+        mismatches = []
+        for user_id in sorted(set(expected) | set(actual)):
+            quiz, ach = expected.get(user_id, (0, 0))
+            want = (quiz, ach, quiz + ach)
+            got = actual.get(user_id, (0, 0, 0))
+            if want != got:
+                mismatches.append({'user_id': user_id, 'expected': want, 'actual': got})
+        return mismatches
 
 
 # ==============================================================================
 # 数据库初始化函数
 # ==============================================================================
 
+# 旧数据库升级：(表名, 列名, 列定义, 回填 SQL)
+SCHEMA_UPGRADES = [
+    (
+        'forum_post', 'like_count', 'INTEGER NOT NULL DEFAULT 0',
+        'UPDATE forum_post SET like_count = '
+        '(SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = forum_post.id)'
+    ),
+]
+
+# 需要在已存在的表上补建的索引
+UPGRADE_INDEXES = [
+    forum_post_feed_index,
+    chat_history_user_timestamp_index,
+]
+
+
+def upgrade_schema():
+    """
+    为旧数据库补齐新增的列和索引
+    
+    db.create_all() 只会创建缺失的表，已有表上新增的列和索引在此补齐，
+    新列按 SCHEMA_UPGRADES 中的 SQL 从原始数据回填。
+    """
+    inspector = inspect(db.engine)
+    for table, column, ddl, backfill in SCHEMA_UPGRADES:
+        columns = {c['name'] for c in inspector.get_columns(table)}
+        if column in columns:
+            continue
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        if backfill:
+            db.session.execute(text(backfill))
+        db.session.commit()
+        logger.info(f"已为表 {table} 添加列 {column}")
+    for index in UPGRADE_INDEXES:
+        index.create(db.engine, checkfirst=True)
+
+
+def rebuild_search_fts():
+    """
+    从歌曲、文章、历史事件表重建统一全文索引
+    
+    Returns:
+        int: 写入索引的行数
+    """
+    db.session.execute(text('DELETE FROM search_fts'))
+    rows = [_search_fts_row('song', song) for song in Song.query.all()]
+    rows += [_search_fts_row('article', article) for article in Article.query.all()]
+    rows += [_search_fts_row('event', event) for event in HistoricalEvent.query.all()]
+    if rows:
+        db.session.execute(_SEARCH_FTS_INSERT, rows)
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_search_fts():
+    """
+    创建统一全文索引并在与原始表条数不一致时重建
+    
+    SQLite 未编译 FTS5 时记录警告，歌曲搜索回退到 LIKE 匹配。
+    """
+    try:
+        db.session.execute(text('DROP TABLE IF EXISTS song_fts'))
+        db.session.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title, subtitle, body)'
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        _search_fts_state['enabled'] = False
+        logger.warning(f"FTS5 不可用，歌曲搜索回退到 LIKE 匹配: {e}")
+        return
+    _search_fts_state['enabled'] = True
+    indexed = db.session.execute(text('SELECT COUNT(*) FROM search_fts')).scalar()
+    expected = Song.query.count() + Article.query.count() + HistoricalEvent.query.count()
+    if indexed != expected:
+        count = rebuild_search_fts()
+        logger.info(f"已重建全文索引，共 {count} 条")
+
+
+def rebuild_region_index():
+    """
+    从歌曲表重建地区映射和地区统计
+    
+    Returns:
+        int: 写入的歌曲地区映射条数
+    """
+    connection = db.session.connection()
+    connection.execute(song_region.delete())
+    rows = []
+    for song_id, region in db.session.query(Song.id, Song.region).all():
+        region_ids = resolve_region_ids(region)
+        if region and not region_ids:
+            logger.warning(f"歌曲 {song_id} 的地区无法识别: {region}")
+        rows.extend({'song_id': song_id, 'region_id': region_id} for region_id in region_ids)
+    if rows:
+        connection.execute(song_region.insert(), rows)
+    _refresh_region_stats(connection, [region_id for region_id, _, _ in REGIONS])
+    db.session.commit()
+    return len(rows)
+
+
+def ensure_region_index():
+    """地区统计为空或映射覆盖的歌曲数与歌曲表不一致时重建地区索引"""
+    mapped = db.session.query(func.count(func.distinct(song_region.c.song_id))).scalar()
+    expected = Song.query.filter(Song.region.isnot(None), Song.region != '').count()
+    if mapped != expected or not RegionStats.query.first():
+        count = rebuild_region_index()
+        logger.info(f"已重建地区索引，共 {count} 条映射")
+
+
 def init_db():
     """
     初始化数据库
@@ -1110,6 +2572,7 @@ def init_db():
     - 论坛帖子
     """
     db.create_all()
+    upgrade_schema()
 
     # 填充歌曲数据
     if not Song.query.first():
@@ -1774,6 +3237,23 @@ def init_db():
         db.session.commit()
         print(f"共添加了 {added_count} 个新成就。")
 
+    # 旧数据库首次升级时回填积分物化表（用户可能只有成就积分而没有答题记录）
+    if not UserScore.query.first() and (
+        QuizRecord.query.first() or db.session.query(user_achievements).first()
+    ):
+        DataService().rebuild_user_scores()
+        print("已从答题记录和成就回填用户积分表。")
+
+    # 旧数据库首次升级时回填答题统计表
+    if not UserQuizStats.query.first() and QuizRecord.query.first():
+        DataService().rebuild_quiz_stats()
+        print("已从答题记录回填用户答题统计表。")
+
+    # 旧数据库首次升级时回填已答对题目位图
+    if not UserQuizSeen.query.first() and QuizRecord.query.filter_by(is_correct=True).first():
+        DataService().rebuild_quiz_seen()
+        print("已从答题记录回填用户已答对题目。")
+
     # 填充论坛帖子数据
     if not ForumPost.query.first() and User.query.first():
         default_user = User.query.first()
@@ -1785,6 +3265,16 @@ def init_db():
         db.session.commit()
 
     db.session.commit()
+    ensure_search_fts()
+    ensure_region_index()
+    # 种子数据经 bulk_save_objects 写入，不触发版本号监听，这里统一递增使各 worker 的目录缓存失效
+    for name in REFERENCE_CATALOG_MODELS:
+        bump_content_version(db.session.connection(), name)
+    db.session.commit()
+    reference_cache.clear()
+    song_suggest_index.rebuild(
+        db.session.query(Song.id, Song.title, Song.artist, Song.region).all()
+    )
     print("数据库已初始化并填充了所有初始数据。")
 
 def register_commands(app):
@@ -1800,4 +3290,59 @@ def register_commands(app):
         with app.app_context():
             init_db()
 
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """重建歌曲、文章、历史事件的统一全文索引：`flask rebuild-search-index`"""
+        with app.app_context():
+            ensure_search_fts()
+            count = rebuild_search_fts()
+            print(f"已重建全文索引，共 {count} 条。")
+
+    @app.cli.command("rebuild-region-index")
+    def rebuild_region_index_command():
+        """从歌曲表重建地区映射和地区统计：`flask rebuild-region-index`"""
+        with app.app_context():
+            count = rebuild_region_index()
+            print(f"已重建地区索引，共 {count} 条映射。")
+
+    @app.cli.command("rebuild-scores")
+    def rebuild_scores_command():
+        """从原始表重建用户积分物化表：`flask rebuild-scores`"""
+        with app.app_context():
+            count = DataService().rebuild_user_scores()
+            print(f"已重建 {count} 个用户的积分。")
+
+    @app.cli.command("rebuild-quiz-stats")
+    def rebuild_quiz_stats_command():
+        """从答题记录重建用户答题统计表：`flask rebuild-quiz-stats`"""
+        with app.app_context():
+            count = DataService().rebuild_quiz_stats()
+            print(f"已重建 {count} 个用户的答题统计。")
+
+    @app.cli.command("backfill-quiz-streaks")
+    def backfill_quiz_streaks_command():
+        """从答题记录重算用户的当前连对和最佳连对：`flask backfill-quiz-streaks`"""
+        with app.app_context():
+            count = DataService().backfill_quiz_streaks()
+            print(f"已重算 {count} 个用户的连对记录。")
+
+    @app.cli.command("rebuild-quiz-seen")
+    def rebuild_quiz_seen_command():
+        """从答题记录重建用户已答对题目位图：`flask rebuild-quiz-seen`"""
+        with app.app_context():
+            count = DataService().rebuild_quiz_seen()
+            print(f"已重建 {count} 个用户的已答对题目。")
+
+    @app.cli.command("check-scores")
+    def check_scores_command():
+        """校验用户积分物化表与原始表是否一致：`flask check-scores`"""
+        with app.app_context():
+            mismatches = DataService().check_user_scores()
+            for m in mismatches:
+                print(f"用户 {m['user_id']}: 期望 {m['expected']}，实际 {m['actual']}")
+            if mismatches:
+                print(f"发现 {len(mismatches)} 处不一致，可运行 `flask rebuild-scores` 修复。")
+                raise SystemExit(1)
+            print("用户积分表与原始表一致。")
+
 
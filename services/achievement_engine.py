@@ -0,0 +1,123 @@
+"""
+成就规则引擎模块
+
+将成就定义按 condition_type 建立索引，写路径只需发出带类型的事件
+（如 quiz_answered、favorite_added），引擎仅评估订阅了该事件的规则：
+- 计数器按需获取，同一次评估中每种条件只取一次
+- 解锁后派生计数（成就数、总积分）在内存中递增，迭代到不动点
+- 本模块不依赖数据库，计数来源由调用方（DataService）提供
+"""
+
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+# 写路径事件 -> 可能因此变化的条件类型
+EVENT_SUBSCRIPTIONS = {
+    "quiz_answered": ("quiz_correct", "quiz_streak", "created_songs", "total_score"),
+    "favorite_added": ("favorite_songs",),
+    "article_viewed": ("learn_articles",),
+    "song_created": ("create_songs",),
+    "chat_message": ("chat_messages",),
+    "forum_posted": ("forum_posts",),
+}
+
+# 由成就解锁本身驱动的派生条件，需要迭代到不动点
+DERIVED_CONDITIONS = ("achievement_count", "total_score")
+
+
+class AchievementEngine:
+    """
+    成就规则引擎
+
+    Attributes:
+        rules_by_condition: condition_type -> 按 condition_value 升序排列的成就列表
+    """
+
+    def __init__(self, achievements):
+        """
+        Args:
+            achievements: 成就对象列表，需具备 id、condition_type、condition_value、points 属性
+        """
+        self.rules_by_condition = defaultdict(list)
+        for ach in achievements:
+            self.rules_by_condition[ach.condition_type].append(ach)
+        for rules in self.rules_by_condition.values():
+            rules.sort(key=lambda a: a.condition_value)
+
+    def conditions_for(self, event):
+        """
+        获取事件订阅的条件类型
+
+        Args:
+            event: 事件类型，为 None 时表示全量检查
+
+        Returns:
+            tuple: 需要评估的条件类型
+        """
+        if event is None:
+            return tuple(self.rules_by_condition.keys())
+        if event not in EVENT_SUBSCRIPTIONS:
+            logger.warning(f"未知成就事件: {event}")
+            return ()
+        return EVENT_SUBSCRIPTIONS[event]
+
+    def evaluate(self, event, unlocked_ids, get_counter):
+        """
+        评估事件涉及的规则并返回新解锁的成就
+
+        Args:
+            event: 事件类型（None 表示评估全部规则）
+            unlocked_ids: 用户已解锁的成就 ID 集合
+            get_counter: 回调函数 get_counter(condition_type, rules) -> int，
+                         rules 为该条件下尚未解锁的成就列表；
+                         返回值应反映本次评估解锁之前的状态
+
+        Returns:
+            list: 新解锁的成就列表（按解锁顺序）
+        """
+        unlocked_ids = set(unlocked_ids)
+        counters = {}
+        newly_unlocked = []
+
+        def pending(condition_type):
+            return [
+                a for a in self.rules_by_condition.get(condition_type, ())
+                if a.id not in unlocked_ids
+            ]
+
+        def unlock_ready(condition_type):
+            rules = pending(condition_type)
+            if not rules:
+                return []
+            if condition_type not in counters:
+                value = get_counter(condition_type, rules)
+                # 派生计数首次读取时补上本次已解锁但尚未写库的部分
+                if condition_type == "achievement_count":
+                    value += len(newly_unlocked)
+                elif condition_type == "total_score":
+                    value += sum(a.points or 0 for a in newly_unlocked)
+                counters[condition_type] = value
+            value = counters[condition_type]
+            return [a for a in rules if value >= a.condition_value]
+
+        # 解锁后递增派生计数，直到没有新的成就解锁
+        conditions = list(self.conditions_for(event))
+        while conditions:
+            batch = []
+            for condition_type in conditions:
+                batch.extend(unlock_ready(condition_type))
+            if not batch:
+                break
+            for ach in batch:
+                unlocked_ids.add(ach.id)
+                newly_unlocked.append(ach)
+            if "achievement_count" in counters:
+                counters["achievement_count"] += len(batch)
+            if "total_score" in counters:
+                counters["total_score"] += sum(a.points or 0 for a in batch)
+            conditions = list(DERIVED_CONDITIONS)
+
+        return newly_unlocked
@@ -10,14 +10,37 @@ Agent 服务模块
 
 import logging
 import json
+import threading
 
-from database import Article
+from flask import current_app
+
+from services.context_builder import build_context, truncate_to_tokens
+from services.intent_rules import classify_intent, intent_stats
 from services.llm_service import call_openrouter_api
+from services.sensitive_filter import sensitive_filter
 
 logger = logging.getLogger(__name__)
 
+# 对话上下文预算：历史消息 + 摘要 + 当前输入的估算 token 总数
+AGENT_CONTEXT_TOKEN_BUDGET = 1200
+# 单条历史消息和摘要的 token 上限（当前输入不截断）
+AGENT_MESSAGE_TOKEN_LIMIT = 300
+# 原样发送的最近对话轮数
+AGENT_HISTORY_TURNS = 6
+# 滑出窗口且未摘要的对话达到该轮数时重新生成摘要
+SUMMARY_REFRESH_TURNS = 4
+# 游客前端历史最多检查的条数
+GUEST_HISTORY_SCAN = 20
+
+# 正在后台生成摘要的用户 ID，同一用户同时只生成一份
+_summarizing = set()
+_summarizing_lock = threading.Lock()
+
+SUMMARY_SYSTEM_PROMPT = """你负责压缩'红小韵'与用户的对话记录。
+请把已有摘要和新增对话合并成一段不超过 150 字的中文摘要，保留用户的兴趣、偏好、提到的歌曲或历史事件以及尚未完成的请求。
+只输出摘要正文。"""
 
-SENSITIVE_WORDS = ["暴力", "色情", "赌博", "反动", "脏话", "违规"]
+LYRICS_SYSTEM_PROMPT = "你是一位才华横溢的红歌作词家。请创作一首正能量、朗朗上口的歌词。"
 
 AGENT_SYSTEM_PROMPT = """你是一个名为'红小韵'的AI陪伴助手，专注于红歌文化与中国革命史。
 你的任务是分析用户输入，并返回一个 JSON 对象。格式: {"intent": "...", "params": {...}, "reply_text": "..."}
@@ -51,7 +74,7 @@ def process_agent_request(
     1. 验证 API Key 和用户输入
     2. 执行用户已确认的操作
     3. 进行敏感词过滤
-    4. 构建对话上下文并调用 LLM 进行意图识别
+    4. 先用本地规则识别高置信度意图，无法确定时构建对话上下文并调用 LLM 进行意图识别
     5. 根据识别的意图执行相应的业务逻辑
     6. 返回格式化的响应
 
@@ -91,46 +114,36 @@ def process_agent_request(
         return _handle_confirmed_action(confirmed_action, api_key, data_service, user)
 
     # 2. 敏感词过滤
-    for word in SENSITIVE_WORDS:
-        if word in user_input:
-            return {"response_type": "text", "text_response": "请文明用语"}
-
-    # 3. 构建上下文
-    messages = []
-    if user.is_authenticated:
-        # 从数据库获取最近历史
-        db_history = data_service.get_chat_history(user.id)[-6:]
-        for h in db_history:
-            messages.extend(
-                [
-                    {"role": "user", "content": h["question"]},
-                    {"role": "assistant", "content": h["answer"]},
-                ]
-            )
-    else:
-        # 使用前端传来的历史
-        messages = history[-6:]
-
-    messages.append({"role": "user", "content": user_input})
-
-    # 4. 调用 LLM 进行意图识别
-    llm_res = call_openrouter_api(
-        api_key,
-        messages,
-        response_format={"type": "json_object"},
-        system_instruction=AGENT_SYSTEM_PROMPT,
-    )
+    if sensitive_filter.find(user_input):
+        return {"response_type": "text", "text_response": "请文明用语"}
+
+    # 3. 本地规则识别高置信度意图（导航、点歌、找视频），命中时不调用 LLM
+    local = classify_intent(user_input, data_service.get_catalog("song").engine)
+    if local is None:
+        # 4. 构建上下文并调用 LLM 进行意图识别
+        messages = _build_agent_context(user_input, history, api_key, data_service, user)
+        llm_res = call_openrouter_api(
+            api_key,
+            messages,
+            response_format={"type": "json_object"},
+            system_instruction=AGENT_SYSTEM_PROMPT,
+        )
 
     try:
-        # 解析 LLM 响应
-        content = llm_res["choices"][0]["message"]["content"]
-        parsed = json.loads(content)
-        intent = parsed.get("intent", "chat")
-        params = parsed.get("params", {})
-        reply = parsed.get("reply_text", "收到")
+        if local is not None:
+            intent, params, reply = local
+        else:
+            # 解析 LLM 响应
+            content = llm_res["choices"][0]["message"]["content"]
+            parsed = json.loads(content)
+            intent = parsed.get("intent", "chat")
+            params = parsed.get("params", {})
+            reply = parsed.get("reply_text", "收到")
+        intent_stats.record(intent, local=local is not None)
 
         if not reply:
             reply = "好的"
+        reply = sensitive_filter.mask(reply)
 
         # 5. 根据意图分发
         if intent == "chat":
@@ -140,23 +153,36 @@ def process_agent_request(
 
         elif intent in ["search_songs", "search_songs_by_keyword"]:
             kw = params.get("keyword", "").strip()
-            songs = data_service.search_songs(
-                kw, user if user.is_authenticated else None
-            )
+            search_user = user if user.is_authenticated else None
+            if kw:
+                # 一次统一检索，歌曲作为主卡片，文章和史实作为相关推荐
+                results = data_service.search_all(kw, search_user)
+                songs = [r["data"] for r in results if r["type"] == "song"]
+                related = [r for r in results if r["type"] != "song"]
+            else:
+                songs = data_service.search_songs(kw, search_user)
+                related = []
             return {
                 "response_type": "content_card",
                 "card_type": "song_list",
                 "data": songs,
+                "related": related,
                 "text_response": reply,
             }
 
         elif intent == "search_video":
             kw = params.get("keyword", "").strip()
-            vids = [
-                a.to_dict()
-                for a in Article.query.filter(Article.title.contains(kw)).all()
-                if a.video_url
-            ]
+            if kw:
+                results = data_service.search_all(kw, types=["article", "event"])
+                vids = [
+                    r["data"]
+                    for r in results
+                    if r["type"] == "article" and r["data"]["video_url"]
+                ]
+                related = [r for r in results if r["type"] == "event"]
+            else:
+                vids = [a for a in data_service.get_articles() if a["video_url"]]
+                related = []
             if not vids:
                 return {
                     "response_type": "text",
@@ -166,6 +192,7 @@ def process_agent_request(
                 "response_type": "content_card",
                 "card_type": "video_list",
                 "data": vids,
+                "related": related,
                 "text_response": reply,
             }
 
@@ -197,7 +224,7 @@ def _handle_confirmed_action(confirmed_action, api_key, data_service, user):
 
     当用户在前端确认某个操作后，该函数执行相应的业务逻辑。
     目前支持：
-    - 歌词创作确认：调用 LLM 生成歌词内容
+    - 歌词创作确认：主题通过敏感词检查后调用 LLM 生成歌词内容
 
     Args:
         confirmed_action (dict): 前端传回的确认动作，包含：
@@ -229,28 +256,241 @@ def _handle_confirmed_action(confirmed_action, api_key, data_service, user):
 
     if intent == "create_song_lyrics":
         theme = params.get("theme", "祖国")
+        # 主题来自客户端，与 /api/create/lyrics 一样先做敏感词检查
+        if sensitive_filter.find(str(theme)):
+            return {"response_type": "text", "text_response": "请文明用语"}
         res = call_openrouter_api(
             api_key,
             [{"role": "user", "content": f"创作主题：{theme}"}],
-            system_instruction="你是一位才华横溢的红歌作词家。请创作一首正能量、朗朗上口的歌词。",
+            system_instruction=LYRICS_SYSTEM_PROMPT,
         )
 
         lyrics = "创作失败"
         if "choices" in res and len(res["choices"]) > 0:
             lyrics = res["choices"][0]["message"]["content"]
 
-        return {
-            "response_type": "content_card",
-            "card_type": "lyrics_card",
-            "data": {
-                "lyrics": lyrics,
-                "theme": theme,
-                "navigate_instruction": {
-                    "path": "/creation",
-                    "params": {"auto_fill_lyrics": lyrics},
-                },
-            },
-            "text_response": "歌词创作完成！",
-        }
+        return _lyrics_card(theme, lyrics)
 
     return {"response_type": "text", "text_response": "暂不支持该操作"}
+
+
+def process_agent_request_stream(
+    user_input, history, confirmed_action, api_key, data_service, user
+):
+    """
+    Agent 请求的流式版本
+
+    歌词创作确认动作以流式方式调用 LLM，每收到一段文本就产出一个 delta 事件，
+    最后产出与非流式接口相同的歌词卡片；其他请求的结果需要完整解析 JSON 意图，
+    直接执行 process_agent_request 并作为唯一的 done 事件产出。
+
+    Args:
+        参数同 process_agent_request
+
+    Yields:
+        tuple: (事件名, 数据)，事件名为：
+            - "delta"：{"text": "文本增量"}
+            - "done"：最终响应字典（与 process_agent_request 的返回格式相同）
+            - "error"：{"error": "错误信息", "status": 状态码}
+    """
+    if (
+        api_key
+        and confirmed_action
+        and confirmed_action.get("intent") == "create_song_lyrics"
+    ):
+        theme = confirmed_action.get("params", {}).get("theme", "祖国")
+        if sensitive_filter.find(str(theme)):
+            yield "done", {"response_type": "text", "text_response": "请文明用语"}
+            return
+        res = call_openrouter_api(
+            api_key,
+            [{"role": "user", "content": f"创作主题：{theme}"}],
+            system_instruction=LYRICS_SYSTEM_PROMPT,
+            stream=True,
+        )
+        chunks = []
+        for chunk in sensitive_filter.mask_stream(res.get("stream", ())):
+            chunks.append(chunk)
+            yield "delta", {"text": chunk}
+        yield "done", _lyrics_card(theme, "".join(chunks) or "创作失败")
+        return
+
+    result = process_agent_request(
+        user_input, history, confirmed_action, api_key, data_service, user
+    )
+    if isinstance(result, tuple):
+        response, status_code = result
+        yield "error", {"error": response.get("error", ""), "status": status_code}
+        return
+    yield "done", result
+
+
+def _lyrics_card(theme, lyrics):
+    """
+    构建歌词创作结果卡片（私有方法）
+
+    Args:
+        theme (str): 创作主题
+        lyrics (str): 歌词内容
+
+    Returns:
+        dict: 响应字典，格式见 _handle_confirmed_action
+    """
+    lyrics = sensitive_filter.mask(lyrics)
+    return {
+        "response_type": "content_card",
+        "card_type": "lyrics_card",
+        "data": {
+            "lyrics": lyrics,
+            "theme": theme,
+            "navigate_instruction": {
+                "path": "/creation",
+                "params": {"auto_fill_lyrics": lyrics},
+            },
+        },
+        "text_response": "歌词创作完成！",
+    }
+
+
+def _build_agent_context(user_input, history, api_key, data_service, user):
+    """
+    构建有 token 预算的对话上下文
+
+    登录用户从数据库取最近几轮对话，更早的对话用滚动摘要代替，
+    滑出窗口且未摘要的对话积累到 SUMMARY_REFRESH_TURNS 轮时在后台线程调用 LLM 更新摘要，
+    本次请求仍使用已有摘要，不等待摘要生成；游客只使用前端传来的历史，按预算裁剪。
+
+    Args:
+        user_input (str): 用户输入的文本
+        history (list): 前端传来的对话历史（仅游客使用）
+        api_key (str): LLM API 密钥
+        data_service (DataService): 数据服务实例
+        user (User): 当前用户对象
+
+    Returns:
+        list: 发送给 LLM 的消息列表
+    """
+    if user.is_authenticated:
+        recent = data_service.get_recent_chat_history(
+            user.id, AGENT_HISTORY_TURNS + SUMMARY_REFRESH_TURNS
+        )
+        window = recent[-AGENT_HISTORY_TURNS:]
+        summary, last_chat_id = data_service.get_chat_summary(user.id)
+        context = build_context(
+            _turns_to_messages(window),
+            user_input,
+            AGENT_CONTEXT_TOKEN_BUDGET,
+            summary,
+            AGENT_MESSAGE_TOKEN_LIMIT,
+        )
+
+        # 没有原样发送、也未被摘要覆盖的较早对话
+        kept_turns = context.kept_messages // 2
+        slid = [t for t in recent[: len(recent) - kept_turns] if t["id"] > last_chat_id]
+        if len(slid) >= SUMMARY_REFRESH_TURNS:
+            _refresh_summary_in_background(api_key, data_service, user.id, summary, slid)
+    else:
+        guest_history = [
+            m
+            for m in (history if isinstance(history, list) else [])[-GUEST_HISTORY_SCAN:]
+            if isinstance(m, dict)
+            and m.get("role") in ("user", "assistant")
+            and isinstance(m.get("content"), str)
+        ]
+        context = build_context(
+            guest_history,
+            user_input,
+            AGENT_CONTEXT_TOKEN_BUDGET,
+            max_message_tokens=AGENT_MESSAGE_TOKEN_LIMIT,
+        )
+
+    logger.info(
+        f"Agent 上下文: 约 {context.tokens} tokens，保留 {context.kept_messages} 条历史消息"
+    )
+    return context.messages
+
+
+def _turns_to_messages(turns):
+    """
+    将聊天记录转换为 user / assistant 消息列表
+
+    Args:
+        turns (list): 聊天记录字典列表（按时间升序）
+
+    Returns:
+        list: 消息列表
+    """
+    messages = []
+    for t in turns:
+        messages.extend(
+            [
+                {"role": "user", "content": t["question"]},
+                {"role": "assistant", "content": t["answer"]},
+            ]
+        )
+    return messages
+
+
+def _refresh_summary_in_background(api_key, data_service, user_id, summary, turns):
+    """
+    在后台线程中生成并保存新的滚动摘要（尽力而为）
+
+    LLM 网关繁忙、调用失败或保存失败时只记录日志，下一次对话会再次尝试。
+
+    Args:
+        api_key (str): LLM API 密钥
+        data_service (DataService): 数据服务实例
+        user_id (int): 用户 ID
+        summary (str): 已有摘要（可为空）
+        turns (list): 需要并入摘要的聊天记录（按时间升序）
+    """
+    with _summarizing_lock:
+        if user_id in _summarizing:
+            return
+        _summarizing.add(user_id)
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                new_summary = _summarize_turns(api_key, summary, turns)
+                if new_summary:
+                    data_service.save_chat_summary(user_id, new_summary, turns[-1]["id"])
+        except Exception as e:
+            logger.warning(f"对话摘要更新失败，下次对话重试: {e}")
+        finally:
+            with _summarizing_lock:
+                _summarizing.discard(user_id)
+
+    threading.Thread(target=run, name=f"chat-summary-{user_id}", daemon=True).start()
+
+
+def _summarize_turns(api_key, summary, turns):
+    """
+    将已有摘要与新滑出窗口的对话合并为新的滚动摘要
+
+    Args:
+        api_key (str): LLM API 密钥
+        summary (str): 已有摘要（可为空）
+        turns (list): 需要并入摘要的聊天记录（按时间升序）
+
+    Returns:
+        str: 新摘要，生成失败时返回 None
+    """
+    lines = [
+        f"用户：{truncate_to_tokens(t['question'], AGENT_MESSAGE_TOKEN_LIMIT)}\n"
+        f"红小韵：{truncate_to_tokens(t['answer'], AGENT_MESSAGE_TOKEN_LIMIT)}"
+        for t in turns
+    ]
+    content = (f"已有摘要：{summary}\n\n" if summary else "") + "新增对话：\n" + "\n".join(lines)
+    res = call_openrouter_api(
+        api_key,
+        [{"role": "user", "content": content}],
+        system_instruction=SUMMARY_SYSTEM_PROMPT,
+    )
+    try:
+        text = res["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError):
+        logger.warning(f"对话摘要生成失败: {res.get('error') if isinstance(res, dict) else res}")
+        return None
+    return truncate_to_tokens(text, AGENT_MESSAGE_TOKEN_LIMIT) or None
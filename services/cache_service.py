@@ -0,0 +1,172 @@
+"""
+缓存服务模块
+
+提供进程内的轻量缓存工具：
+- TTLCache：带过期时间和容量上限的线程安全键值缓存
+- VersionedCache：按内容版本号失效的只读数据目录缓存，附带命中统计
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    带过期时间的进程内缓存
+
+    每个 gunicorn worker 各自持有一份，跨进程的一致性依靠较短的 TTL 保证；
+    写路径在提交后调用 clear()/invalidate() 使本进程立即可见。
+
+    Attributes:
+        ttl: 条目存活秒数
+        max_size: 最多保留的条目数，超出时淘汰最早写入的条目
+    """
+
+    def __init__(self, ttl, max_size=128):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        读取未过期的缓存值
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中或已过期时返回 None
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        """
+        写入缓存值
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        删除单个缓存条目
+
+        Args:
+            key: 缓存键
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """清空全部缓存条目"""
+        with self._lock:
+            self._data.clear()
+
+
+class VersionedCache:
+    """
+    按内容版本号失效的数据目录缓存
+
+    每个目录缓存一份加载结果及其内容版本号。读取时最多每 check_interval 秒
+    调用一次 load_version 比对版本，版本变化才重新加载；版本号存放在数据库中，
+    因此任一 gunicorn worker 的写入都会让其他 worker 在下一次比对时失效。
+    缓存值由多个请求共享，调用方不得修改。
+
+    Attributes:
+        check_interval: 两次版本比对之间的最短间隔（秒）
+    """
+
+    def __init__(self, load_version, check_interval=1.0):
+        """
+        Args:
+            load_version: 回调函数 load_version(name) -> int，读取目录当前的内容版本号
+            check_interval: 版本比对间隔（秒）
+        """
+        self.check_interval = check_interval
+        self._load_version = load_version
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        """
+        读取目录，未缓存或版本变化时调用 loader 重新加载
+
+        Args:
+            name: 目录名称
+            loader: 无参回调函数，返回目录的只读结构
+
+        Returns:
+            目录的缓存值
+        """
+        now = time.monotonic()
+        entry = self._entries.get(name)
+        if entry is not None and now - entry[2] < self.check_interval:
+            self._count(name, 'hits')
+            return entry[1]
+
+        version = self._load_version(name)
+        self._count(name, 'version_checks')
+        if entry is not None and entry[0] == version:
+            with self._lock:
+                self._entries[name] = (version, entry[1], now)
+            self._count(name, 'hits')
+            return entry[1]
+
+        value = loader()
+        with self._lock:
+            self._entries[name] = (version, value, now)
+        self._count(name, 'misses')
+        return value
+
+    def expire(self, name):
+        """
+        使目录在下一次读取时立即比对版本号（本进程写入提交后调用）
+
+        Args:
+            name: 目录名称
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries[name] = (entry[0], entry[1], float('-inf'))
+
+    def clear(self):
+        """丢弃全部缓存的目录（统计保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        获取各目录的命中统计
+
+        Returns:
+            dict: 目录名称 -> 包含 hits、misses、version_checks 和当前缓存版本号的字典
+        """
+        with self._lock:
+            return {
+                name: dict(counts, version=self._entries[name][0] if name in self._entries else None)
+                for name, counts in self._stats.items()
+            }
+
+    def _count(self, name, key):
+        """累加命中统计（私有方法）"""
+        with self._lock:
+            counts = self._stats.setdefault(name, {'hits': 0, 'misses': 0, 'version_checks': 0})
+            counts[key] += 1
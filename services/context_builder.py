@@ -0,0 +1,108 @@
+"""
+对话上下文构建模块
+
+为 Agent 的 LLM 请求组装有 token 预算的对话上下文：
+- 本地估算 token 数：汉字按 1 个 token 计，其他字符按 4 个字符 1 个 token 计
+- 单条历史消息和摘要超过上限时截断，当前输入始终完整保留
+- 历史消息从最新往前装入，直到用完预算
+- 更早的对话由调用方提供的滚动摘要代替
+本模块不依赖数据库和 LLM 接口。
+"""
+
+import re
+from collections import namedtuple
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+AgentContext = namedtuple("AgentContext", ["messages", "tokens", "kept_messages"])
+
+
+def estimate_tokens(text):
+    """
+    估算文本的 token 数
+
+    Args:
+        text (str): 文本（可为 None）
+
+    Returns:
+        int: 估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    将文本截断到不超过 max_tokens 个 token，截断时末尾加省略号
+
+    Args:
+        text (str): 原始文本
+        max_tokens (int): token 上限
+
+    Returns:
+        str: 截断后的文本
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    latin = 0
+    for i, char in enumerate(text):
+        if _CJK_RE.match(char):
+            used += 1
+        else:
+            latin += 1
+            if latin % 4 == 1:
+                used += 1
+        if used > max_tokens - 1:
+            return text[:i] + "…"
+    return text
+
+
+def build_context(history, user_input, budget, summary=None, max_message_tokens=400):
+    """
+    在 token 预算内构建发送给 LLM 的消息列表
+
+    当前输入完整保留（不截断）并和摘要优先占用预算，历史消息从最新往前装入，
+    装不下的更早消息被丢弃；保留下来的历史总是以用户消息开头。
+
+    Args:
+        history (list): 历史消息，按时间升序，格式为 [{"role": ..., "content": ...}, ...]
+        user_input (str): 当前用户输入
+        budget (int): 消息总 token 预算
+        summary (str, optional): 更早对话的滚动摘要
+        max_message_tokens (int): 单条历史消息和摘要的 token 上限
+
+    Returns:
+        AgentContext: messages（消息列表）、tokens（估算总 token 数）、
+                      kept_messages（保留的历史消息条数）
+    """
+    current = {"role": "user", "content": user_input}
+    used = estimate_tokens(current["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    prefix = []
+    if summary:
+        content = "此前对话的摘要：" + truncate_to_tokens(summary, max_message_tokens)
+        cost = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost <= budget:
+            prefix.append({"role": "system", "content": content})
+            used += cost
+
+    kept = []
+    for message in reversed(history):
+        content = truncate_to_tokens(message["content"], max_message_tokens)
+        cost = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        kept.append({"role": message["role"], "content": content})
+        used += cost
+    kept.reverse()
+    while kept and kept[0]["role"] != "user":
+        used -= estimate_tokens(kept[0]["content"]) + MESSAGE_OVERHEAD_TOKENS
+        kept.pop(0)
+
+    return AgentContext(prefix + kept + [current], used, len(kept))
@@ -0,0 +1,238 @@
+"""
+导航助手意图分类模块
+
+为各页面的 "红小韵" 导航助手（/api/guide/command）提供本地分类器：
+- 特征为归一化文本的汉字一元组和二元组
+- 模型为多项式朴素贝叶斯，在模块加载时用内置的标注样本训练（约 1 毫秒）
+- 后验概率低于阈值、查询中多数特征未在训练样本中出现，或判为 "其他" 时返回 None，
+  由调用方交给 LLM
+本模块不依赖数据库和 LLM 接口。
+"""
+
+import math
+from collections import Counter
+
+from services.suggest_index import normalize_key
+
+# 导航目标：action_id -> 路径、展示名称和本地识别时的介绍语
+GUIDE_TOOLS = {
+    "search_songs": {
+        "path": "/circle",
+        "label": "听·山河",
+        "intro": "在**听·山河**，您可以按地区在地图上浏览红歌，也可以直接搜索歌名、演唱者。",
+    },
+    "learn_stories": {
+        "path": "/making",
+        "label": "问·古今",
+        "intro": "在**问·古今**，AI 助手红小韵会为您讲述红歌背后的故事和历史。",
+    },
+    "study_history": {
+        "path": "/plaza",
+        "label": "阅·峥嵘",
+        "intro": "在**阅·峥嵘**，您可以观看党史微课视频、浏览历史大事。",
+    },
+    "create_song": {
+        "path": "/creation",
+        "label": "谱·华章",
+        "intro": "在**谱·华章**，输入主题即可由 AI 作词，再选择风格一键生成歌曲。",
+    },
+    "view_favorites": {
+        "path": "/favorites",
+        "label": "我的收藏",
+        "intro": "这里是**我的收藏**，汇集了您收藏过的红歌。",
+    },
+    "site_info": {
+        "path": "/",
+        "label": "功能介绍",
+        "intro": (
+            "红韵网站包含五个板块：**听·山河**（按地区听红歌）、**问·古今**（与 AI 聊红歌故事）、"
+            "**阅·峥嵘**（党史微课与历史大事）、**谱·华章**（AI 作词作曲）以及**我的收藏**。"
+        ),
+    },
+}
+
+# 标注样本：(用户问题, action_id)，action_id 为 None 表示不属于任何导航目标
+GUIDE_TRAINING_DATA = [
+    ("我想搜索红歌", "search_songs"),
+    ("我想听歌", "search_songs"),
+    ("去听歌", "search_songs"),
+    ("搜歌", "search_songs"),
+    ("找一首红歌听听", "search_songs"),
+    ("听红歌", "search_songs"),
+    ("播放音乐", "search_songs"),
+    ("各地有哪些红歌", "search_songs"),
+    ("按地区查看红歌", "search_songs"),
+    ("红歌地图", "search_songs"),
+    ("听山河", "search_songs"),
+    ("我想听东方红", "search_songs"),
+    ("给我讲讲东方红的故事", "learn_stories"),
+    ("讲讲红歌背后的故事", "learn_stories"),
+    ("这首歌的创作背景是什么", "learn_stories"),
+    ("我想了解红歌故事", "learn_stories"),
+    ("和AI聊聊红歌", "learn_stories"),
+    ("我想和红小韵对话", "learn_stories"),
+    ("问古今", "learn_stories"),
+    ("红歌的历史由来", "learn_stories"),
+    ("讲个故事", "learn_stories"),
+    ("我想看党史视频", "study_history"),
+    ("看微课", "study_history"),
+    ("学习党史", "study_history"),
+    ("看看历史大事", "study_history"),
+    ("有哪些历史事件", "study_history"),
+    ("观看红色视频", "study_history"),
+    ("阅峥嵘", "study_history"),
+    ("学习历史知识", "study_history"),
+    ("我想看纪录片", "study_history"),
+    ("我想写歌", "create_song"),
+    ("帮我作词", "create_song"),
+    ("AI作曲", "create_song"),
+    ("我想创作一首红歌", "create_song"),
+    ("生成一首歌", "create_song"),
+    ("写一首歌词", "create_song"),
+    ("谱华章", "create_song"),
+    ("自己创作歌曲", "create_song"),
+    ("我的收藏", "view_favorites"),
+    ("打开收藏", "view_favorites"),
+    ("查看我收藏的歌", "view_favorites"),
+    ("收藏夹", "view_favorites"),
+    ("我喜欢的歌曲在哪", "view_favorites"),
+    ("看看我的收藏列表", "view_favorites"),
+    ("这个网站的功能是什么", "site_info"),
+    ("网站能做什么", "site_info"),
+    ("介绍一下这个网站", "site_info"),
+    ("怎么使用这个网站", "site_info"),
+    ("有哪些功能", "site_info"),
+    ("你是谁", "site_info"),
+    ("返回首页", "site_info"),
+    ("回到主页", "site_info"),
+    ("怎么快速解锁成就", None),
+    ("怎么获得更多积分", None),
+    ("我还需要多少分才能解锁下一个成就", None),
+    ("有哪些成就可以解锁", None),
+    ("返回答题页面", None),
+    ("我想答题", None),
+    ("今天天气怎么样", None),
+    ("你好", None),
+    ("谢谢", None),
+    ("排行榜在哪里", None),
+    ("查看已经解锁的成就", None),
+    ("怎么查看我的积分", None),
+    ("如何移除收藏的歌曲", None),
+    ("取消收藏", None),
+    ("歌曲能下载到本地吗", None),
+    ("怎么下载这首歌", None),
+    ("忘记密码了怎么办", None),
+    ("如何登录", None),
+]
+
+# 判定为本地结果所需的最小后验概率
+GUIDE_CONFIDENCE = 0.9
+# 查询特征中至少有这么大比例在训练词表中出现过
+GUIDE_MIN_FEATURE_COVERAGE = 0.5
+
+_OTHER = "__other__"
+
+
+def guide_features(text):
+    """
+    提取字符 n-gram 特征（一元组和二元组）
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        list: 特征列表（可重复）
+    """
+    key = normalize_key(text)
+    return list(key) + [key[i:i + 2] for i in range(len(key) - 1)]
+
+
+class NgramNaiveBayes:
+    """
+    基于字符 n-gram 的多项式朴素贝叶斯分类器
+
+    Attributes:
+        alpha: 拉普拉斯平滑系数
+    """
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self._log_prior = {}
+        self._log_likelihood = {}
+        self._log_unseen = {}
+        self._vocabulary = set()
+
+    def fit(self, samples):
+        """
+        训练模型
+
+        Args:
+            samples: 可迭代的 (文本, 标签)
+
+        Returns:
+            NgramNaiveBayes: 自身，便于链式调用
+        """
+        counts = {}
+        docs = Counter()
+        for text, label in samples:
+            counts.setdefault(label, Counter()).update(guide_features(text))
+            docs[label] += 1
+        self._vocabulary = set().union(*counts.values())
+        total_docs = sum(docs.values())
+        for label, feature_counts in counts.items():
+            denominator = sum(feature_counts.values()) + self.alpha * len(self._vocabulary)
+            self._log_prior[label] = math.log(docs[label] / total_docs)
+            self._log_likelihood[label] = {
+                f: math.log((c + self.alpha) / denominator) for f, c in feature_counts.items()
+            }
+            self._log_unseen[label] = math.log(self.alpha / denominator)
+        return self
+
+    def predict(self, text):
+        """
+        预测标签
+
+        Args:
+            text (str): 待分类文本
+
+        Returns:
+            tuple: (标签, 后验概率, 特征覆盖率)；文本没有任何特征时返回 (None, 0.0, 0.0)
+        """
+        features = guide_features(text)
+        if not features:
+            return None, 0.0, 0.0
+        known = [f for f in features if f in self._vocabulary]
+        scores = {}
+        for label, prior in self._log_prior.items():
+            likelihood = self._log_likelihood[label]
+            unseen = self._log_unseen[label]
+            scores[label] = prior + sum(likelihood.get(f, unseen) for f in known)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        probability = 1.0 / sum(math.exp(s - top) for s in scores.values())
+        return best, probability, len(known) / len(features)
+
+
+_model = NgramNaiveBayes().fit(
+    (text, label if label is not None else _OTHER) for text, label in GUIDE_TRAINING_DATA
+)
+
+
+def classify_guide_query(query):
+    """
+    将导航助手的问题分类为 GUIDE_TOOLS 中的 action_id
+
+    Args:
+        query (str): 用户问题
+
+    Returns:
+        str: action_id，不够确定或不属于任何导航目标时返回 None
+    """
+    label, probability, coverage = _model.predict(query)
+    if (
+        label in GUIDE_TOOLS
+        and probability >= GUIDE_CONFIDENCE
+        and coverage >= GUIDE_MIN_FEATURE_COVERAGE
+    ):
+        return label
+    return None
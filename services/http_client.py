@@ -0,0 +1,202 @@
+"""
+HTTP 客户端模块
+
+为外部 API（OpenRouter、Kie）提供共享的 HTTP 客户端：
+- 每个 worker 进程持有一个 requests.Session，复用 keep-alive 连接池，
+  避免每次调用重新进行 DNS 解析和 TCP/TLS 握手
+- 连接超时与读取超时分开设置
+- 对可重试的状态码（429、5xx）和连接失败做带随机抖动的指数退避重试，
+  优先遵循服务端返回的 Retry-After；POST 等非幂等请求只在请求发出之前的
+  连接阶段失败时重试，避免重复触发计费的生成任务
+- 按服务名统计调用次数、尝试次数、失败次数和耗时
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# 默认超时：(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (3.05, 30)
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# 连接中断后可以安全重发的方法
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def _is_connect_error(error):
+    """
+    判断连接错误是否发生在请求发出之前（私有函数）
+
+    建立连接超时或失败（拒绝连接、DNS 解析失败）时请求尚未发出；
+    服务端在收到请求后断开（RemoteDisconnected、ProtocolError）则不属于此类。
+
+    Args:
+        error (requests.exceptions.ConnectionError): 连接错误
+
+    Returns:
+        bool: 请求是否确定没有发出
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # 连接阶段的失败由 urllib3 包装为 MaxRetryError，原因在 reason 中
+    return isinstance(getattr(reason, "reason", reason), NewConnectionError)
+
+
+class HttpClient:
+    """
+    带连接池、重试和耗时统计的 HTTP 客户端
+
+    Session 在首次使用时按进程创建：gunicorn fork 出的 worker 不会共用 master
+    进程中的连接。
+
+    Attributes:
+        pool_maxsize: 每个主机保留的最大连接数
+        max_retries: 默认最大重试次数（不含首次请求）
+        backoff_base: 退避基数（秒），第 n 次重试最多等待 backoff_base * 2^(n-1)
+        backoff_max: 单次退避等待上限（秒）
+    """
+
+    def __init__(self, pool_maxsize=10, max_retries=2, backoff_base=0.5, backoff_max=8.0):
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._metrics = {}
+
+    def request(self, method, url, service="default", timeout=DEFAULT_TIMEOUT,
+                retries=None, retry_statuses=RETRYABLE_STATUSES, **kwargs):
+        """
+        发送 HTTP 请求，失败时按策略重试
+
+        建立连接失败会重试；连接在请求发出后中断（包括连接池中失效的 keep-alive 连接）
+        只对 GET 等幂等请求重试，POST 不重发，避免上游重复执行和计费。
+        读取超时不重试，避免用户等待数倍的超时时间。
+
+        Args:
+            method (str): HTTP 方法
+            url (str): 请求地址
+            service (str): 统计用的服务名
+            timeout (tuple): (连接超时, 读取超时)
+            retries (int, optional): 最大重试次数，默认使用 max_retries
+            retry_statuses (set): 需要重试的响应状态码
+            **kwargs: 透传给 requests.Session.request 的参数
+
+        Returns:
+            requests.Response: 最后一次尝试的响应
+
+        Raises:
+            requests.exceptions.RequestException: 重试耗尽后仍然失败时抛出最后一次的异常
+        """
+        retries = self.max_retries if retries is None else retries
+        session = self._get_session()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if attempt > retries or not (
+                    method.upper() in IDEMPOTENT_METHODS or _is_connect_error(e)
+                ):
+                    self._record(service, start, attempt, failed=True)
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{service} 连接失败，{delay:.2f}s 后第 {attempt} 次重试: {e}")
+            except requests.exceptions.RequestException:
+                self._record(service, start, attempt, failed=True)
+                raise
+            else:
+                if response.status_code not in retry_statuses or attempt > retries:
+                    self._record(service, start, attempt, failed=response.status_code >= 400)
+                    return response
+                delay = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(
+                    f"{service} 返回 {response.status_code}，{delay:.2f}s 后第 {attempt} 次重试"
+                )
+                response.close()
+            time.sleep(delay)
+
+    def post(self, url, **kwargs):
+        """发送 POST 请求，参数同 request()"""
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        """发送 GET 请求，参数同 request()"""
+        return self.request("GET", url, **kwargs)
+
+    def stats(self):
+        """
+        返回本进程的调用统计
+
+        Returns:
+            dict: 服务名 -> calls、attempts、retries、failures、avg_ms、max_ms
+        """
+        with self._lock:
+            result = {}
+            for service, m in self._metrics.items():
+                result[service] = {
+                    "calls": m["calls"],
+                    "attempts": m["attempts"],
+                    "retries": m["attempts"] - m["calls"],
+                    "failures": m["failures"],
+                    "avg_ms": round(m["total_ms"] / m["calls"], 1) if m["calls"] else 0,
+                    "max_ms": round(m["max_ms"], 1),
+                }
+            return result
+
+    def _get_session(self):
+        """获取当前进程的 Session，fork 后重新创建（私有方法）"""
+        pid = os.getpid()
+        with self._lock:
+            if self._session is None or self._pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+                self._pid = pid
+                self._metrics = {}
+            return self._session
+
+    def _backoff(self, attempt):
+        """计算第 attempt 次失败后的等待时间：full jitter 指数退避（私有方法）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _retry_after(self, response):
+        """解析 Retry-After 头（仅支持秒数），超过上限时截断（私有方法）"""
+        value = response.headers.get("Retry-After", "")
+        try:
+            return min(self.backoff_max, max(0.0, float(value)))
+        except ValueError:
+            return None
+
+    def _record(self, service, start, attempts, failed):
+        """记录一次调用的统计（私有方法）"""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            m = self._metrics.setdefault(
+                service, {"calls": 0, "attempts": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            m["calls"] += 1
+            m["attempts"] += attempts
+            m["failures"] += int(failed)
+            m["total_ms"] += elapsed_ms
+            m["max_ms"] = max(m["max_ms"], elapsed_ms)
+
+
+# 全局 HTTP 客户端，各外部服务共用连接池
+http_client = HttpClient()
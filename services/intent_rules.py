@@ -0,0 +1,201 @@
+"""
+本地意图识别模块
+
+在调用 LLM 之前用关键词 / 正则文法识别 Agent 的高置信度意图：
+- navigate：带明确动词的页面名称，如 "打开收藏"、"去谱华章页面"
+- search_songs：听 / 播放 / 搜索 + 曲库中的歌名，如 "我想听东方红"
+- search_video：看 / 搜索 + 关键词 + 视频 / 微课，如 "我想看长征的视频"
+文本先归一化（小写、去掉空白和标点），整句必须完整匹配某条文法；没有命中或命中多个
+意图时返回 None，由调用方交给 LLM。本模块不依赖数据库。
+"""
+
+import re
+import threading
+from collections import namedtuple
+
+from services.suggest_index import normalize_key
+
+# 本地识别结果，字段与 LLM 返回的 JSON 一致
+IntentMatch = namedtuple("IntentMatch", ["intent", "params", "reply_text"])
+
+# (路径, 展示名称, 无需 "页面" 后缀的名称, 需要 "页面" 后缀的名称)
+# 名称均为归一化后的形式（去掉了 "·" 等标点）
+NAVIGATION_TARGETS = [
+    ("/favorites", "我的收藏", ("我的收藏", "收藏夹", "收藏"), ()),
+    ("/circle", "听·山河", ("听山河",), ("听歌", "搜歌", "歌曲")),
+    ("/making", "问·古今", ("问古今",), ("对话", "故事", "聊天")),
+    ("/plaza", "阅·峥嵘", ("阅峥嵘",), ("视频", "微课", "史实")),
+    ("/creation", "谱·华章", ("谱华章",), ("创作", "写歌", "作曲")),
+    ("/", "主页", ("主页", "首页"), ()),
+]
+
+_POLITE = r"(?:请|请你|帮我|麻烦|给我)?"
+_TAIL = r"(?:吧|呀|啊|哦|呢|谢谢)?"
+
+
+def _alternation(words):
+    """按长度降序拼接正则分支，保证优先匹配较长的词"""
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_NAV_NAME_TO_TARGET = {}
+_PAGE_NAME_TO_TARGET = {}
+for _path, _label, _names, _page_names in NAVIGATION_TARGETS:
+    for _name in _names:
+        _NAV_NAME_TO_TARGET[_name] = (_path, _label)
+    for _name in _page_names:
+        _PAGE_NAME_TO_TARGET[_name] = (_path, _label)
+
+_NAV_RE = re.compile(
+    rf"^{_POLITE}(?:我要|我想)?(?:打开|去|进入|跳转到?|前往|带我去|切换到|回到|返回|查看|看看)"
+    rf"(?:一下)?(?:我的)?(?:(?P<name>{_alternation(_NAV_NAME_TO_TARGET)})(?:页面|页)?"
+    rf"|(?P<page>{_alternation(_PAGE_NAME_TO_TARGET)})(?:页面|页|板块)){_TAIL}$"
+)
+_NAV_BARE_RE = re.compile(rf"^(?P<name>我的收藏|收藏夹|首页|主页){_TAIL}$")
+
+_SONG_RE = re.compile(
+    rf"^{_POLITE}(?:我)?(?:想|要|想要)?(?:听听|听|播放|放|来|搜索|搜|找|查找|点)"
+    r"(?:一下|一首|一曲|首|歌曲)?(?P<title>.+?)(?:这首歌|这首|这支歌)?" + _TAIL + "$"
+)
+
+_VIDEO_RE = re.compile(
+    rf"^{_POLITE}(?:我)?(?:想|要|想要)?"
+    r"(?:看看|看一看|看|观看|搜搜|搜索|搜|找找|找|查找|查查|播放)(?:一下|一些|点)?"
+    r"(?:有哪些|有什么|有没有|哪些)?(?:关于|有关)?"
+    r"(?P<keyword>.*?)(?:的|相关的?)?(?:视频|微课|纪录片)" + _TAIL + "$"
+)
+
+# 视频关键词的最大长度，超过时多半是复杂句子，交给 LLM
+MAX_VIDEO_KEYWORD_LENGTH = 12
+# 含疑问词的关键词说明句子结构没有被文法覆盖，交给 LLM 提取
+_VIDEO_KEYWORD_REJECT_RE = re.compile(r"[哪吗么谁几]|什么|为何")
+
+
+class SongTitleIndex:
+    """
+    歌名索引：按归一化后的歌名查找曲库中的原始歌名
+
+    作为歌曲目录缓存的附属结构，随目录版本一起重建。
+    """
+
+    def __init__(self, titles):
+        self._titles = {}
+        for title in titles:
+            key = normalize_key(title)
+            if len(key) >= 2:
+                self._titles.setdefault(key, title)
+
+    def lookup(self, text):
+        """
+        精确查找歌名
+
+        Args:
+            text (str): 归一化后的文本
+
+        Returns:
+            str: 原始歌名，不在曲库中时返回 None
+        """
+        return self._titles.get(text)
+
+
+def classify_intent(text, title_index=None):
+    """
+    识别高置信度意图
+
+    Args:
+        text (str): 用户输入
+        title_index (SongTitleIndex, optional): 歌名索引，为 None 时不识别 search_songs
+
+    Returns:
+        IntentMatch: 识别结果，无法确定时返回 None
+    """
+    key = normalize_key(text)
+    if not key:
+        return None
+    matches = []
+
+    m = _NAV_RE.match(key) or _NAV_BARE_RE.match(key)
+    if m:
+        name = m.groupdict().get("name")
+        path, label = _NAV_NAME_TO_TARGET[name] if name else _PAGE_NAME_TO_TARGET[m.group("page")]
+        matches.append(IntentMatch("navigate", {"target": path}, f"好的，这就带您前往{label}。"))
+
+    if title_index is not None:
+        m = _SONG_RE.match(key)
+        title = title_index.lookup(m.group("title")) if m else title_index.lookup(key)
+        if title:
+            matches.append(
+                IntentMatch("search_songs", {"keyword": title}, f"为您找到《{title}》，请欣赏。")
+            )
+
+    m = _VIDEO_RE.match(key)
+    if m and _valid_video_keyword(m.group("keyword")):
+        keyword = m.group("keyword")
+        reply = f"为您找到{keyword}相关的视频。" if keyword else "为您找到以下视频。"
+        matches.append(IntentMatch("search_video", {"keyword": keyword}, reply))
+
+    return matches[0] if len(matches) == 1 else None
+
+
+def _valid_video_keyword(keyword):
+    """
+    判断视频关键词是否可以直接使用（私有函数）
+
+    空关键词表示浏览全部视频；单字（多半是动词残片，如 "找找视频" 中的 "找"）、
+    过长或含疑问词的关键词交给 LLM。
+
+    Args:
+        keyword (str): 归一化后的关键词
+
+    Returns:
+        bool: 是否可以直接使用
+    """
+    if not keyword:
+        return True
+    return (
+        2 <= len(keyword) <= MAX_VIDEO_KEYWORD_LENGTH
+        and not _VIDEO_KEYWORD_REJECT_RE.search(keyword)
+    )
+
+
+class IntentStats:
+    """
+    按意图统计本地识别与 LLM 识别的次数（本进程）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, intent, local):
+        """
+        记录一次意图识别
+
+        Args:
+            intent (str): 最终意图
+            local (bool): 是否由本地规则识别（跳过了 LLM）
+        """
+        with self._lock:
+            counts = self._counts.setdefault(intent, [0, 0])
+            counts[0 if local else 1] += 1
+
+    def stats(self):
+        """
+        返回各意图的 LLM 跳过率
+
+        Returns:
+            dict: 意图 -> local、llm、bypass_rate
+        """
+        with self._lock:
+            return {
+                intent: {
+                    "local": local,
+                    "llm": llm,
+                    "bypass_rate": round(local / (local + llm), 3),
+                }
+                for intent, (local, llm) in self._counts.items()
+            }
+
+
+# 全局意图统计
+intent_stats = IntentStats()
@@ -0,0 +1,186 @@
+"""
+LLM 响应缓存模块
+
+为结果基本确定的 LLM 调用（地区分析、导航指令等）提供持久化缓存：
+- 缓存键为模型、系统提示、消息和响应格式的 SHA-256 摘要
+- 存储在独立的 SQLite 文件中，所有 gunicorn worker 共享
+- 条目带过期时间，超过容量上限时按最近使用时间淘汰（LRU）
+- 各 worker 统计本进程的命中率
+缓存读写失败只记录日志，不影响 LLM 调用本身。本模块不依赖 Flask。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 命中时最近使用时间的刷新间隔（秒），避免每次读都写库
+TOUCH_INTERVAL = 60
+
+
+def make_cache_key(payload):
+    """
+    计算请求的缓存键
+
+    Args:
+        payload (dict): 参与计算的请求字段（模型、消息、响应格式等）
+
+    Returns:
+        str: 十六进制 SHA-256 摘要
+    """
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    基于 SQLite 的 LLM 响应缓存
+
+    每个进程、每个线程使用各自的连接；数据库使用 WAL 模式，读写互不阻塞。
+
+    Attributes:
+        path: SQLite 文件路径，可在首次使用前修改
+        max_entries: 最多保留的条目数
+    """
+
+    def __init__(self, path, max_entries=2000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._errors = 0
+
+    def get(self, key):
+        """
+        读取未过期的缓存响应
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            dict: 缓存的响应，未命中或已过期时返回 None
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT response, last_used FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is not None and now - row[1] > TOUCH_INTERVAL:
+                with conn:
+                    conn.execute(
+                        "UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key)
+                    )
+        except sqlite3.Error as e:
+            self._count("_errors")
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+        if row is None:
+            self._count("_misses")
+            return None
+        self._count("_hits")
+        return json.loads(row[0])
+
+    def set(self, key, response, ttl):
+        """
+        写入缓存响应，并淘汰过期和超出容量的条目
+
+        Args:
+            key (str): 缓存键
+            response (dict): LLM 响应
+            ttl (int): 存活秒数
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, expires_at, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(response, ensure_ascii=False), now + ttl, now),
+                )
+                conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            self._count("_errors")
+            logger.warning(f"LLM cache write failed: {e}")
+            return
+        self._count("_writes")
+
+    def clear(self):
+        """清空全部缓存条目"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        """
+        返回本进程的命中统计和缓存文件中的条目数
+
+        Returns:
+            dict: hits、misses、hit_rate、writes、errors、entries
+        """
+        try:
+            entries = self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0,
+                "writes": self._writes,
+                "errors": self._errors,
+                "entries": entries,
+            }
+
+    def _connect(self):
+        """获取当前线程的连接，fork 后或路径变化时重新打开（私有方法）"""
+        local = self._local
+        if (
+            getattr(local, "conn", None) is None
+            or local.pid != os.getpid()
+            or local.path != self.path
+        ):
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)"
+            )
+            local.conn = conn
+            local.pid = os.getpid()
+            local.path = self.path
+        return local.conn
+
+    def _count(self, name):
+        """累加命中统计（私有方法）"""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+# 全局 LLM 响应缓存，路径由 create_app 按 LLM_CACHE_PATH 配置设置
+llm_response_cache = LLMResponseCache(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp_tasks", "llm_cache.db"
+    )
+)
@@ -0,0 +1,158 @@
+"""
+LLM 网关模块
+
+限制每个 worker 同时进行的 LLM 上游调用数，避免慢请求占满处理线程：
+- 最多 max_concurrency 个调用同时进行，超出的调用排队等待
+- 排队数达到 max_queue，或排队超过 queue_timeout 秒时立即拒绝（LLMGatewayBusy），
+  由调用方返回 503 和 Retry-After，把线程让给页面和其他接口
+- 流式调用的名额一直占用到流读取结束或生成器被回收
+- 统计当前和峰值的进行数 / 排队数、拒绝次数、排队等待耗时和名额占用耗时
+配合 gunicorn 的 gthread worker 使用：处理线程数应大于 max_concurrency + max_queue，
+多出的线程留给非 LLM 请求。本模块不依赖 Flask。
+"""
+
+import math
+import threading
+import time
+
+
+class LLMGatewayBusy(Exception):
+    """LLM 网关已满，请求被拒绝"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM 服务繁忙，请 {retry_after} 秒后重试")
+        self.retry_after = retry_after
+
+
+class _Slot:
+    """一个已获得的调用名额，release 可重复调用"""
+
+    def __init__(self, gateway):
+        self._gateway = gateway
+        self._acquired_at = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        """归还名额"""
+        if self._released:
+            return
+        self._released = True
+        self._gateway._release(time.perf_counter() - self._acquired_at)
+
+
+class LLMGateway:
+    """
+    有界的 LLM 调用并发闸门（本进程）
+
+    Attributes:
+        max_concurrency: 同时进行的最大调用数
+        max_queue: 最大排队数
+        queue_timeout: 排队等待的最长秒数
+    """
+
+    def __init__(self, max_concurrency=6, max_queue=6, queue_timeout=10.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "peak_active": 0,
+            "peak_waiting": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "completed": 0,
+            "hold_ms_total": 0.0,
+        }
+
+    def acquire(self):
+        """
+        获取一个调用名额，必要时排队等待
+
+        Returns:
+            _Slot: 名额，使用完毕后必须调用 release()
+
+        Raises:
+            LLMGatewayBusy: 排队已满或等待超时
+        """
+        start = time.perf_counter()
+        with self._cond:
+            stats = self._stats
+            if self._active >= self.max_concurrency:
+                if self._waiting >= self.max_queue:
+                    stats["rejected"] += 1
+                    raise LLMGatewayBusy(self._retry_after())
+                stats["queued"] += 1
+                self._waiting += 1
+                stats["peak_waiting"] = max(stats["peak_waiting"], self._waiting)
+                try:
+                    admitted = self._cond.wait_for(
+                        lambda: self._active < self.max_concurrency, timeout=self.queue_timeout
+                    )
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    stats["timeouts"] += 1
+                    raise LLMGatewayBusy(self._retry_after())
+
+            self._active += 1
+            wait_ms = (time.perf_counter() - start) * 1000
+            stats["admitted"] += 1
+            stats["peak_active"] = max(stats["peak_active"], self._active)
+            stats["wait_ms_total"] += wait_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+        return _Slot(self)
+
+    def stats(self):
+        """
+        返回网关统计
+
+        Returns:
+            dict: 配置、当前 active / waiting 和累计统计
+        """
+        with self._cond:
+            stats = self._stats
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "waiting": self._waiting,
+                "admitted": stats["admitted"],
+                "queued": stats["queued"],
+                "rejected": stats["rejected"],
+                "timeouts": stats["timeouts"],
+                "peak_active": stats["peak_active"],
+                "peak_waiting": stats["peak_waiting"],
+                "avg_wait_ms": round(stats["wait_ms_total"] / stats["admitted"], 1)
+                if stats["admitted"]
+                else 0.0,
+                "max_wait_ms": round(stats["wait_ms_max"], 1),
+                "avg_hold_ms": round(stats["hold_ms_total"] / stats["completed"], 1)
+                if stats["completed"]
+                else 0.0,
+            }
+
+    def _release(self, held):
+        """归还名额并唤醒一个排队者（私有方法）"""
+        with self._cond:
+            self._active -= 1
+            self._stats["completed"] += 1
+            self._stats["hold_ms_total"] += held * 1000
+            self._cond.notify()
+
+    def _retry_after(self):
+        """按平均名额占用时间估算建议的重试秒数（私有方法，调用方持有锁）"""
+        completed = self._stats["completed"]
+        if not completed:
+            return 5
+        avg_hold = self._stats["hold_ms_total"] / completed / 1000
+        return max(1, math.ceil(avg_hold * (self._waiting + 1) / self.max_concurrency))
+
+
+# 全局 LLM 网关，容量由 create_app 按 LLM_MAX_CONCURRENCY 等配置设置
+llm_gateway = LLMGateway()
@@ -9,15 +9,33 @@ LLM 服务模块
 
 import json
 import logging
+import os
 import re
+import weakref
 
-import requests
+from services.http_client import http_client
+from services.llm_cache import llm_response_cache, make_cache_key
+from services.llm_gateway import llm_gateway
+from services.single_flight import llm_single_flight
 
 logger = logging.getLogger(__name__)
 
+OPENROUTER_API_URL = os.getenv(
+    "OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions"
+)
+
+# (连接超时, 读取超时)，单位秒
+OPENROUTER_TIMEOUT = (3.05, 30)
+
 
 def call_openrouter_api(
-    api_key, messages, response_format=None, system_instruction=None
+    api_key,
+    messages,
+    response_format=None,
+    system_instruction=None,
+    stream=False,
+    cache_ttl=None,
+    bypass_cache=False,
 ):
     """
     OpenRouter API 统一调用入口
@@ -27,20 +45,33 @@ def call_openrouter_api(
     2. 构建请求 payload
     3. 处理系统指令
     4. 处理响应格式（支持 JSON 模式）
-    5. 错误处理和日志记录
-    6. JSON 响应的增强提取（支持从 Markdown 代码块中提取）
+    5. 通过共享连接池发送请求，429/5xx 和连接失败自动退避重试
+    6. 错误处理和日志记录
+    7. JSON 响应的增强提取（支持从 Markdown 代码块中提取）
+    8. 流式模式：消费服务端的 SSE 流，逐段返回生成的文本
+    9. 可选的持久化响应缓存：由调用方按接口开启，只缓存成功的非流式响应；
+       开启缓存的相同请求并发到达时合并为一次上游调用（single-flight）
+    10. 上游调用经过 LLM 网关限流：每个 worker 同时进行的调用数有上限，
+        排队已满时抛出 LLMGatewayBusy（缓存命中不占用名额）
 
     Args:
         api_key (str): OpenRouter API 密钥
         messages (list): 消息列表，格式为 [{"role": "user", "content": "..."}, ...]
         response_format (dict, optional): 响应格式配置，例如 {"type": "json_object"}
         system_instruction (str, optional): 系统指令，用于设置 AI 的行为模式
+        stream (bool): 是否使用流式模式，流式模式下忽略 response_format
+        cache_ttl (int, optional): 响应缓存的存活秒数，为 None 时不使用缓存
+        bypass_cache (bool): 为 True 时跳过缓存读取，重新请求并刷新缓存
 
     Returns:
         dict: API 响应字典，包含：
-            - 成功时：OpenRouter API 的完整响应
+            - 成功时：OpenRouter API 的完整响应；
+              流式模式下为 {"stream": 生成器}，生成器逐段产出文本增量
             - 失败时：包含 "error" 键的错误信息字典
 
+    Raises:
+        LLMGatewayBusy: LLM 网关排队已满或等待超时，调用方应返回 503 和 Retry-After
+
     Error Codes:
         401: API 认证失败
         402: API 余额不足
@@ -53,6 +84,11 @@ def call_openrouter_api(
         ...     messages=[{"role": "user", "content": "你好"}]
         ... )
 
+        流式调用：
+        >>> result = call_openrouter_api(api_key="sk-...", messages=[...], stream=True)
+        >>> for chunk in result["stream"]:
+        ...     print(chunk, end="")
+
         JSON 模式调用：
         >>> result = call_openrouter_api(
         ...     api_key="sk-...",
@@ -81,29 +117,87 @@ def call_openrouter_api(
         payload["messages"] = messages
 
     # 处理响应格式
-    if response_format:
+    if stream:
+        payload["stream"] = True
+    elif response_format:
         payload["response_format"] = response_format
 
+    # 查询响应缓存
+    cache_key = None
+    if cache_ttl and not stream:
+        cache_key = make_cache_key(payload)
+        if not bypass_cache:
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+    if cache_key is None:
+        return _post_completion(api_key, payload, response_format, stream)
+
+    def load(slot):
+        result = _post_completion(api_key, payload, response_format, stream=False, slot=slot)
+        if result.get("choices"):
+            llm_response_cache.set(cache_key, result, cache_ttl)
+        return result
+
+    # 相同请求并发到达时只请求一次上游；其他 worker 正在请求时轮询共享缓存。
+    # 网关名额在获取跨进程锁之前取得，排队期间不占用锁
+    recheck = None if bypass_cache else lambda: llm_response_cache.get(cache_key)
+    return llm_single_flight.do(cache_key, load, recheck=recheck, acquire=llm_gateway.acquire)
+
+
+def _post_completion(api_key, payload, response_format, stream, slot=None):
+    """
+    向 OpenRouter 发送请求并处理响应（私有方法）
+
+    Args:
+        api_key (str): OpenRouter API 密钥
+        payload (dict): 请求 payload
+        response_format (dict): 响应格式配置
+        stream (bool): 是否为流式请求
+        slot (_Slot, optional): 调用方已取得的 LLM 网关名额，由本函数负责归还；
+            为 None 时自行获取
+
+    Returns:
+        dict: 同 call_openrouter_api
+
+    Raises:
+        LLMGatewayBusy: LLM 网关排队已满或等待超时
+    """
+    if slot is None:
+        slot = llm_gateway.acquire()
+    # 流式响应成功返回后，名额交由流生成器在读取结束时归还
+    handed_off = False
     try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
+        response = http_client.post(
+            OPENROUTER_API_URL,
+            service="openrouter",
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json; charset=utf-8",
                 "HTTP-Referer": "https://redsong.bond",
             },
             data=json.dumps(payload),
-            timeout=30,
+            timeout=OPENROUTER_TIMEOUT,
+            stream=stream,
         )
 
         if response.status_code != 200:
             logger.error(f"OpenRouter Error {response.status_code}: {response.text}")
+            response.close()
             if response.status_code == 401:
                 return {"error": "API Authentication Failed"}
             if response.status_code == 402:
                 return {"error": "Insufficient Balance"}
             return {"error": f"API Call Failed ({response.status_code})"}
 
+        if stream:
+            chunks = _iter_stream_content(response, slot.release)
+            # 生成器未被读取就被回收时也归还名额
+            weakref.finalize(chunks, slot.release)
+            handed_off = True
+            return {"stream": chunks}
+
         result = response.json()
 
         # JSON 模式增强：从 Markdown 代码块中提取 JSON
@@ -123,3 +217,50 @@ def call_openrouter_api(
     except Exception as e:
         logger.error(f"OpenRouter Exception: {e}")
         return {"error": f"Request Exception: {str(e)}"}
+    finally:
+        if not handed_off:
+            slot.release()
+
+
+def _iter_stream_content(response, release=None):
+    """
+    逐段读取 OpenRouter 的 SSE 流（私有方法）
+
+    流中的每个事件为 "data: {...}" 行，文本增量位于 choices[0].delta.content；
+    以 ":" 开头的注释行（如 OPENROUTER PROCESSING 心跳）被忽略，"data: [DONE]" 表示结束。
+    生成器结束或被提前关闭时释放连接，并调用 release 归还 LLM 网关名额。
+
+    Args:
+        response (requests.Response): 以 stream=True 发出的请求的响应
+        release (callable, optional): 流结束时调用的回调
+
+    Yields:
+        str: 非空的文本增量
+    """
+    try:
+        # chunk_size=None：按服务端发送的分块读取，收到一个事件就立即产出，不等缓冲区填满
+        for line in response.iter_lines(chunk_size=None):
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            try:
+                event = json.loads(data.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                logger.warning(f"OpenRouter stream: invalid event {data[:200]!r}")
+                continue
+            if "error" in event:
+                logger.error(f"OpenRouter stream error: {event['error']}")
+                break
+            choices = event.get("choices") or []
+            if choices:
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
+    except Exception as e:
+        logger.error(f"OpenRouter stream exception: {e}")
+    finally:
+        response.close()
+        if release is not None:
+            release()
@@ -0,0 +1,356 @@
+"""
+限流模块
+
+为 LLM 和 Kie 等消耗外部配额的接口提供按调用方和全局的限流：
+- 令牌桶：每个调用方（登录用户按用户 ID，访客按 IP）和全局各一个桶，
+  按固定速率补充令牌，桶容量即允许的突发请求数
+- 并发上限：每个调用方和全局同时进行的请求数，请求开始时登记租约，结束时删除；
+  租约带过期时间，worker 崩溃遗留的租约会自动失效
+- 状态保存在独立的 SQLite 文件中（WAL 模式），所有 gunicorn worker 共享，
+  每次检查在一个 BEGIN IMMEDIATE 事务中完成
+- 超限时抛出 RateLimited，带建议的重试秒数；按键累计放行和拒绝次数
+- 闲置超过 IDLE_RETENTION 的调用方令牌桶和计数定期删除，库文件不会随访客 IP 无限增长
+限流库读写失败时记录日志并放行，不影响接口本身。本模块不依赖 Flask。
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# 限流策略：
+#   rate / global_rate: 每秒补充的令牌数（调用方 / 全局）
+#   burst / global_burst: 桶容量
+#   concurrency / global_concurrency: 同时进行的请求数上限
+RateLimitPolicy = namedtuple(
+    "RateLimitPolicy",
+    ["rate", "burst", "concurrency", "global_rate", "global_burst", "global_concurrency"],
+)
+
+# 全局桶和全局并发使用的调用方名称
+GLOBAL_CLIENT = "*"
+
+# 并发超限时建议的重试秒数
+CONCURRENCY_RETRY_AFTER = 5
+
+# 闲置多久的令牌桶和调用方计数会被删除（秒）；须大于任一策略桶从空到满的时间（burst / rate），
+# 删除后桶按满额重建
+IDLE_RETENTION = 24 * 3600
+# 每个进程清理闲置行的最小间隔（秒）
+PRUNE_INTERVAL = 60
+
+# stats 单次最多返回的键数
+MAX_STATS_KEYS = 500
+
+
+class RateLimited(Exception):
+    """请求超过限流策略"""
+
+    def __init__(self, reason, retry_after):
+        message = "请求过于频繁" if reason == "rate" else "进行中的请求过多"
+        super().__init__(f"{message}，请 {retry_after} 秒后重试")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Lease:
+    """一次放行请求持有的并发租约，release 可重复调用"""
+
+    def __init__(self, limiter, lease_ids):
+        self._limiter = limiter
+        self._lease_ids = lease_ids
+
+    def release(self):
+        """删除并发租约"""
+        if self._lease_ids:
+            lease_ids, self._lease_ids = self._lease_ids, []
+            self._limiter._release(lease_ids)
+
+
+class RateLimiter:
+    """
+    基于 SQLite 的跨进程限流器
+
+    每个进程、每个线程使用各自的连接。
+
+    Attributes:
+        path: SQLite 文件路径，可在首次使用前修改
+        policies: 策略名 -> RateLimitPolicy
+        lease_ttl: 并发租约的最长存活秒数
+    """
+
+    def __init__(self, path, policies=None, lease_ttl=300):
+        self.path = path
+        self.policies = dict(policies or {})
+        self.lease_ttl = lease_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._errors = 0
+        self._pruned_at = 0.0
+
+    def acquire(self, policy_name, client):
+        """
+        检查并消耗一次配额
+
+        先检查调用方再检查全局，全部通过后才扣减令牌和登记租约，被拒绝的请求不消耗配额。
+
+        Args:
+            policy_name (str): 策略名
+            client (str): 调用方标识，如 "user:1"、"ip:1.2.3.4"
+
+        Returns:
+            _Lease: 并发租约，请求结束后必须调用 release()
+
+        Raises:
+            RateLimited: 超过速率或并发上限
+        """
+        policy = self.policies[policy_name]
+        limits = [
+            (f"{policy_name}:{client}", policy.rate, policy.burst, policy.concurrency),
+            (
+                f"{policy_name}:{GLOBAL_CLIENT}",
+                policy.global_rate,
+                policy.global_burst,
+                policy.global_concurrency,
+            ),
+        ]
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM rate_leases WHERE expires_at <= ?", (now,))
+                if now - self._pruned_at >= PRUNE_INTERVAL:
+                    self._pruned_at = now
+                    self._prune(conn, now)
+                rejected, buckets = self._check(conn, limits, now)
+                # 放行时调用方和全局都计数，拒绝时只计入触发拒绝的键
+                counted_keys = [rejected[0]] if rejected else [limit[0] for limit in limits]
+                column = f"{rejected[1]}_limited" if rejected else "allowed"
+                for counted_key in counted_keys:
+                    conn.execute(
+                        "INSERT INTO rate_counters (key, allowed, rate_limited, "
+                        "concurrency_limited, last_seen) VALUES (?, 0, 0, 0, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET last_seen = excluded.last_seen",
+                        (counted_key, now),
+                    )
+                    conn.execute(
+                        f"UPDATE rate_counters SET {column} = {column} + 1 WHERE key = ?",
+                        (counted_key,),
+                    )
+                lease_ids = []
+                if not rejected:
+                    for key, tokens in buckets:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) "
+                            "VALUES (?, ?, ?)",
+                            (key, tokens - 1, now),
+                        )
+                    for key, _, _, concurrency in limits:
+                        if concurrency:
+                            cursor = conn.execute(
+                                "INSERT INTO rate_leases (key, expires_at) VALUES (?, ?)",
+                                (key, now + self.lease_ttl),
+                            )
+                            lease_ids.append(cursor.lastrowid)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            self._count_error()
+            logger.warning(f"Rate limiter check failed, allowing request: {e}")
+            return self.null_lease()
+
+        if rejected:
+            raise RateLimited(rejected[1], rejected[2])
+        return _Lease(self, lease_ids)
+
+    def null_lease(self):
+        """
+        返回不持有任何租约的空租约，用于关闭限流或放行失败时
+
+        Returns:
+            _Lease: 空租约
+        """
+        return _Lease(self, [])
+
+    def stats(self, prefix=None, limit=100, client=None, include_clients=False):
+        """
+        返回各键的累计计数和当前状态（所有 worker 合计）
+
+        调用方的键包含用户 ID 或访客 IP，默认只返回全局键和按策略汇总的调用方计数。
+
+        Args:
+            prefix (str, optional): 只返回以此开头的键，如 "lyrics:"
+            limit (int): 最多返回的键数（1 ~ MAX_STATS_KEYS），按最近请求时间倒序
+            client (str, optional): 只返回该调用方的键，如 "user:1"
+            include_clients (bool): 为 True 时同时返回各调用方的键
+
+        Returns:
+            dict: keys（键 -> allowed、rate_limited、concurrency_limited、tokens、active、
+                  last_seen）、clients（策略名 -> keys、allowed、rate_limited、
+                  concurrency_limited）、errors（本进程的限流库读写失败次数）
+        """
+        now = time.time()
+        limit = max(1, min(int(limit), MAX_STATS_KEYS))
+        conditions = ["substr(c.key, 1, ?) = ?"]
+        params = [now, len(prefix or ""), prefix or ""]
+        if client is not None:
+            conditions.append("substr(c.key, instr(c.key, ':') + 1) = ?")
+            params.append(client)
+        elif not include_clients:
+            conditions.append(f"substr(c.key, -2) = ':{GLOBAL_CLIENT}'")
+        keys = {}
+        clients = {}
+        try:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT c.key, c.allowed, c.rate_limited, c.concurrency_limited, c.last_seen, "
+                "b.tokens, b.updated_at, "
+                "(SELECT COUNT(*) FROM rate_leases l WHERE l.key = c.key AND l.expires_at > ?) "
+                "FROM rate_counters c LEFT JOIN rate_buckets b ON b.key = c.key "
+                f"WHERE {' AND '.join(conditions)} ORDER BY c.last_seen DESC LIMIT ?",
+                params + [limit],
+            ).fetchall()
+            totals = conn.execute(
+                "SELECT substr(key, 1, instr(key, ':') - 1) AS policy, COUNT(*), SUM(allowed), "
+                "SUM(rate_limited), SUM(concurrency_limited) FROM rate_counters "
+                f"WHERE substr(key, -2) != ':{GLOBAL_CLIENT}' GROUP BY policy"
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._count_error()
+            logger.warning(f"Rate limiter stats failed: {e}")
+            rows = totals = []
+        for policy_name, count, allowed, rate_limited, concurrency_limited in totals:
+            clients[policy_name] = {
+                "keys": count,
+                "allowed": allowed,
+                "rate_limited": rate_limited,
+                "concurrency_limited": concurrency_limited,
+            }
+        for row in rows:
+            (key, allowed, rate_limited, concurrency_limited,
+             last_seen, tokens, updated_at, active) = row
+            policy = self.policies.get(key.split(":", 1)[0])
+            if tokens is not None and policy is not None:
+                rate, burst = (
+                    (policy.global_rate, policy.global_burst)
+                    if key.endswith(f":{GLOBAL_CLIENT}")
+                    else (policy.rate, policy.burst)
+                )
+                tokens = round(min(burst, tokens + (now - updated_at) * rate), 2)
+            keys[key] = {
+                "allowed": allowed,
+                "rate_limited": rate_limited,
+                "concurrency_limited": concurrency_limited,
+                "tokens": tokens,
+                "active": active,
+                "last_seen": round(last_seen),
+            }
+        with self._lock:
+            return {"keys": keys, "clients": clients, "errors": self._errors}
+
+    def _check(self, conn, limits, now):
+        """
+        依次检查各限额（私有方法，调用方持有事务）
+
+        Returns:
+            tuple: (拒绝信息, 桶状态)；拒绝信息为 (键, 原因, 重试秒数) 或 None，
+                   桶状态为 [(键, 补充后的令牌数)]
+        """
+        buckets = []
+        for key, rate, burst, concurrency in limits:
+            if concurrency:
+                active = conn.execute(
+                    "SELECT COUNT(*) FROM rate_leases WHERE key = ?", (key,)
+                ).fetchone()[0]
+                if active >= concurrency:
+                    return (key, "concurrency", CONCURRENCY_RETRY_AFTER), buckets
+            if rate:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                if tokens < 1:
+                    return (key, "rate", max(1, math.ceil((1 - tokens) / rate))), buckets
+                buckets.append((key, tokens))
+        return None, buckets
+
+    def _prune(self, conn, now):
+        """删除闲置的令牌桶和调用方计数（私有方法，调用方持有事务）"""
+        cutoff = now - IDLE_RETENTION
+        conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (cutoff,))
+        # 全局计数保留，作为各策略的累计统计
+        conn.execute(
+            "DELETE FROM rate_counters WHERE last_seen < ? "
+            f"AND substr(key, -2) != ':{GLOBAL_CLIENT}'",
+            (cutoff,),
+        )
+
+    def _release(self, lease_ids):
+        """删除并发租约（私有方法）"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany("DELETE FROM rate_leases WHERE id = ?", [(i,) for i in lease_ids])
+        except sqlite3.Error as e:
+            # 删除失败的租约在 lease_ttl 秒后过期
+            self._count_error()
+            logger.warning(f"Rate limiter release failed: {e}")
+
+    def _connect(self):
+        """获取当前线程的连接，fork 后或路径变化时重新打开（私有方法）"""
+        local = self._local
+        if (
+            getattr(local, "conn", None) is None
+            or local.pid != os.getpid()
+            or local.path != self.path
+        ):
+            # isolation_level=None：由 acquire 显式 BEGIN IMMEDIATE，保证检查和扣减原子执行
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_leases ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_leases_key ON rate_leases (key)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_counters ("
+                "key TEXT PRIMARY KEY, allowed INTEGER NOT NULL, rate_limited INTEGER NOT NULL, "
+                "concurrency_limited INTEGER NOT NULL, last_seen REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_buckets_updated_at ON rate_buckets (updated_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_counters_last_seen ON rate_counters (last_seen)"
+            )
+            local.conn = conn
+            local.pid = os.getpid()
+            local.path = self.path
+        return local.conn
+
+    def _count_error(self):
+        """累加失败次数（私有方法）"""
+        with self._lock:
+            self._errors += 1
+
+
+# 全局限流器，路径和策略由 create_app 按 RATE_LIMIT_PATH 等配置设置
+rate_limiter = RateLimiter(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp_tasks", "rate_limit.db"
+    )
+)
@@ -0,0 +1,91 @@
+"""
+地区规范字典模块
+
+将省级行政区的各种写法（简称、全称、带"省/市/自治区"后缀等）映射为统一的地区 ID，
+地区 ID 采用国家行政区划代码的前两位，"全国" 为 0。本模块不依赖数据库。
+"""
+
+import re
+
+# (地区 ID, 规范名称, 全称)
+REGIONS = [
+    (0, "全国", "全国"),
+    (11, "北京", "北京市"),
+    (12, "天津", "天津市"),
+    (13, "河北", "河北省"),
+    (14, "山西", "山西省"),
+    (15, "内蒙古", "内蒙古自治区"),
+    (21, "辽宁", "辽宁省"),
+    (22, "吉林", "吉林省"),
+    (23, "黑龙江", "黑龙江省"),
+    (31, "上海", "上海市"),
+    (32, "江苏", "江苏省"),
+    (33, "浙江", "浙江省"),
+    (34, "安徽", "安徽省"),
+    (35, "福建", "福建省"),
+    (36, "江西", "江西省"),
+    (37, "山东", "山东省"),
+    (41, "河南", "河南省"),
+    (42, "湖北", "湖北省"),
+    (43, "湖南", "湖南省"),
+    (44, "广东", "广东省"),
+    (45, "广西", "广西壮族自治区"),
+    (46, "海南", "海南省"),
+    (50, "重庆", "重庆市"),
+    (51, "四川", "四川省"),
+    (52, "贵州", "贵州省"),
+    (53, "云南", "云南省"),
+    (54, "西藏", "西藏自治区"),
+    (61, "陕西", "陕西省"),
+    (62, "甘肃", "甘肃省"),
+    (63, "青海", "青海省"),
+    (64, "宁夏", "宁夏回族自治区"),
+    (65, "新疆", "新疆维吾尔自治区"),
+    (71, "台湾", "台湾省"),
+    (81, "香港", "香港特别行政区"),
+    (82, "澳门", "澳门特别行政区"),
+]
+
+REGION_NAMES = {region_id: name for region_id, name, _ in REGIONS}
+
+_SUFFIXES = ("省", "市", "自治区", "特别行政区")
+_ALIASES = {}
+for _region_id, _name, _full_name in REGIONS:
+    _ALIASES[_name] = _region_id
+    _ALIASES[_full_name] = _region_id
+    for _suffix in _SUFFIXES:
+        _ALIASES[_name + _suffix] = _region_id
+
+# 一首歌可能标注多个地区，如 "湖北/江西"
+_SEPARATOR_RE = re.compile(r"[/、,，;；\s]+")
+
+
+def resolve_region(name):
+    """
+    将任意写法的地区名解析为地区 ID
+
+    Args:
+        name (str): 地区名，如 "陕西"、"陕西省"、"广西壮族自治区"
+
+    Returns:
+        int: 地区 ID，无法识别时返回 None
+    """
+    return _ALIASES.get((name or "").strip())
+
+
+def resolve_region_ids(text):
+    """
+    解析歌曲的地区字段，支持多个地区
+
+    Args:
+        text (str): 歌曲地区字段，如 "湖北/江西"
+
+    Returns:
+        list: 去重后的地区 ID 列表（保持原顺序），无法识别的部分被忽略
+    """
+    region_ids = []
+    for part in _SEPARATOR_RE.split(text or ""):
+        region_id = resolve_region(part)
+        if region_id is not None and region_id not in region_ids:
+            region_ids.append(region_id)
+    return region_ids
@@ -0,0 +1,69 @@
+"""
+全文检索分词模块
+
+SQLite FTS5 自带的分词器无法切分中文，这里在写入和查询两侧统一做字符 n-gram：
+- 连续汉字切成相邻二元组，并在末尾补一个单字，例如 "东方红" -> "东方 方红 红"
+- 英文和数字按单词切分并转为小写
+查询时每段汉字转为二元组短语（相邻即原文子串），单字和英文单词使用前缀匹配，
+各段之间为 AND 关系。本模块不依赖数据库。
+"""
+
+import re
+
+# 汉字段 / 英文数字段
+_SEGMENT_RE = re.compile(r"([\u3400-\u9fff\uf900-\ufaff]+)|([0-9A-Za-z]+)")
+
+
+def _cjk_ngrams(run):
+    """
+    将连续汉字切分为二元组加末尾单字
+
+    Args:
+        run (str): 连续汉字串
+
+    Returns:
+        list: 分词结果
+    """
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize_for_index(text):
+    """
+    将文本转换为写入 FTS5 的分词串
+
+    Args:
+        text (str): 原始文本（可为 None）
+
+    Returns:
+        str: 以空格分隔的分词结果
+    """
+    if not text:
+        return ""
+    tokens = []
+    for cjk, word in _SEGMENT_RE.findall(text):
+        if cjk:
+            tokens.extend(_cjk_ngrams(cjk))
+        else:
+            tokens.append(word.lower())
+    return " ".join(tokens)
+
+
+def build_match_query(query):
+    """
+    将用户输入转换为 FTS5 MATCH 表达式
+
+    Args:
+        query (str): 用户输入的搜索词
+
+    Returns:
+        str: MATCH 表达式，输入中没有可检索字符时返回空字符串
+    """
+    clauses = []
+    for cjk, word in _SEGMENT_RE.findall(query or ""):
+        if cjk and len(cjk) > 1:
+            bigrams = [cjk[i:i + 2] for i in range(len(cjk) - 1)]
+            clauses.append('"' + " ".join(bigrams) + '"')
+        else:
+            # 单字可能是二元组的首字，也可能是末尾单字，统一用前缀匹配
+            clauses.append('"' + (cjk or word.lower()) + '"*')
+    return " AND ".join(clauses)
@@ -0,0 +1,264 @@
+"""
+敏感词过滤模块
+
+用 Aho-Corasick 自动机在一次线性扫描中匹配全部敏感词，供 Agent、留言板和歌词创作共用：
+- 词库从外部词典文件加载（每行一个词，# 开头为注释），可容纳数万词
+- 每个 worker 最多每隔 check_interval 秒检查一次文件修改时间，文件变化后重新编译并原子替换，
+  无需重启
+- 词典文件不存在时使用内置的默认词表
+- 匹配不区分英文大小写
+本模块不依赖 Flask 和数据库。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SENSITIVE_WORDS = ["暴力", "色情", "赌博", "反动", "脏话", "违规"]
+
+# 只转换 ASCII 大写字母，保证转换前后字符位置一一对应
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _fold(text):
+    """英文字母转小写（私有函数）"""
+    return text.translate(_ASCII_LOWER)
+
+
+def _apply_spans(text, spans, carried, char):
+    """将前 carried 个字符和 spans 覆盖的字符替换为掩码，超出 text 的部分忽略（私有函数）"""
+    chars = list(text)
+    carried = min(carried, len(chars))
+    chars[:carried] = char * carried
+    for start, end in spans:
+        end = min(end, len(chars))
+        if start < end:
+            chars[start:end] = char * (end - start)
+    return "".join(chars)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机
+
+    状态 0 为根；每个状态记录以该状态结尾（含后缀链接）的最长敏感词长度，
+    检查和打码都只需一次扫描。
+    """
+
+    def __init__(self, words):
+        goto = [{}]
+        out = [0]
+        for word in words:
+            state = 0
+            for char in word:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            if word:
+                out[state] = len(word)
+
+        # 按层次遍历计算失败链接，根的子节点失败链接为根
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                out[nxt] = max(out[nxt], out[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self.size = sum(1 for word in words if word)
+
+    def find(self, text):
+        """
+        查找第一个出现的敏感词
+
+        Args:
+            text (str): 已转为小写的文本
+
+        Returns:
+            tuple: (结束位置, 词长)，没有命中时返回 None
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                return i, out[state]
+        return None
+
+    def spans(self, text):
+        """
+        查找所有敏感词出现的位置
+
+        Args:
+            text (str): 已转为小写的文本
+
+        Returns:
+            list: (起始位置, 结束位置) 列表，结束位置不含
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        result = []
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                result.append((i + 1 - out[state], i + 1))
+        return result
+
+
+class SensitiveWordFilter:
+    """
+    可热加载的敏感词过滤器
+
+    Attributes:
+        path: 词典文件路径，可在首次使用前修改
+        check_interval: 检查词典文件修改时间的最小间隔（秒）
+    """
+
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._automaton = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self.max_word_length = 0
+
+    def find(self, text):
+        """
+        查找文本中的第一个敏感词
+
+        Args:
+            text (str): 待检查文本
+
+        Returns:
+            str: 命中的敏感词（原文片段），没有命中时返回 None
+        """
+        if not text:
+            return None
+        hit = self._get_automaton().find(_fold(text))
+        if hit is None:
+            return None
+        end, length = hit
+        return text[end + 1 - length:end + 1]
+
+    def mask(self, text, char="*"):
+        """
+        将文本中的敏感词替换为等长的掩码字符
+
+        Args:
+            text (str): 原始文本
+            char (str): 掩码字符
+
+        Returns:
+            str: 打码后的文本
+        """
+        if not text:
+            return text
+        spans = self._get_automaton().spans(_fold(text))
+        if not spans:
+            return text
+        return _apply_spans(text, spans, 0, char)
+
+    def mask_stream(self, chunks, char="*"):
+        """
+        对流式文本逐段打码
+
+        未输出的原文（未打码）保留末尾 max_word_length - 1 个字符，与下一段拼接后再匹配，
+        保证跨段的敏感词也能被替换；伸入保留部分的匹配延续到下一轮打码，
+        结果与对完整文本调用 mask 一致。
+
+        Args:
+            chunks: 产出文本片段的可迭代对象
+            char (str): 掩码字符
+
+        Yields:
+            str: 打码后的非空文本片段
+        """
+        pending = ""  # 尚未输出的原文
+        carried = 0  # pending 开头需要打码的字符数（上一轮跨过切分点的匹配）
+        for chunk in chunks:
+            pending += chunk
+            keep = max(self.max_word_length - 1, 0)
+            if len(pending) <= keep:
+                continue
+            cut = len(pending) - keep
+            spans = self._get_automaton().spans(_fold(pending))
+            yield _apply_spans(pending[:cut], spans, carried, char)
+            carried = max(
+                [end - cut for start, end in spans if start < cut < end] + [carried - cut, 0]
+            )
+            pending = pending[cut:]
+        if pending:
+            yield _apply_spans(pending, self._get_automaton().spans(_fold(pending)), carried, char)
+
+    def reload(self):
+        """
+        立即从词典文件重新加载词库
+
+        Returns:
+            int: 加载的词条数
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, encoding="utf-8") as f:
+                words = {
+                    _fold(line.strip())
+                    for line in f
+                    if line.strip() and not line.lstrip().startswith("#")
+                }
+            source = self.path
+        except OSError:
+            mtime = None
+            words = {_fold(word) for word in DEFAULT_SENSITIVE_WORDS}
+            source = "内置默认词表"
+        automaton = AhoCorasick(sorted(words))
+        with self._lock:
+            self._automaton = automaton
+            self._mtime = mtime
+            self._checked_at = time.monotonic()
+            self.max_word_length = max((len(w) for w in words), default=0)
+        logger.info(f"敏感词库已加载：{automaton.size} 个词（{source}）")
+        return automaton.size
+
+    def _get_automaton(self):
+        """获取当前自动机，必要时检查词典文件是否更新（私有方法）"""
+        automaton = self._automaton
+        if automaton is None:
+            self.reload()
+            return self._automaton
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+                return self._automaton
+        return automaton
+
+
+# 全局敏感词过滤器，词典路径由 create_app 按 SENSITIVE_WORDS_PATH 配置设置
+sensitive_filter = SensitiveWordFilter(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sensitive_words.txt")
+)
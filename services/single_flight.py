@@ -0,0 +1,213 @@
+"""
+请求合并模块（single-flight）
+
+相同的 LLM 请求同时到达时只向上游发出一次：
+- 进程内：同一个键的并发调用中，第一个调用者（leader）执行请求，其余调用者等待并共享结果
+- 跨进程：leader 执行前以非阻塞方式获取该键独占的文件锁（fcntl.flock，<键>.lock，
+  执行完毕后删除），其他 gunicorn worker 的 leader 拿不到锁时轮询 recheck 读取共享缓存，
+  命中则不再请求上游；持锁进程结束后缓存仍未命中才重新竞争锁
+- 执行名额（如 LLM 网关）在获取文件锁之前取得，等待其他进程时先归还，
+  文件锁不会在排队等待名额期间被占用
+不支持 fcntl 的平台（如 Windows 开发环境）只做进程内合并。本模块不依赖 Flask。
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    进程内 + 跨进程的请求合并
+
+    Attributes:
+        lock_dir: 文件锁目录，为 None 时不做跨进程合并
+        lock_timeout: 等待其他进程的最长秒数，超时后不再等待直接执行
+        poll_interval: 等待其他进程时轮询共享缓存和文件锁的间隔秒数
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=60, poll_interval=0.05):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"leaders": 0, "followers": 0, "lock_waits": 0, "recheck_hits": 0}
+
+    def do(self, key, fn, recheck=None, acquire=None):
+        """
+        执行 fn，同一键的并发调用共享一次执行结果
+
+        Args:
+            key (str): 请求键（十六进制摘要）
+            fn (callable): 实际执行请求的函数；传入 acquire 时以取得的名额为参数调用，
+                由 fn 负责归还名额，否则无参调用
+            recheck (callable, optional): 其他进程正在执行同一键时轮询调用，返回非 None 时直接作为结果
+            acquire (callable, optional): 获取执行名额的函数，返回带 release() 的名额对象
+
+        Returns:
+            fn 或 recheck 的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._stats["leaders" if leader else "followers"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_locked(key, fn, recheck, acquire)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        """
+        返回本进程的合并统计
+
+        Returns:
+            dict: leaders、followers（在进程内共享结果的调用数）、
+                  lock_waits（等待其他进程的次数）、recheck_hits（等待后命中共享缓存的次数）
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _run_locked(self, key, fn, recheck, acquire):
+        """在该键的跨进程文件锁内执行 fn（私有方法）"""
+        if fcntl is None or not self.lock_dir:
+            return self._call(fn, acquire)
+        try:
+            int(key, 16)  # 键必须是十六进制摘要，不能拼出锁目录之外的路径
+            os.makedirs(self.lock_dir, exist_ok=True)
+            path = os.path.join(self.lock_dir, f"{key}.lock")
+        except (OSError, ValueError) as e:
+            logger.warning(f"single-flight lock unavailable: {e}")
+            return self._call(fn, acquire)
+
+        waited = False
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            # 先取得名额再抢锁，排队等待名额期间不占用文件锁
+            slot = acquire() if acquire is not None else None
+            try:
+                fd = self._try_lock(path)
+            except OSError as e:
+                logger.warning(f"single-flight lock unavailable: {e}")
+                return fn(slot) if acquire is not None else fn()
+            if fd is not None:
+                try:
+                    return fn(slot) if acquire is not None else fn()
+                finally:
+                    self._unlock(path, fd)
+            if slot is not None:
+                slot.release()
+
+            if not waited:
+                waited = True
+                with self._lock:
+                    self._stats["lock_waits"] += 1
+            result = self._wait_other(path, recheck, deadline)
+            if result is not None:
+                with self._lock:
+                    self._stats["recheck_hits"] += 1
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning("single-flight lock wait timed out, calling upstream directly")
+                return self._call(fn, acquire)
+
+    def _wait_other(self, path, recheck, deadline):
+        """
+        等待持锁的其他进程执行完毕（私有方法）
+
+        Returns:
+            recheck 命中的结果；锁已释放但未命中或等待超时时返回 None
+        """
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    return result
+            fd = self._try_lock(path)
+            if fd is None:
+                continue
+            # 锁已释放：持锁进程可能刚写入缓存，释放锁前再读一次
+            try:
+                return recheck() if recheck is not None else None
+            finally:
+                self._unlock(path, fd)
+        return None
+
+    def _try_lock(self, path):
+        """
+        以非阻塞方式获取文件锁（私有方法）
+
+        Returns:
+            int: 持有锁的文件描述符；锁被其他进程持有时返回 None
+        """
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            # 持锁者释放前会删除锁文件，锁住的若是已删除的旧文件则重新打开
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    @staticmethod
+    def _unlock(path, fd):
+        """删除锁文件并释放文件锁（私有方法）"""
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        os.close(fd)  # 关闭文件描述符同时释放 flock
+
+    @staticmethod
+    def _call(fn, acquire):
+        """不加文件锁直接执行 fn（私有方法）"""
+        if acquire is None:
+            return fn()
+        return fn(acquire())
+
+
+# LLM 请求合并实例，锁目录由 create_app 设置在 LLM 响应缓存文件旁
+llm_single_flight = SingleFlight(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp_tasks", "llm_locks"
+    )
+)
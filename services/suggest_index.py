@@ -0,0 +1,240 @@
+"""
+搜索联想模块
+
+为歌曲标题、演唱者和地区构建内存前缀索引，支持汉字、全拼和拼音首字母输入，
+例如 "dfh"、"dongfanghong"、"东方" 均可联想到《东方红》：
+- 索引为按键排序的数组，查询使用 bisect 定位前缀区间，不访问数据库
+- 数组采用写时复制，读操作无需加锁
+- 与按内容版本号缓存的歌曲目录同步：目录重新加载后比对差异，只为增删改的歌曲
+  重新计算拼音，因此任一 worker 提交的修改都会在其他 worker 生效，回滚的修改不会进入索引
+- 演唱者和地区按引用计数维护
+"""
+
+import bisect
+import re
+import threading
+
+from pypinyin import Style, lazy_pinyin
+
+_NON_KEY_RE = re.compile(r"[^0-9a-z\u3400-\u9fff\uf900-\ufaff]")
+
+
+def normalize_key(text):
+    """
+    归一化联想键：转小写并去掉空白和标点
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        str: 归一化后的键
+    """
+    return _NON_KEY_RE.sub("", (text or "").lower())
+
+
+def suggest_keys(text):
+    """
+    生成文本的联想键：汉字原文、全拼、拼音首字母
+
+    Args:
+        text (str): 原始文本
+
+    Returns:
+        set: 归一化后的非空键集合
+    """
+    keys = {
+        normalize_key(text),
+        normalize_key("".join(lazy_pinyin(text))),
+        normalize_key("".join(lazy_pinyin(text, style=Style.FIRST_LETTER))),
+    }
+    keys.discard("")
+    return keys
+
+
+class SuggestIndex:
+    """
+    歌曲 / 演唱者 / 地区前缀联想索引
+
+    条目为 (键, 类型, 文本, 歌曲 ID) 元组，类型为 song / artist / region，
+    演唱者和地区条目的歌曲 ID 为 0。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._songs = {}
+        self._refcounts = {}
+        self._synced = None
+
+    def rebuild(self, songs):
+        """
+        全量重建索引
+
+        Args:
+            songs: 可迭代的 (id, title, artist, region) 元组
+        """
+        song_map = {song_id: (title, artist, region) for song_id, title, artist, region in songs}
+        refcounts = {}
+        entries = []
+        for song_id, (title, artist, region) in song_map.items():
+            entries.extend(self._song_entries(song_id, title))
+            for kind, text in (("artist", artist), ("region", region)):
+                if not text:
+                    continue
+                if (kind, text) not in refcounts:
+                    entries.extend((key, kind, text, 0) for key in suggest_keys(text))
+                refcounts[(kind, text)] = refcounts.get((kind, text), 0) + 1
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._songs = song_map
+            self._refcounts = refcounts
+            self._synced = None
+
+    def sync(self, songs, token):
+        """
+        与歌曲目录同步，只更新有变化的歌曲
+
+        Args:
+            songs: 可迭代的 (id, title, artist, region) 元组，token 与上次同步相同时不读取
+            token: 目录版本标识（歌曲目录缓存值），未变化时直接返回
+        """
+        if token is self._synced:
+            return
+        if not self._songs:
+            # 索引为空时全量构建，避免逐条插入
+            self.rebuild(songs)
+            self._synced = token
+            return
+        with self._lock:
+            if token is self._synced:
+                return
+            song_map = {song_id: (title, artist, region) for song_id, title, artist, region in songs}
+            changed = [
+                (song_id, values) for song_id, values in song_map.items()
+                if self._songs.get(song_id) != values
+            ]
+            removed = [song_id for song_id in self._songs if song_id not in song_map]
+            if changed or removed:
+                entries = list(self._entries)
+                for song_id in removed:
+                    self._remove_locked(entries, song_id)
+                for song_id, values in changed:
+                    self._upsert_locked(entries, song_id, *values)
+                self._entries = entries
+            self._synced = token
+
+    def upsert_song(self, song_id, title, artist, region):
+        """
+        新增或更新单首歌曲的索引
+
+        Args:
+            song_id: 歌曲 ID
+            title: 歌曲标题
+            artist: 演唱者
+            region: 地区
+        """
+        with self._lock:
+            entries = list(self._entries)
+            self._upsert_locked(entries, song_id, title, artist, region)
+            self._entries = entries
+
+    def remove_song(self, song_id):
+        """
+        从索引中删除单首歌曲
+
+        Args:
+            song_id: 歌曲 ID
+        """
+        with self._lock:
+            entries = list(self._entries)
+            self._remove_locked(entries, song_id)
+            self._entries = entries
+
+    def suggest(self, query, limit=10):
+        """
+        前缀联想
+
+        Args:
+            query (str): 用户输入（汉字、全拼或首字母）
+            limit (int): 返回数量上限
+
+        Returns:
+            list: 联想结果，每项包含 type、text，歌曲另含 id
+        """
+        prefix = normalize_key(query)
+        if not prefix:
+            return []
+        entries = self._entries
+        results = []
+        seen = set()
+        i = bisect.bisect_left(entries, (prefix,))
+        while i < len(entries) and len(results) < limit:
+            key, kind, text, song_id = entries[i]
+            if not key.startswith(prefix):
+                break
+            i += 1
+            if (kind, text, song_id) in seen:
+                continue
+            seen.add((kind, text, song_id))
+            item = {"type": kind, "text": text}
+            if kind == "song":
+                item["id"] = song_id
+            results.append(item)
+        return results
+
+    def _song_entries(self, song_id, title):
+        """生成歌曲标题条目（私有方法）"""
+        return [(key, "song", title, song_id) for key in suggest_keys(title)]
+
+    def _upsert_locked(self, entries, song_id, title, artist, region):
+        """
+        在持有锁时新增或替换歌曲及其演唱者、地区条目（私有方法）
+
+        Args:
+            entries (list): 待修改的条目列表副本
+            song_id: 歌曲 ID
+            title: 歌曲标题
+            artist: 演唱者
+            region: 地区
+        """
+        self._remove_locked(entries, song_id)
+        self._songs[song_id] = (title, artist, region)
+        for entry in self._song_entries(song_id, title):
+            bisect.insort(entries, entry)
+        for kind, text in (("artist", artist), ("region", region)):
+            if not text:
+                continue
+            if self._refcounts.get((kind, text), 0) == 0:
+                for key in suggest_keys(text):
+                    bisect.insort(entries, (key, kind, text, 0))
+            self._refcounts[(kind, text)] = self._refcounts.get((kind, text), 0) + 1
+
+    def _remove_locked(self, entries, song_id):
+        """
+        在持有锁时从条目列表中移除歌曲及其不再被引用的演唱者、地区（私有方法）
+
+        Args:
+            entries (list): 待修改的条目列表副本
+            song_id: 歌曲 ID
+        """
+        old = self._songs.pop(song_id, None)
+        if old is None:
+            return
+        title, artist, region = old
+        doomed = set(self._song_entries(song_id, title))
+        for kind, text in (("artist", artist), ("region", region)):
+            if not text:
+                continue
+            self._refcounts[(kind, text)] -= 1
+            if self._refcounts[(kind, text)] == 0:
+                del self._refcounts[(kind, text)]
+                doomed.update((key, kind, text, 0) for key in suggest_keys(text))
+        for entry in doomed:
+            i = bisect.bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+
+
+# 全局联想索引，启动时由 init_db 构建，之后由 DataService.suggest_songs 按歌曲目录同步
+song_suggest_index = SuggestIndex()
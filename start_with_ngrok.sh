@@ -38,6 +38,9 @@ if [ -n "$NGROK_AUTHTOKEN" ]; then
         NGROK_CMD="$NGROK_CMD --domain=$NGROK_DOMAIN"
     fi
 
+    # 请求经 ngrok 转发，访客 IP 取自 X-Forwarded-For（供接口限流区分访客）
+    export TRUSTED_PROXIES=${TRUSTED_PROXIES:-1}
+
     # 后台启动 ngrok
     echo ">>> 启动 ngrok..."
     $NGROK_CMD > ngrok.log 2>&1 &
@@ -83,7 +86,10 @@ if command -v gunicorn >/dev/null 2>&1; then
     echo ">>> 正在使用 Gunicorn 启动..."
     # 运行 gunicorn。如果它以非零状态退出（崩溃），if 条件成立，执行回退逻辑。
     # 正常停止（Ctrl+C）通常返回 0，不会触发回退。
-    if ! gunicorn --workers 3 --bind 0.0.0.0:$TARGET_PORT app:app; then
+    # gthread：每个 worker 多个处理线程，等待 LLM 的请求不会占满 worker；
+    # 线程数应大于 LLM_MAX_CONCURRENCY + LLM_MAX_QUEUE（默认 6 + 6）
+    GUNICORN_THREADS=${GUNICORN_THREADS:-16}
+    if ! gunicorn --worker-class gthread --workers 3 --threads $GUNICORN_THREADS --bind 0.0.0.0:$TARGET_PORT app:app; then
         echo ">>> 警告: Gunicorn 启动失败或异常退出。"
         echo ">>> 正在尝试切换到 Python 原生启动模式..."
         exec python3 app.py